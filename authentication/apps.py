@@ -13,3 +13,9 @@ class AuthenticationConfig(AppConfig):
 
     default_auto_field = "django.db.models.BigAutoField"
     name = "authentication"
+
+    def ready(self):
+        """
+        Registers the signal handlers of the application.
+        """
+        from . import signals  # noqa: F401
@@ -0,0 +1,35 @@
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import caches
+
+
+def user_cache_key(user_id):
+    """
+    Returns the cache key of a user authenticated by CachedModelBackend.
+    """
+    return f"auth-user:{user_id}"
+
+
+class CachedModelBackend(ModelBackend):
+    """
+    ModelBackend keeping the users it loads for the sessions in the
+    SESSION_CACHE_ALIAS cache for AUTH_USER_CACHE_TIMEOUT seconds, so that
+    authenticating a request reads neither the session nor the user from
+    the database. A cached user is dropped when the user is saved or
+    deleted, see authentication.signals, and the session is still checked
+    against its password hash.
+    """
+
+    def get_user(self, user_id):
+        """
+        Returns the active user of an id, from the cache when possible.
+        """
+        cache = caches[settings.SESSION_CACHE_ALIAS]
+        key = user_cache_key(user_id)
+        user = cache.get(key)
+        if user is None:
+            user = super().get_user(user_id)
+            if user is not None:
+                cache.set(key, user, settings.AUTH_USER_CACHE_TIMEOUT)
+            return user
+        return user if self.user_can_authenticate(user) else None
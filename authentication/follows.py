@@ -0,0 +1,68 @@
+from .models import User
+
+Follow = User.follows.through
+
+
+def followed_users(request):
+    """
+    Returns the users the requesting user follows, the most recently
+    followed first. They are queried once per request, however many views,
+    forms and helpers of the request need them.
+
+    Args:
+        request: The HTTP request of a logged in user.
+
+    Returns:
+        list: The followed users.
+    """
+    if not hasattr(request, "_followed_users"):
+        request._followed_users = [
+            follow.to_user for follow in _follows_of(request.user.id)
+        ]
+    return request._followed_users
+
+
+async def afollowed_users(request):
+    """
+    Async version of followed_users. The user of the request must be loaded.
+    """
+    if not hasattr(request, "_followed_users"):
+        request._followed_users = [
+            follow.to_user async for follow in _follows_of(request.user.id)
+        ]
+    return request._followed_users
+
+
+def _follows_of(user_id):
+    """
+    Returns the follows of a user with the followed users, the most recent
+    first.
+    """
+    return (
+        Follow.objects.filter(from_user_id=user_id)
+        .select_related("to_user")
+        .order_by("-id")
+    )
+
+
+def followed_ids(request):
+    """
+    Returns the ids of the users the requesting user follows, the most
+    recently followed first, see followed_users.
+    """
+    return [user.id for user in followed_users(request)]
+
+
+async def afollowed_ids(request):
+    """
+    Async version of followed_ids.
+    """
+    return [user.id for user in await afollowed_users(request)]
+
+
+def forget_follows(request):
+    """
+    Drops the followed users of a request, after its user followed or
+    unfollowed someone.
+    """
+    request.__dict__.pop("_followed_users", None)
@@ -1,7 +1,70 @@
+import csv
+import io
+import re
+
+from django.conf import settings
 from django.contrib.auth.forms import UserCreationForm, AuthenticationForm
+from django.db import router, transaction
+from django.db.models import Exists, OuterRef
+from django.db.models.signals import m2m_changed
 from authentication.models import User
 from django import forms
 
+Follow = User.follows.through
+
+# Largest CSV file accepted by BulkFollowForm, in bytes
+MAX_CSV_SIZE = 1024 * 1024
+
+
+def check_usernames(request_user, usernames):
+    """
+    Looks up the users to follow with a single query, which also tells
+    whether the requesting user already follows each of them.
+
+    Args:
+        request_user: The user who wants to follow.
+        usernames: The usernames to follow.
+
+    Returns:
+        tuple: (users, errors) with the users that can be followed, in the
+               order of the usernames, and the error message of each other
+               username.
+    """
+    found = {
+        user.username: user
+        for user in User.objects.filter(username__in=usernames)
+        .only("id", "username")
+        .annotate(
+            already_followed=Exists(
+                Follow.objects.filter(
+                    from_user_id=request_user.id, to_user_id=OuterRef("pk")
+                )
+            )
+        )
+    }
+
+    users = []
+    errors = {}
+    for username in usernames:
+        user = found.get(username)
+        if user is None:
+            errors[username] = "Cet utilisateur n'existe pas."
+        elif user.id == request_user.id:
+            errors[username] = "Vous ne pouvez pas vous suivre vous-même."
+        elif user.already_followed:
+            errors[username] = f"Vous suivez déjà {username}"
+        else:
+            users.append(user)
+    return users, errors
+
+
+def parse_usernames(text):
+    """
+    Splits a pasted list of usernames separated by spaces, commas,
+    semicolons or new lines, keeping the first occurrence of each.
+    """
+    return list(dict.fromkeys(name for name in re.split(r"[\s,;]+", text) if name))
+
 
 class SignupForm(UserCreationForm):
     """
@@ -75,17 +138,113 @@ class FollowUsersForm(forms.Form):
         """
         username = self.cleaned_data["username"]
 
+        users, errors = check_usernames(self.request_user, [username])
+        if errors:
+            raise forms.ValidationError(errors[username])
+
+        return users[0]
+
+
+class BulkFollowForm(forms.Form):
+    """
+    Form to follow many users at once, from a pasted list of usernames or a
+    CSV file whose cells are usernames. All the usernames are checked with
+    one query and the follows are added with one INSERT. Usernames that
+    cannot be followed are reported one by one without failing the form.
+
+    Attributes:
+        usernames (CharField): The pasted usernames.
+        csv_file (FileField): A CSV file of usernames.
+    """
+
+    usernames = forms.CharField(
+        required=False,
+        label="Noms d'utilisateur",
+        widget=forms.Textarea(
+            attrs={"rows": 6, "placeholder": "Un nom d'utilisateur par ligne"}
+        ),
+    )
+    csv_file = forms.FileField(required=False, label="Fichier CSV")
+
+    def __init__(self, *args, **kwargs):
+        """
+        Initializes the form, accepting the request_user parameter to check who is following.
+        """
+        self.request_user = kwargs.pop("request_user", None)
+        self.users = []
+        self.username_errors = {}
+        super().__init__(*args, **kwargs)
+
+    def clean_csv_file(self):
+        """
+        Reads the usernames of the CSV file, skipping a "username" header.
+        """
+        csv_file = self.cleaned_data["csv_file"]
+        if csv_file is None:
+            return []
+        if csv_file.size > MAX_CSV_SIZE:
+            raise forms.ValidationError("Le fichier est trop volumineux.")
+
         try:
-            user_to_follow = User.objects.get(username=username)
-        except User.DoesNotExist:
-            raise forms.ValidationError("Cet utilisateur n'existe pas.")
+            text = csv_file.read().decode("utf-8-sig")
+        except UnicodeDecodeError:
+            raise forms.ValidationError("Le fichier doit être encodé en UTF-8.")
 
-        # Check if user is trying to follow themselves
-        if user_to_follow == self.request_user:
-            raise forms.ValidationError("Vous ne pouvez pas vous suivre vous-même.")
+        rows = list(csv.reader(io.StringIO(text)))
+        if rows and rows[0] and rows[0][0].strip().lower() == "username":
+            rows = rows[1:]
+        return [cell.strip() for row in rows for cell in row if cell.strip()]
 
-        # Check if the user is already following the target user
-        if self.request_user.follows.filter(id=user_to_follow.id).exists():
-            raise forms.ValidationError(f"Vous vuivez déjà {username}")
+    def clean(self):
+        """
+        Merges the pasted and uploaded usernames and checks them all at once.
+        """
+        cleaned_data = super().clean()
+        usernames = list(
+            dict.fromkeys(
+                parse_usernames(cleaned_data.get("usernames", ""))
+                + cleaned_data.get("csv_file", [])
+            )
+        )
+        if not usernames and not self.errors:
+            raise forms.ValidationError("Indiquez au moins un nom d'utilisateur.")
+        if len(usernames) > settings.BULK_FOLLOW_MAX_USERNAMES:
+            raise forms.ValidationError(
+                f"Au plus {settings.BULK_FOLLOW_MAX_USERNAMES} noms d'utilisateur "
+                "à la fois."
+            )
+
+        self.users, self.username_errors = check_usernames(self.request_user, usernames)
+        return cleaned_data
+
+    def save(self):
+        """
+        Adds the follows with one INSERT on the through table. The
+        m2m_changed signals are sent as by follows.add(), so the timelines
+        and the follow suggestions are updated.
 
-        return user_to_follow
+        Returns:
+            list: The newly followed users.
+        """
+        if not self.users:
+            return []
+
+        user = self.request_user
+        pk_set = {followed.id for followed in self.users}
+        using = router.db_for_write(Follow, instance=user)
+        signal_kwargs = {
+            "sender": Follow,
+            "instance": user,
+            "reverse": False,
+            "model": User,
+            "pk_set": pk_set,
+            "using": using,
+        }
+        with transaction.atomic(using=using):
+            m2m_changed.send(action="pre_add", **signal_kwargs)
+            Follow.objects.using(using).bulk_create(
+                [Follow(from_user_id=user.id, to_user_id=pk) for pk in pk_set],
+                ignore_conflicts=True,
+            )
+            m2m_changed.send(action="post_add", **signal_kwargs)
+        return self.users
@@ -0,0 +1,19 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .backends import user_cache_key
+from .models import User
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def forget_cached_user(sender, instance, **kwargs):
+    """
+    Drops the cached copy of a saved or deleted user, once the change is
+    committed so that no request caches the previous row again meanwhile.
+    """
+    key = user_cache_key(instance.pk)
+    transaction.on_commit(lambda: caches[settings.SESSION_CACHE_ALIAS].delete(key))
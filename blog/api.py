@@ -0,0 +1,346 @@
+import json
+from functools import wraps
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.http import JsonResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.views.decorators.http import require_GET, require_POST
+
+from . import feed, forms, images, stats, timeline
+from .models import Ticket
+from authentication import follows
+
+# Fields a client can select with the "fields" query parameter.
+# "type" and "id" are always returned.
+TICKET_FIELDS = (
+    "time_created",
+    "user",
+    "title",
+    "author",
+    "description",
+    "image",
+    "already_reviewed",
+    "review_count",
+    "average_rating",
+)
+REVIEW_FIELDS = ("time_created", "user", "rating", "headline", "body", "ticket")
+
+# Number of posts loaded from the database at once while streaming a page
+STREAM_CHUNK_SIZE = 50
+
+encoder = DjangoJSONEncoder()
+
+
+def api_login_required(view):
+    """
+    Decorator answering 401 to anonymous users instead of redirecting them
+    to the login page.
+    """
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return JsonResponse({"error": "Authentification requise."}, status=401)
+        return view(request, *args, **kwargs)
+
+    return wrapper
+
+
+def _selected_fields(request):
+    """
+    Reads the comma separated "fields" query parameter.
+
+    Returns:
+        set: The selected fields, or None to return every field.
+    """
+    fields = request.GET.get("fields")
+    if not fields:
+        return None
+    return {field.strip() for field in fields.split(",") if field.strip()}
+
+
+def _page_size(request):
+    """
+    Reads the "limit" query parameter, bounded by API_MAX_PAGE_SIZE.
+    """
+    try:
+        limit = int(request.GET.get("limit", settings.FEED_PAGE_SIZE))
+    except ValueError:
+        limit = settings.FEED_PAGE_SIZE
+    return min(max(limit, 1), settings.API_MAX_PAGE_SIZE)
+
+
+def _image_data(photo):
+    """
+    Returns the URLs of a photo and its renditions, or None without photo.
+    """
+    if not photo or not photo.image:
+        return None
+    data = {"url": photo.image.url, "width": photo.width, "height": photo.height}
+    for rendition in ("thumbnail", "thumbnail_webp", "detail", "detail_webp"):
+        file = getattr(photo, rendition)
+        data[rendition] = file.url if file else None
+    return data
+
+
+def serialize_ticket(ticket, fields=None):
+    """
+    Converts a ticket to a JSON compatible dict.
+
+    Args:
+        ticket: The ticket, with its user and image loaded.
+        fields: The fields to include, all of them if None.
+
+    Returns:
+        dict: The serialized ticket.
+    """
+    getters = {
+        "time_created": lambda: ticket.time_created,
+        "user": lambda: ticket.user.username,
+        "title": lambda: ticket.title,
+        "author": lambda: ticket.author,
+        "description": lambda: ticket.description,
+        "image": lambda: _image_data(ticket.image),
+        "already_reviewed": lambda: getattr(ticket, "already_reviewed", None),
+        "review_count": lambda: ticket.review_count,
+        "average_rating": lambda: ticket.average_rating,
+    }
+    data = {"type": feed.TICKET, "id": ticket.id}
+    for field in TICKET_FIELDS:
+        if fields is None or field in fields:
+            data[field] = getters[field]()
+    return data
+
+
+def serialize_review(review, fields=None, with_ticket=True):
+    """
+    Converts a review to a JSON compatible dict. The nested ticket uses
+    the same field selection.
+
+    Args:
+        review: The review, with its user and ticket loaded.
+        fields: The fields to include, all of them if None.
+        with_ticket: Whether to nest the reviewed ticket.
+
+    Returns:
+        dict: The serialized review.
+    """
+    getters = {
+        "time_created": lambda: review.time_created,
+        "user": lambda: review.user.username,
+        "rating": lambda: review.rating,
+        "headline": lambda: review.headline,
+        "body": lambda: review.body,
+        "ticket": lambda: serialize_ticket(review.ticket, fields),
+    }
+    if not with_ticket:
+        del getters["ticket"]
+    data = {"type": feed.REVIEW, "id": review.id}
+    for field in REVIEW_FIELDS:
+        if field in getters and (fields is None or field in fields):
+            data[field] = getters[field]()
+    return data
+
+
+def serialize_post(post, fields=None):
+    """
+    Converts a post of the feed to a JSON compatible dict.
+    """
+    if post["type"] == feed.REVIEW:
+        return serialize_review(post["review"], fields)
+    return serialize_ticket(post["ticket"], fields)
+
+
+def stream_page(user, rows, has_more, fields):
+    """
+    Serializes a page of feed rows chunk by chunk. Only STREAM_CHUNK_SIZE
+    posts are loaded and serialized at a time. The cursor of the last row
+    is given as next_cursor when more posts follow.
+
+    Yields:
+        str: Successive parts of the JSON document.
+    """
+    yield '{"results": ['
+    separator = ""
+    for start in range(0, len(rows), STREAM_CHUNK_SIZE):
+        posts = feed.hydrate_posts(rows[start : start + STREAM_CHUNK_SIZE])
+        feed.annotate_reviewed(posts, user)
+        for post in posts:
+            yield separator + encoder.encode(serialize_post(post, fields))
+            separator = ", "
+    next_cursor = rows[-1][3] if has_more else None
+    yield f'], "next_cursor": {encoder.encode(next_cursor)}}}'
+
+
+def _streaming_json(chunks):
+    """
+    Wraps JSON parts in a streaming response.
+    """
+    return StreamingHttpResponse(chunks, content_type="application/json")
+
+
+@require_GET
+@api_login_required
+def api_feed(request):
+    """
+    Returns one page of the home feed of the current user as JSON.
+
+    Query parameters:
+        cursor: The next_cursor of the previous page.
+        limit: The number of posts, up to API_MAX_PAGE_SIZE.
+        fields: Comma separated fields to return.
+    """
+    user = request.user
+    cursor = request.GET.get("cursor")
+
+    if timeline.is_enabled():
+        rows, has_more = timeline.get_timeline_rows(
+            user, cursor=cursor, page_size=_page_size(request)
+        )
+    else:
+        rows, has_more = feed.get_feed_rows(
+            *feed.visible_branches(user, follows.followed_ids(request)),
+            cursor=cursor,
+            page_size=_page_size(request),
+        )
+    return _streaming_json(stream_page(user, rows, has_more, _selected_fields(request)))
+
+
+@require_GET
+@api_login_required
+def api_posts(request):
+    """
+    Returns one page of the posts of the current user as JSON, with the
+    same query parameters as api_feed.
+    """
+    rows, has_more = feed.get_feed_rows(
+        request.user.ticket_set.all(),
+        request.user.review_set.all(),
+        cursor=request.GET.get("cursor"),
+        page_size=_page_size(request),
+    )
+    return _streaming_json(
+        stream_page(request.user, rows, has_more, _selected_fields(request))
+    )
+
+
+@require_GET
+@api_login_required
+def api_ticket(request, ticket_id):
+    """
+    Returns a ticket and one page of its reviews as JSON, newest first. The
+    reviews are paged like the posts of api_feed.
+
+    Query parameters:
+        cursor: The next_cursor of the previous page of reviews.
+        limit: The number of reviews, up to API_MAX_PAGE_SIZE.
+        fields: Comma separated fields to return.
+    """
+    ticket = get_object_or_404(
+        Ticket.objects.select_related("user", "image"), id=ticket_id
+    )
+    feed.annotate_reviewed([{"ticket": ticket}], request.user)
+    fields = _selected_fields(request)
+
+    page_size = _page_size(request)
+    reviews = ticket.review_set.select_related("user")
+    position = feed.decode_cursor(request.GET.get("cursor", ""))
+    if position:
+        reviews = reviews.filter(feed.older_than(position, feed.REVIEW))
+    reviews = list(reviews.order_by("-time_created", "-id")[: page_size + 1])
+
+    data = serialize_ticket(ticket, fields)
+    data["reviews"] = [
+        serialize_review(review, fields, with_ticket=False)
+        for review in reviews[:page_size]
+    ]
+    last = reviews[page_size - 1] if len(reviews) > page_size else None
+    data["next_cursor"] = (
+        feed.encode_cursor(feed.REVIEW, last.id, last.time_created) if last else None
+    )
+    return JsonResponse(data, encoder=DjangoJSONEncoder)
+
+
+def _form_data(request):
+    """
+    Reads the submitted data from a JSON body or from form encoded fields.
+
+    Returns:
+        tuple: (data, files), or None if the JSON body is invalid.
+    """
+    if request.content_type == "application/json":
+        try:
+            data = json.loads(request.body or b"{}")
+        except ValueError:
+            return None
+        return (data, {}) if isinstance(data, dict) else None
+    return request.POST.dict(), request.FILES
+
+
+@require_POST
+@api_login_required
+def api_create_ticket(request):
+    """
+    Creates a ticket, with an optional "image" file in multipart requests.
+    The data is validated by TicketForm and PhotoForm.
+
+    Returns:
+        JsonResponse: The ticket with status 201, or the form errors with status 400.
+    """
+    submitted = _form_data(request)
+    if submitted is None:
+        return JsonResponse({"error": "JSON invalide."}, status=400)
+    data, files = submitted
+
+    ticket_form = forms.TicketForm({**data, "edit_ticket": True})
+    photo_form = forms.PhotoForm(data, files)
+    if not all([ticket_form.is_valid(), photo_form.is_valid()]):
+        errors = {**ticket_form.errors, **photo_form.errors}
+        return JsonResponse({"errors": errors}, status=400)
+
+    ticket = ticket_form.save(commit=False)
+    ticket.user = request.user
+    if "image" in files:
+        photo = photo_form.save(commit=False)
+        photo.uploader = request.user
+        photo.save()
+        images.schedule_renditions(photo)
+        ticket.image = photo
+    ticket.save()
+    ticket.already_reviewed = False
+
+    return JsonResponse(serialize_ticket(ticket), status=201, encoder=DjangoJSONEncoder)
+
+
+@require_POST
+@api_login_required
+def api_create_review(request, ticket_id):
+    """
+    Creates a review of a ticket. The data is validated by ReviewForm.
+
+    Returns:
+        JsonResponse: The review with status 201, or the form errors with status 400.
+    """
+    ticket = get_object_or_404(
+        Ticket.objects.select_related("user", "image"), id=ticket_id
+    )
+    submitted = _form_data(request)
+    if submitted is None:
+        return JsonResponse({"error": "JSON invalide."}, status=400)
+    data, _ = submitted
+
+    review_form = forms.ReviewForm({**data, "edit_review": True})
+    if not review_form.is_valid():
+        return JsonResponse({"errors": review_form.errors}, status=400)
+
+    review = review_form.save(commit=False)
+    review.user = request.user
+    review.ticket = ticket
+    with transaction.atomic():
+        review.save()
+        stats.review_added(review)
+    ticket.refresh_from_db(fields=["review_count", "rating_sum", "last_review_time"])
+
+    return JsonResponse(serialize_review(review), status=201, encoder=DjangoJSONEncoder)
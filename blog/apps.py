@@ -13,3 +13,9 @@ class BlogConfig(AppConfig):
 
     default_auto_field = "django.db.models.BigAutoField"
     name = "blog"
+
+    def ready(self):
+        """
+        Registers the signal handlers of the application.
+        """
+        from . import signals  # noqa: F401
@@ -0,0 +1,168 @@
+from calendar import timegm
+from functools import wraps
+
+from django.conf import settings
+from django.contrib.auth.decorators import login_required
+from django.shortcuts import render
+from django.utils.cache import get_conditional_response, quote_etag
+from django.utils.http import http_date
+from django.views.decorators.cache import cache_control
+
+from . import feed, suggestions, timeline
+from authentication import follows
+from authentication.forms import FollowUsersForm
+
+# Async implementations of the read-heavy views, served instead of those of
+# blog.views when ASYNC_VIEWS is enabled. Templates are rendered in the event
+# loop, so everything they display is loaded beforehand with the async ORM.
+
+
+async def _auser(request):
+    """
+    Loads the user of the request with the async ORM and stores it as
+    request.user, so templates and context processors do not query it.
+    """
+    request.user = await request.auser()
+    return request.user
+
+
+def acondition(validators):
+    """
+    Async counterpart of the condition decorator of Django, whose ETag and
+    Last-Modified functions are called synchronously and cannot query the
+    database from an async view.
+
+    Args:
+        validators: An async function returning the (etag, last_modified)
+                    validators of a request.
+    """
+
+    def decorator(view):
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            etag, last_modified = await validators(request)
+            etag = quote_etag(etag) if etag else None
+            timestamp = timegm(last_modified.utctimetuple()) if last_modified else None
+
+            response = get_conditional_response(
+                request, etag=etag, last_modified=timestamp
+            )
+            if response is None:
+                response = await view(request, *args, **kwargs)
+
+            if request.method in ("GET", "HEAD"):
+                if timestamp and not response.has_header("Last-Modified"):
+                    response.headers["Last-Modified"] = http_date(timestamp)
+                if etag:
+                    response.headers.setdefault("ETag", etag)
+            return response
+
+        return wrapper
+
+    return decorator
+
+
+async def home_validators(request):
+    """
+    Returns the ETag and Last-Modified validators of the home feed.
+    """
+    user = await _auser(request)
+    return await feed.aget_validators(
+        request, feed.visible_tickets(user), feed.visible_reviews(user)
+    )
+
+
+async def posts_validators(request):
+    """
+    Returns the ETag and Last-Modified validators of the posts page.
+    """
+    user = await _auser(request)
+    return await feed.aget_validators(
+        request, user.ticket_set.all(), user.review_set.all()
+    )
+
+
+@login_required
+@cache_control(private=True, no_cache=True)
+@acondition(home_validators)
+async def home(request):
+    """
+    Async version of blog.views.home.
+
+    Context:
+        posts (list): One page of tickets and reviews sorted by their
+                      creation time.
+        next_cursor (str): The cursor of the next page, None on the last page.
+    """
+    user = await _auser(request)
+    cursor = request.GET.get("cursor")
+
+    if timeline.is_enabled():
+        posts, next_cursor = await timeline.aget_timeline_page(user, cursor=cursor)
+    else:
+        posts, next_cursor = await feed.aget_feed_page(
+            *feed.visible_branches(user, await follows.afollowed_ids(request)),
+            cursor=cursor,
+        )
+    await feed.aannotate_reviewed(posts, user)
+
+    context = {
+        "posts": posts,
+        "next_cursor": next_cursor,
+        "poll_interval": settings.FEED_POLL_INTERVAL,
+    }
+
+    return render(request, "blog/home.html", context)
+
+
+@login_required
+@cache_control(private=True, no_cache=True)
+@acondition(posts_validators)
+async def user_posts(request):
+    """
+    Async version of blog.views.user_posts.
+
+    Context:
+        posts (list): One page of tickets and reviews created by the user.
+        next_cursor (str): The cursor of the next page, None on the last page.
+    """
+    user = await _auser(request)
+
+    posts, next_cursor = await feed.aget_feed_page(
+        user.ticket_set.all(),
+        user.review_set.all(),
+        cursor=request.GET.get("cursor"),
+    )
+    await feed.aannotate_reviewed(posts, user)
+
+    context = {"posts": posts, "next_cursor": next_cursor}
+
+    return render(request, "blog/posts.html", context)
+
+
+@login_required
+async def subscriptions(request):
+    """
+    Async version of blog.views.subscriptions, loading the same users in
+    the same order.
+
+    Context:
+        following (list): The users the current user is following, the most
+                          recently followed first.
+        followers (list): The users following the current user.
+        form (Form): The form to follow other users.
+        suggestions (list): Users followed by the users the current user
+                            follows, with their number of mutual follows.
+    """
+    user = await _auser(request)
+
+    context = {
+        "following": await follows.afollowed_users(request),
+        "followers": [follower async for follower in user.followers.all()],
+        "form": FollowUsersForm(request.POST, request_user=user),
+        "suggestions": await suggestions.aget_suggestions(
+            user, await follows.afollowed_ids(request)
+        ),
+    }
+
+    return render(request, "blog/subscriptions.html", context)
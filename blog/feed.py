@@ -0,0 +1,493 @@
+import base64
+import binascii
+import hashlib
+from datetime import datetime
+
+from django.conf import settings
+from django.contrib import messages
+from django.db.models import CharField, Count, Max, Q, QuerySet, Sum, Value
+
+from .models import Ticket, Review
+from authentication import follows
+
+TICKET = "ticket"
+REVIEW = "review"
+# Cursors of the materialized timeline point at feed entries
+ENTRY = "entry"
+
+# SQLite allows at most 500 SELECTs in a compound statement: the branches of
+# a feed are merged by one query per group of this many
+MAX_UNION_BRANCHES = 200
+
+# Aggregates summarizing the state of the posts shown by a page. The review
+# statistics displayed with the tickets change without touching time_edited.
+STATE = {"count": Count("id"), "last": Max("time_edited")}
+TICKET_STATE = {
+    **STATE,
+    "reviews": Sum("review_count"),
+    "ratings": Sum("rating_sum"),
+    "last_review": Max("last_review_time"),
+}
+
+
+def visible_tickets(user):
+    """
+    Returns the tickets shown in the feed of a user: their own tickets and
+    those of the users they follow.
+
+    Args:
+        user: The user whose feed is being built.
+
+    Returns:
+        QuerySet: The visible tickets, unordered.
+    """
+    return Ticket.objects.filter(Q(user=user) | Q(user__in=user.follows.values("id")))
+
+
+def visible_reviews(user):
+    """
+    Returns the reviews shown in the feed of a user: reviews they wrote and
+    reviews answering their tickets or tickets of the users they follow.
+
+    Args:
+        user: The user whose feed is being built.
+
+    Returns:
+        QuerySet: The visible reviews, unordered.
+    """
+    # Going through the visible ticket ids lets SQLite search the reviews
+    # by index on both sides of the OR instead of scanning them
+    return Review.objects.filter(
+        Q(user=user) | Q(ticket__in=visible_tickets(user).values("id"))
+    )
+
+
+def visible_branches(user, followed_ids):
+    """
+    Splits the feed of a user into branches that are each read in feed
+    order on an index: the tickets of the user and of every user they
+    follow, the reviews they wrote and the reviews answering the tickets of
+    each of these users. Pages read from the branches with get_feed_rows
+    cost the same whatever the length of the history.
+
+    Args:
+        user: The user whose feed is being built.
+        followed_ids: The ids of the users they follow.
+
+    Returns:
+        tuple: (tickets, reviews), the lists of branches showing the same
+               posts as visible_tickets and visible_reviews.
+    """
+    owners = [user.id, *followed_ids]
+    tickets = [Ticket.objects.filter(user_id=owner) for owner in owners]
+    # The reviews the user wrote come from their own branch only
+    reviews = [Review.objects.filter(user=user)] + [
+        Review.objects.filter(ticket_user_id=owner).exclude(user=user)
+        for owner in owners
+    ]
+    return tickets, reviews
+
+
+def encode_cursor(post_type, post_id, time_created):
+    """
+    Builds an opaque cursor pointing at a post of the feed.
+
+    Args:
+        post_type: Either "ticket", "review" or "entry".
+        post_id: The id of the post.
+        time_created: The creation time of the post.
+
+    Returns:
+        str: A URL-safe cursor.
+    """
+    raw = f"{time_created.isoformat()}|{post_id}|{post_type}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor):
+    """
+    Reads back a cursor built by encode_cursor.
+
+    Args:
+        cursor: The cursor received from the client.
+
+    Returns:
+        tuple: (post_type, post_id, time_created), or None if the cursor is invalid.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+        time_created, post_id, post_type = raw.split("|")
+        position = (post_type, int(post_id), datetime.fromisoformat(time_created))
+    except (ValueError, binascii.Error, UnicodeError):
+        return None
+    if post_type not in (TICKET, REVIEW, ENTRY):
+        return None
+    return position
+
+
+def older_than(position, post_type):
+    """
+    Builds the keyset filter selecting posts of the given type that come
+    after the cursor position in (time_created, id, type) descending order.
+    """
+    cursor_type, cursor_id, cursor_time = position
+    older = Q(time_created__lt=cursor_time) | Q(
+        time_created=cursor_time, id__lt=cursor_id
+    )
+    # Ties on both time and id are broken by the post type
+    if post_type < cursor_type:
+        older |= Q(time_created=cursor_time, id=cursor_id)
+    return older
+
+
+def newer_than(position, post_type):
+    """
+    Builds the keyset filter selecting posts of the given type that come
+    before the cursor position in (time_created, id, type) descending order.
+    """
+    cursor_type, cursor_id, cursor_time = position
+    newer = Q(time_created__gt=cursor_time) | Q(
+        time_created=cursor_time, id__gt=cursor_id
+    )
+    if post_type > cursor_type:
+        newer |= Q(time_created=cursor_time, id=cursor_id)
+    return newer
+
+
+def feed_rows_query(tickets, reviews, cursor=None, page_size=None, newer=False):
+    """
+    Builds the queries merging tickets and reviews into one page of feed
+    rows. Each branch is ordered and cut to one page on its index before
+    the merge, so the database reads and sorts at most one page of rows per
+    branch, whatever the length of the history. A single queryset is read
+    as one branch, see visible_branches for the feed of a user.
+
+    Args:
+        tickets: The queryset or the list of branches of tickets to include.
+        reviews: The queryset or the list of branches of reviews to include.
+        cursor: The cursor of a post, the page starts after it if given.
+        page_size: The number of posts per page, defaults to FEED_PAGE_SIZE.
+        newer: Read the posts published since the cursor instead, oldest
+               page first. Requires a cursor.
+
+    Returns:
+        list: Querysets of (post_type, post_id, time_created) rows, one per
+              group of MAX_UNION_BRANCHES branches, holding each the rows of
+              the page and the first row of the following one. Empty if
+              there is nothing to read.
+    """
+    page_size = page_size or settings.FEED_PAGE_SIZE
+    position = decode_cursor(cursor) if cursor else None
+
+    if newer:
+        if not position:
+            return []
+        bound = newer_than
+        ordering = ("time_created", "id", "post_type")
+    else:
+        bound = older_than if position else None
+        ordering = ("-time_created", "-id", "-post_type")
+
+    branches = []
+    for post_type, posts in ((TICKET, tickets), (REVIEW, reviews)):
+        for branch in [posts] if isinstance(posts, QuerySet) else posts:
+            if bound:
+                branch = branch.filter(bound(position, post_type))
+            branches.append(_page_rows(branch, post_type, ordering[:2], page_size + 1))
+
+    queries = []
+    for start in range(0, len(branches), MAX_UNION_BRANCHES):
+        first, *others = branches[start : start + MAX_UNION_BRANCHES]
+        if others:
+            first = first.union(*others, all=True)
+        queries.append(first.order_by(*ordering)[: page_size + 1])
+    return queries
+
+
+def _page_rows(posts, post_type, ordering, limit):
+    """
+    Returns the (post_type, id, time_created) rows of the first posts of a
+    queryset in feed order. SQLite does not allow ORDER BY and LIMIT in the
+    parts of a UNION, so the page is selected by an id subquery.
+    """
+    page = posts.order_by(*ordering).values("id")[:limit]
+    return (
+        posts.model.objects.filter(id__in=page)
+        .annotate(post_type=Value(post_type, output_field=CharField()))
+        .values_list("post_type", "id", "time_created")
+    )
+
+
+def _merge_rows(rows, page_size, newer):
+    """
+    Sorts the rows read by the queries of feed_rows_query in page order and
+    keeps the page and the first row of the following one.
+    """
+    rows.sort(key=lambda row: (row[2], row[1], row[0]), reverse=not newer)
+    return rows[: page_size + 1]
+
+
+def paginate_rows(rows, page_size=None, newer=False):
+    """
+    Cuts the rows read by feed_rows_query to one page, newest first, and
+    adds the cursor of each post.
+
+    Returns:
+        tuple: (rows, has_more) where rows are (post_type, post_id,
+               time_created, cursor) tuples, and has_more tells whether
+               other posts follow the page in the requested direction.
+    """
+    page_size = page_size or settings.FEED_PAGE_SIZE
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    if newer:
+        rows.reverse()
+
+    return [(*row, encode_cursor(*row)) for row in rows], has_more
+
+
+def get_feed_rows(tickets, reviews, cursor=None, page_size=None, newer=False):
+    """
+    Reads one page of feed rows, newest first.
+
+    Args:
+        tickets: The queryset or the list of branches of tickets to include.
+        reviews: The queryset or the list of branches of reviews to include.
+        cursor: The cursor of a post, the page starts after it if given.
+        page_size: The number of posts per page, defaults to FEED_PAGE_SIZE.
+        newer: Read the posts published since the cursor instead, oldest
+               page first. Requires a cursor.
+
+    Returns:
+        tuple: (rows, has_more), see paginate_rows.
+    """
+    page_size = page_size or settings.FEED_PAGE_SIZE
+    queries = feed_rows_query(tickets, reviews, cursor, page_size, newer)
+    rows = [row for query in queries for row in query]
+    return paginate_rows(_merge_rows(rows, page_size, newer), page_size, newer)
+
+
+async def aget_feed_rows(tickets, reviews, cursor=None, page_size=None, newer=False):
+    """
+    Async version of get_feed_rows.
+    """
+    page_size = page_size or settings.FEED_PAGE_SIZE
+    queries = feed_rows_query(tickets, reviews, cursor, page_size, newer)
+    rows = [row for query in queries async for row in query]
+    return paginate_rows(_merge_rows(rows, page_size, newer), page_size, newer)
+
+
+def get_feed_page(tickets, reviews, cursor=None, page_size=None):
+    """
+    Loads one page of the feed merged by get_feed_rows.
+
+    Returns:
+        tuple: (posts, next_cursor) where posts is a list of dicts as expected
+               by the feed templates and next_cursor is None on the last page.
+    """
+    rows, has_more = get_feed_rows(tickets, reviews, cursor, page_size)
+    return hydrate_posts(rows), rows[-1][3] if has_more else None
+
+
+async def aget_feed_page(tickets, reviews, cursor=None, page_size=None):
+    """
+    Async version of get_feed_page.
+    """
+    rows, has_more = await aget_feed_rows(tickets, reviews, cursor, page_size)
+    return await ahydrate_posts(rows), rows[-1][3] if has_more else None
+
+
+def _hydrate_queries(rows):
+    """
+    Returns the ids of the tickets and reviews referenced by feed rows and
+    the querysets loading them with everything the feed templates display.
+    """
+    ticket_ids = [row[1] for row in rows if row[0] == TICKET]
+    review_ids = [row[1] for row in rows if row[0] == REVIEW]
+    tickets = Ticket.objects.select_related("user", "image")
+    reviews = Review.objects.select_related("user", "ticket__user", "ticket__image")
+    return (tickets, ticket_ids), (reviews, review_ids)
+
+
+def _wrap_posts(rows, tickets_by_id, reviews_by_id):
+    """
+    Wraps the loaded tickets and reviews in the dicts used by the feed
+    templates, in the order of the rows.
+    """
+    posts = []
+    for row in rows:
+        cursor = row[3] if len(row) > 3 else None
+        if row[0] == TICKET and row[1] in tickets_by_id:
+            posts.append(
+                {"type": TICKET, "ticket": tickets_by_id[row[1]], "cursor": cursor}
+            )
+        elif row[0] == REVIEW and row[1] in reviews_by_id:
+            review = reviews_by_id[row[1]]
+            posts.append(
+                {
+                    "type": REVIEW,
+                    "review": review,
+                    "ticket": review.ticket,
+                    "cursor": cursor,
+                }
+            )
+
+    return posts
+
+
+def hydrate_posts(rows):
+    """
+    Loads the tickets and reviews referenced by feed rows, with two queries
+    at most, and wraps them in the dicts used by the feed templates. The
+    cursor of each post is kept when the rows have one.
+
+    Args:
+        rows: An ordered list of (post_type, post_id, ...) tuples, with the
+              cursor of the post as fourth item for feed and timeline rows.
+
+    Returns:
+        list: The posts in the same order as the rows. Rows whose object
+              was deleted in the meantime are skipped.
+    """
+    (tickets, ticket_ids), (reviews, review_ids) = _hydrate_queries(rows)
+    return _wrap_posts(rows, tickets.in_bulk(ticket_ids), reviews.in_bulk(review_ids))
+
+
+async def ahydrate_posts(rows):
+    """
+    Async version of hydrate_posts.
+    """
+    (tickets, ticket_ids), (reviews, review_ids) = _hydrate_queries(rows)
+    return _wrap_posts(
+        rows, await tickets.ain_bulk(ticket_ids), await reviews.ain_bulk(review_ids)
+    )
+
+
+def annotate_reviewed(posts, user):
+    """
+    Marks the tickets of a page of posts with whether the user already
+    reviewed them, using a single query. The flag is stored on each ticket
+    as "already_reviewed" and read by the is_ticket_already_reviewed tag.
+
+    Args:
+        posts: The posts returned by get_feed_page.
+        user: The user viewing the feed.
+
+    Returns:
+        list: The same posts.
+    """
+    reviewed_ids = set(_reviewed_query(posts, user))
+    return _mark_reviewed(posts, reviewed_ids)
+
+
+async def aannotate_reviewed(posts, user):
+    """
+    Async version of annotate_reviewed.
+    """
+    reviewed_ids = {ticket_id async for ticket_id in _reviewed_query(posts, user)}
+    return _mark_reviewed(posts, reviewed_ids)
+
+
+def _reviewed_query(posts, user):
+    """
+    Returns the query listing the ids of the tickets of the posts reviewed
+    by the user.
+    """
+    return Review.objects.filter(
+        user=user, ticket_id__in={post["ticket"].id for post in posts}
+    ).values_list("ticket_id", flat=True)
+
+
+def _mark_reviewed(posts, reviewed_ids):
+    """
+    Stores the already_reviewed flag on the tickets of the posts.
+    """
+    for post in posts:
+        post["ticket"].already_reviewed = post["ticket"].id in reviewed_ids
+    return posts
+
+
+def get_validators(request, tickets, reviews):
+    """
+    Computes the ETag and Last-Modified validators of a feed page from the
+    number and newest modification time of its reviews and of its tickets,
+    those answered by the reviews included, the review statistics of the
+    tickets, and the usernames of the users the viewer follows. This costs
+    three queries instead of building the page. The result is kept on the
+    request, so the ETag and Last-Modified functions of the condition
+    decorator share it.
+
+    Args:
+        request: The request of the viewer.
+        tickets: The queryset of tickets shown by the page.
+        reviews: The queryset of reviews shown by the page.
+
+    Returns:
+        tuple: (etag, last_modified)
+    """
+    if not hasattr(request, "feed_validators"):
+        request.feed_validators = _validators(
+            request,
+            _shown_tickets(tickets, reviews).aggregate(**TICKET_STATE),
+            reviews.aggregate(**STATE),
+            follows.followed_users(request),
+        )
+    return request.feed_validators
+
+
+async def aget_validators(request, tickets, reviews):
+    """
+    Async version of get_validators. The user of the request must be loaded.
+    """
+    if not hasattr(request, "feed_validators"):
+        request.feed_validators = _validators(
+            request,
+            await _shown_tickets(tickets, reviews).aaggregate(**TICKET_STATE),
+            await reviews.aaggregate(**STATE),
+            await follows.afollowed_users(request),
+        )
+    return request.feed_validators
+
+
+def _shown_tickets(tickets, reviews):
+    """
+    Returns the tickets displayed by a page: its own tickets and those
+    embedded in its reviews, which may be tickets of users the viewer does
+    not follow.
+    """
+    return Ticket.objects.filter(
+        Q(id__in=tickets.values("id")) | Q(id__in=reviews.values("ticket_id"))
+    )
+
+
+def _validators(request, ticket_state, review_state, followed_users):
+    """
+    Hashes the state of a page into its ETag and Last-Modified validators.
+    """
+    # The page embeds a CSRF token and the pending messages, a new CSRF
+    # secret or a new message must change the ETag. The usernames of the
+    # viewer and of the followed users are displayed by the page too.
+    raw = repr(
+        (
+            request.user.pk,
+            request.user.get_username(),
+            request.META.get("CSRF_COOKIE"),
+            len(messages.get_messages(request)),
+            ticket_state,
+            review_state,
+            [(user.id, user.username) for user in followed_users],
+        )
+    )
+    last_modified = max(
+        (
+            time
+            for time in (
+                ticket_state["last"],
+                ticket_state["last_review"],
+                review_state["last"],
+            )
+            if time
+        ),
+        default=None,
+    )
+    return hashlib.sha256(raw.encode()).hexdigest(), last_modified
@@ -1,5 +1,5 @@
 from django import forms
-from . import models
+from . import models, uploads
 
 
 class TicketForm(forms.ModelForm):
@@ -71,9 +71,11 @@ class PhotoForm(forms.ModelForm):
     Form for adding or editing a photo associated with a review or ticket.
 
     Attributes:
-        'image' (ImageField): A field to upload an image for the ticket or review.
+        'image' (ImageField): A field to upload an image for the ticket or review,
+            limited in size and pixels, see blog.uploads.
     """
 
     class Meta:
         model = models.Photo
         fields = ["image"]
+        field_classes = {"image": uploads.BoundedImageField}
@@ -0,0 +1,93 @@
+import threading
+
+from django.conf import settings
+from django.core.cache import caches
+
+from .models import Ticket
+
+# Hits and misses of the fragment cache in this process
+_stats = {"hits": 0, "misses": 0}
+_stats_lock = threading.Lock()
+
+
+def get_cache():
+    """
+    Returns the cache storing the rendered posts, set by FRAGMENT_CACHE_ALIAS.
+    """
+    return caches[settings.FRAGMENT_CACHE_ALIAS]
+
+
+def fragment_key(post):
+    """
+    Builds the cache key of the rendered HTML of a ticket or review. The key is
+    versioned by the modification time, so an edited post is never served
+    from its old rendering. The key of a ticket is also versioned by its
+    review statistics, which change without touching the ticket.
+
+    Args:
+        post: A saved Ticket or Review.
+
+    Returns:
+        str: The cache key.
+    """
+    key = (
+        f"fragment:{post._meta.model_name}:{post.pk}:"
+        f"{post.time_edited.timestamp():.6f}"
+    )
+    if isinstance(post, Ticket):
+        key += f":{post.review_count}:{post.rating_sum}"
+    return key
+
+
+def render(post, render_fragment):
+    """
+    Returns the rendered HTML of a post from the cache, rendering and storing
+    it on a miss. Unsaved posts are rendered without caching.
+
+    Args:
+        post: The Ticket or Review being rendered.
+        render_fragment: A callable returning the HTML of the post.
+
+    Returns:
+        str: The HTML of the post.
+    """
+    if post.pk is None or post.time_edited is None:
+        return render_fragment()
+
+    cache = get_cache()
+    key = fragment_key(post)
+    html = cache.get(key)
+    with _stats_lock:
+        _stats["hits" if html is not None else "misses"] += 1
+
+    if html is None:
+        html = render_fragment()
+        cache.set(key, html, settings.FRAGMENT_CACHE_TIMEOUT)
+    return html
+
+
+def invalidate(*posts):
+    """
+    Removes the cached renderings of the given posts.
+
+    Args:
+        *posts: Saved Ticket or Review instances.
+    """
+    get_cache().delete_many([fragment_key(post) for post in posts])
+
+
+def stats():
+    """
+    Returns the hit and miss counters of the fragment cache in this process.
+
+    Returns:
+        dict: The hits, misses and hit ratio.
+    """
+    with _stats_lock:
+        hits, misses = _stats["hits"], _stats["misses"]
+    lookups = hits + misses
+    return {
+        "hits": hits,
+        "misses": misses,
+        "hit_ratio": hits / lookups if lookups else None,
+    }
@@ -0,0 +1,69 @@
+from pathlib import Path
+
+from django.conf import settings
+from django.utils import timezone
+
+from . import renditions
+from .models import PHOTO_FILE_FIELDS, Photo, Ticket
+from jobs.queue import enqueue, task
+
+
+@task
+def render_photo(photo_id):
+    """
+    Job generating the renditions of a photo and saving their names with the
+    dimensions of the image, see schedule_renditions. The photo is saved
+    rather than updated so the cached renderings of its tickets are
+    invalidated by the post_save signal.
+
+    Args:
+        photo_id: The id of the photo, which may have been deleted since.
+    """
+    photo = Photo.objects.filter(id=photo_id).first()
+    if photo is None or not photo.image:
+        return
+    fields = renditions.render(
+        photo.image.path, str(settings.MEDIA_ROOT), Path(photo.image.name).stem
+    )
+    for name, value in fields.items():
+        setattr(photo, name, value)
+    photo.save(update_fields=list(fields))
+    # The tickets now display the renditions, their feeds must be revalidated
+    Ticket.objects.filter(image=photo).update(time_edited=timezone.now())
+
+
+def schedule_renditions(photo):
+    """
+    Queues the generation of the renditions of a saved photo as a
+    render_photo job, run by the run_jobs workers so the upload response
+    does not wait for it. The job is enqueued in the current transaction:
+    it is only seen once the photo is committed, and survives a restart of
+    the server. Renditions are generated inline when PHOTO_RENDITIONS_INLINE
+    is True.
+
+    A photo of an image already uploaded reuses the renditions of the
+    other photo at once, as they are named after the image.
+
+    Args:
+        photo: The photo that was just saved.
+    """
+    if not photo.image:
+        return
+
+    rendered = (
+        Photo.objects.filter(image=photo.image.name)
+        .exclude(id=photo.id)
+        .exclude(thumbnail="")
+        .values("width", "height", *PHOTO_FILE_FIELDS[1:])
+        .first()
+    )
+    if rendered is not None:
+        for name, value in rendered.items():
+            setattr(photo, name, value)
+        photo.save(update_fields=list(rendered))
+        return
+
+    if settings.PHOTO_RENDITIONS_INLINE:
+        render_photo(photo.id)
+    else:
+        enqueue(render_photo, photo_id=photo.id)
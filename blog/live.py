@@ -0,0 +1,182 @@
+import asyncio
+import json
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+
+from . import feed
+from authentication.models import User
+
+
+class Subscription:
+    """
+    The connection of a browser to the live feed: a bounded queue of events
+    owned by the event loop serving the connection.
+
+    Attributes:
+        user_id: The id of the connected user.
+        queue (asyncio.Queue): The events waiting to be sent.
+        loop: The event loop the queue belongs to.
+        dropped (int): The number of events lost because the queue was full.
+    """
+
+    __slots__ = ("user_id", "queue", "loop", "dropped")
+
+    def __init__(self, user_id):
+        self.user_id = user_id
+        self.queue = asyncio.Queue(maxsize=settings.LIVE_QUEUE_SIZE)
+        self.loop = asyncio.get_running_loop()
+        self.dropped = 0
+
+    def put(self, event):
+        """
+        Adds an event to the queue, dropping it if the browser cannot keep up.
+        Must run in the event loop of the subscription.
+        """
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.dropped += 1
+
+
+class Hub:
+    """
+    In-process publish/subscribe hub between the save signals, which run in
+    worker threads, and the live feed connections, which wait in an event
+    loop. Only the connections of the current process are reached.
+    """
+
+    def __init__(self):
+        self._subscriptions = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def subscribe(self, user_id):
+        """
+        Registers a connection of a user. Must be called in an event loop.
+
+        Returns:
+            Subscription: The subscription to read events from.
+        """
+        subscription = Subscription(user_id)
+        with self._lock:
+            self._subscriptions[user_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        """
+        Removes a connection once the browser is gone.
+        """
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.user_id)
+            if subscriptions is not None:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self._subscriptions[subscription.user_id]
+
+    def connected_user_ids(self):
+        """
+        Returns the ids of the users with at least one connection.
+        """
+        with self._lock:
+            return set(self._subscriptions)
+
+    def publish(self, user_ids, event):
+        """
+        Sends an event to every connection of the given users. Safe to call
+        from any thread.
+
+        Args:
+            user_ids: The ids of the recipients.
+            event: A JSON serializable dict.
+
+        Returns:
+            int: The number of connections the event was sent to.
+        """
+        with self._lock:
+            subscriptions = [
+                subscription
+                for user_id in user_ids
+                for subscription in self._subscriptions.get(user_id, ())
+            ]
+        for subscription in subscriptions:
+            subscription.loop.call_soon_threadsafe(subscription.put, event)
+        return len(subscriptions)
+
+
+hub = Hub()
+
+
+def _connected_followers(user_id, connected_ids):
+    """
+    Returns the ids of the connected users following the given user.
+    """
+    return set(
+        User.follows.through.objects.filter(
+            to_user_id=user_id, from_user_id__in=connected_ids
+        ).values_list("from_user_id", flat=True)
+    )
+
+
+def publish_ticket(ticket):
+    """
+    Notifies the connected users whose feed shows a new ticket: its author
+    and their followers. Nothing is queried when nobody is connected.
+
+    Returns:
+        int: The number of connections notified.
+    """
+    connected_ids = hub.connected_user_ids()
+    if not connected_ids:
+        return 0
+    audience = {ticket.user_id} | _connected_followers(ticket.user_id, connected_ids)
+    return hub.publish(
+        audience & connected_ids,
+        {"type": feed.TICKET, "id": ticket.id, "user_id": ticket.user_id},
+    )
+
+
+def publish_review(review):
+    """
+    Notifies the connected users whose feed shows a new review: its author,
+    the author of the reviewed ticket and the followers of the latter.
+
+    Returns:
+        int: The number of connections notified.
+    """
+    connected_ids = hub.connected_user_ids()
+    if not connected_ids:
+        return 0
+    ticket_user_id = review.ticket.user_id
+    audience = {review.user_id, ticket_user_id} | _connected_followers(
+        ticket_user_id, connected_ids
+    )
+    return hub.publish(
+        audience & connected_ids,
+        {"type": feed.REVIEW, "id": review.id, "user_id": review.user_id},
+    )
+
+
+async def event_stream(subscription):
+    """
+    Formats the events of a subscription as server-sent events. A comment
+    line is sent every LIVE_HEARTBEAT_INTERVAL seconds without event, to keep
+    proxies from closing idle connections. The subscription is removed when
+    the browser disconnects.
+
+    Yields:
+        str: Server-sent event messages.
+    """
+    try:
+        yield f"retry: {settings.LIVE_RETRY_DELAY * 1000}\n\n"
+        while True:
+            try:
+                event = await asyncio.wait_for(
+                    subscription.queue.get(), settings.LIVE_HEARTBEAT_INTERVAL
+                )
+            except asyncio.TimeoutError:
+                yield ": heartbeat\n\n"
+                continue
+            yield f"event: post\ndata: {json.dumps(event)}\n\n"
+    finally:
+        hub.unsubscribe(subscription)
@@ -0,0 +1,99 @@
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+from django.test import Client
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.urls import reverse
+
+from blog.seeding import seed_graph, throwaway_database
+
+# HTML views and the API endpoints serving the same posts
+PAIRS = [("home", "api_feed"), ("user_posts", "api_posts")]
+
+
+class Command(BaseCommand):
+    """
+    Compares the latency of the JSON API with the HTML views serving the
+    same posts, on a seeded graph in a throwaway file database.
+    """
+
+    help = "Benchmarks the JSON API endpoints against the HTML views."
+
+    def add_arguments(self, parser):
+        """
+        Adds the options controlling the size of the benchmark.
+        """
+        parser.add_argument("--users", type=int, default=200)
+        parser.add_argument("--follows", type=int, default=20)
+        parser.add_argument(
+            "--requests", type=int, default=50, help="Requests per endpoint."
+        )
+        parser.add_argument(
+            "--limit",
+            type=int,
+            nargs="+",
+            default=[20, 200],
+            help="API page sizes to benchmark.",
+        )
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        """
+        Seeds the graph, then times every endpoint as the first seeded user.
+        """
+        setup_test_environment()
+        with tempfile.TemporaryDirectory() as directory:
+            try:
+                with throwaway_database(Path(directory) / "bench_api.sqlite3"):
+                    viewer = seed_graph(
+                        users=options["users"],
+                        follows=options["follows"],
+                        seed=options["seed"],
+                    )[0]
+                    client = Client()
+                    client.force_login(viewer)
+
+                    for html_name, api_name in PAIRS:
+                        self.report(
+                            html_name,
+                            self.measure(client, reverse(html_name), {}, options),
+                        )
+                        for limit in options["limit"]:
+                            self.report(
+                                f"{api_name} limit={limit}",
+                                self.measure(
+                                    client, reverse(api_name), {"limit": limit}, options
+                                ),
+                            )
+            finally:
+                teardown_test_environment()
+
+    def measure(self, client, url, data, options):
+        """
+        Requests an URL repeatedly, reading streamed bodies to the end.
+
+        Returns:
+            list: The durations of the requests, in milliseconds.
+        """
+        durations = []
+        for _ in range(options["requests"]):
+            started = time.perf_counter()
+            response = client.get(url, data)
+            if response.streaming:
+                b"".join(response.streaming_content)
+            durations.append((time.perf_counter() - started) * 1000)
+        return durations
+
+    def report(self, label, durations):
+        """
+        Prints the median, 95th percentile and maximum of the durations.
+        """
+        durations = sorted(durations)
+        p95 = durations[min(len(durations) - 1, int(len(durations) * 0.95))]
+        self.stdout.write(
+            f"{label:22s} median {statistics.median(durations):8.2f} ms  "
+            f"p95 {p95:8.2f} ms  max {durations[-1]:8.2f} ms"
+        )
@@ -0,0 +1,178 @@
+import asyncio
+import importlib
+import statistics
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test.utils import (
+    override_settings,
+    setup_test_environment,
+    teardown_test_environment,
+)
+from django.urls import clear_url_caches, reverse
+
+from blog.seeding import seed_graph, session_cookie, throwaway_database
+
+# Views served by blog.views or blog.async_views depending on ASYNC_VIEWS
+VIEWS = ("home", "user_posts", "subscriptions")
+
+
+async def get(application, path, cookie):
+    """
+    Sends a GET request to the ASGI application without a server.
+
+    Returns:
+        int: The status of the response.
+    """
+    messages = asyncio.Queue()
+    messages.put_nowait({"type": "http.request", "body": b"", "more_body": False})
+    status = []
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            status.append(message["status"])
+
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": b"",
+        "root_path": "",
+        "headers": [(b"host", b"testserver"), (b"cookie", cookie.encode())],
+        "client": ("127.0.0.1", 0),
+        "server": ("testserver", 80),
+    }
+    await application(scope, messages.get, send)
+    return status[0]
+
+
+class Command(BaseCommand):
+    """
+    Compares the throughput of the sync and async implementations of the
+    read-heavy views, both served by the ASGI application in-process, on a
+    seeded graph in a throwaway file database. Both run with the same worker
+    budget: the number of requests in flight at once.
+    """
+
+    help = "Benchmarks the async views against the sync views under ASGI."
+
+    def add_arguments(self, parser):
+        """
+        Adds the options controlling the size of the benchmark.
+        """
+        parser.add_argument("--users", type=int, default=200)
+        parser.add_argument(
+            "--requests", type=int, default=300, help="Requests per view."
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            nargs="+",
+            default=[1, 8, 32],
+            help="Numbers of requests in flight at once to benchmark.",
+        )
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        """
+        Seeds the graph, then benchmarks both implementations of each view.
+        """
+        setup_test_environment()
+        with tempfile.TemporaryDirectory() as directory:
+            try:
+                with throwaway_database(Path(directory) / "bench_async_views.sqlite3"):
+                    users = seed_graph(users=options["users"], seed=options["seed"])
+                    cookies = [session_cookie(user) for user in users]
+                    connections.close_all()
+
+                    self.stdout.write(
+                        f"{'view':14s} {'workers':>7s} {'variant':>7s} "
+                        f"{'req/s':>8s} {'p50 ms':>8s} {'p95 ms':>8s} {'threads':>7s}"
+                    )
+                    for view in VIEWS:
+                        for workers in options["workers"]:
+                            for use_async in (False, True):
+                                self.report(
+                                    view,
+                                    workers,
+                                    use_async,
+                                    self.run_variant(
+                                        view, workers, use_async, cookies, options
+                                    ),
+                                )
+            finally:
+                self.route()
+                teardown_test_environment()
+
+    def route(self):
+        """
+        Reloads the URLconf so the views follow the ASYNC_VIEWS setting.
+        """
+        clear_url_caches()
+        importlib.reload(importlib.import_module(settings.ROOT_URLCONF))
+
+    def run_variant(self, view, workers, use_async, cookies, options):
+        """
+        Serves the requests of one round with one implementation.
+
+        Returns:
+            tuple: (durations, elapsed, peak_threads)
+        """
+        with override_settings(ASYNC_VIEWS=use_async):
+            self.route()
+            path = reverse(view)
+            return asyncio.run(self.load(path, workers, cookies, options["requests"]))
+
+    async def load(self, path, workers, cookies, requests):
+        """
+        Sends the requests with a fixed number of them in flight, while
+        sampling the number of threads of the process.
+        """
+        application = get_asgi_application()
+        durations = []
+        remaining = iter(range(requests))
+        peak_threads = threading.active_count()
+
+        async def client():
+            for index in remaining:
+                started = time.perf_counter()
+                status = await get(application, path, cookies[index % len(cookies)])
+                if status != 200:
+                    raise CommandError(f"{path} answered {status}")
+                durations.append((time.perf_counter() - started) * 1000)
+
+        async def sample_threads():
+            nonlocal peak_threads
+            while True:
+                peak_threads = max(peak_threads, threading.active_count())
+                await asyncio.sleep(0.01)
+
+        sampler = asyncio.create_task(sample_threads())
+        started = time.perf_counter()
+        await asyncio.gather(*(client() for _ in range(workers)))
+        elapsed = time.perf_counter() - started
+        sampler.cancel()
+        return durations, elapsed, peak_threads
+
+    def report(self, view, workers, use_async, result):
+        """
+        Prints the throughput, latency percentiles and peak thread count.
+        """
+        durations, elapsed, peak_threads = result
+        durations = sorted(durations)
+        p95 = durations[min(len(durations) - 1, int(len(durations) * 0.95))]
+        self.stdout.write(
+            f"{view:14s} {workers:7d} {'async' if use_async else 'sync':>7s} "
+            f"{len(durations) / elapsed:8.1f} {statistics.median(durations):8.2f} "
+            f"{p95:8.2f} {peak_threads:7d}"
+        )
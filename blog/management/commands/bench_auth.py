@@ -0,0 +1,118 @@
+import statistics
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from blog.management.commands.bench_views import _percentile
+from blog.seeding import seed_graph, throwaway_database
+
+# Session engine and authentication backends compared with the configured ones
+DATABASE_AUTH = {
+    "SESSION_ENGINE": "django.contrib.sessions.backends.db",
+    "AUTHENTICATION_BACKENDS": ["django.contrib.auth.backends.ModelBackend"],
+}
+
+
+class Command(BaseCommand):
+    """
+    Measures the fixed cost of a request of a logged in user: loading the
+    session and the user. A cheap view is requested through the test client
+    with sessions and users read from the database, then with the
+    configured session engine and authentication backends.
+    """
+
+    help = "Benchmarks the per-request cost of sessions and authentication."
+
+    def add_arguments(self, parser):
+        """
+        Adds the options choosing the view and the number of requests.
+        """
+        parser.add_argument(
+            "--view",
+            default="create_ticket",
+            help="Route requested, without arguments.",
+        )
+        parser.add_argument("--requests", type=int, default=2000)
+        parser.add_argument("--warmup", type=int, default=100)
+
+    def handle(self, *args, **options):
+        """
+        Times the view with each configuration and reports the difference.
+        """
+        url = reverse(options["view"])
+        with override_settings(
+            DEBUG=False, ALLOWED_HOSTS=["testserver"]
+        ), throwaway_database():
+            user = seed_graph(users=20, password="bench-password")[0]
+            self.stdout.write(
+                f"{'configuration':28s} {'mean ms':>8s} {'p50 ms':>8s} "
+                f"{'p95 ms':>8s} {'queries':>7s}"
+            )
+            results = {}
+            for name, overrides in (
+                ("database sessions", DATABASE_AUTH),
+                (
+                    "cached sessions and users",
+                    {
+                        "SESSION_ENGINE": settings.SESSION_ENGINE,
+                        "AUTHENTICATION_BACKENDS": settings.AUTHENTICATION_BACKENDS,
+                    },
+                ),
+            ):
+                with override_settings(**overrides):
+                    results[name] = self.run(url, user, options)
+                mean, p50, p95, queries = results[name]
+                self.stdout.write(
+                    f"{name:28s} {mean:8.3f} {p50:8.3f} {p95:8.3f} {queries:7d}"
+                )
+
+        before, after = results.values()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{before[0] - after[0]:.3f} ms and {before[3] - after[3]} queries "
+                "saved per request"
+            )
+        )
+
+    def run(self, url, user, options):
+        """
+        Logs a client in and requests the view repeatedly.
+
+        Returns:
+            tuple: (mean, p50, p95) durations in milliseconds and the number
+                   of queries of a request.
+        """
+        client = Client()
+        client.force_login(user)
+        for _ in range(options["warmup"]):
+            client.get(url)
+
+        durations = []
+        for _ in range(options["requests"]):
+            started = time.perf_counter()
+            response = client.get(url)
+            durations.append((time.perf_counter() - started) * 1000)
+            if response.status_code != 200:
+                raise CommandError(f"{url} answered {response.status_code}")
+        durations.sort()
+
+        captured = [CaptureQueriesContext(connections[alias]) for alias in connections]
+        for capture in captured:
+            capture.__enter__()
+        try:
+            client.get(url)
+        finally:
+            for capture in captured:
+                capture.__exit__(None, None, None)
+
+        return (
+            statistics.fmean(durations),
+            _percentile(durations, 50),
+            _percentile(durations, 95),
+            sum(len(capture) for capture in captured),
+        )
@@ -0,0 +1,181 @@
+import asyncio
+import gc
+import statistics
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+from asgiref.sync import sync_to_async
+from django import db
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.urls import reverse
+
+from authentication.models import User
+from blog import live
+from blog.models import Ticket
+from blog.seeding import session_cookie, throwaway_database
+
+BATCH_SIZE = 1000
+
+
+class Connection:
+    """
+    A browser connected to the live feed, simulated by calling the ASGI
+    application directly with in-memory receive and send channels.
+    """
+
+    def __init__(self, application, path, cookie):
+        self.inbox = asyncio.Queue()
+        self.opened = asyncio.Event()
+        self.status = None
+        self.received = []
+        self.inbox.put_nowait({"type": "http.request", "body": b"", "more_body": False})
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": "GET",
+            "scheme": "http",
+            "path": path,
+            "raw_path": path.encode(),
+            "query_string": b"",
+            "root_path": "",
+            "headers": [(b"host", b"testserver"), (b"cookie", cookie.encode())],
+            "client": ("127.0.0.1", 0),
+            "server": ("testserver", 80),
+        }
+        self.task = asyncio.create_task(application(scope, self.inbox.get, self.send))
+
+    async def send(self, message):
+        """
+        Records the response status and the arrival time of each event.
+        """
+        if message["type"] == "http.response.start":
+            self.status = message["status"]
+            self.opened.set()
+        elif b"event: post" in message.get("body", b""):
+            self.received.append(time.perf_counter())
+
+    async def close(self):
+        """
+        Disconnects the browser and waits for the server to let go.
+        """
+        self.inbox.put_nowait({"type": "http.disconnect"})
+        await self.task
+
+
+class Command(BaseCommand):
+    """
+    Load test of the live feed. Opens many idle server-sent events
+    connections on the ASGI application, in a throwaway file database, then
+    measures the memory held per connection and the time needed to deliver
+    a new ticket to every follower of its author.
+    """
+
+    help = "Measures memory per live feed connection and fan-out latency."
+
+    def add_arguments(self, parser):
+        """
+        Adds the options controlling the size of the load test.
+        """
+        parser.add_argument(
+            "--connections",
+            type=int,
+            default=2000,
+            help="Number of connected followers.",
+        )
+        parser.add_argument(
+            "--posts", type=int, default=5, help="Number of tickets published."
+        )
+
+    def handle(self, *args, **options):
+        """
+        Seeds the followers, then runs the load test in an event loop.
+        """
+        setup_test_environment()
+        with tempfile.TemporaryDirectory() as directory:
+            try:
+                with throwaway_database(Path(directory) / "bench_live.sqlite3"):
+                    author, cookies = self.seed(options["connections"])
+                    # Connections made by the event loop threads are closed there
+                    db.connections.close_all()
+                    asyncio.run(self.run(author, cookies, options["posts"]))
+            finally:
+                teardown_test_environment()
+
+    def seed(self, count):
+        """
+        Creates an author and their followers, with one session each.
+
+        Returns:
+            tuple: The author and the session cookie of every follower.
+        """
+        author = User.objects.create(username="bench-live-author")
+        followers = User.objects.bulk_create(
+            User(username=f"bench-live-{i:06d}") for i in range(count)
+        )
+        for start in range(0, count, BATCH_SIZE):
+            User.follows.through.objects.bulk_create(
+                User.follows.through(from_user_id=follower.id, to_user_id=author.id)
+                for follower in followers[start : start + BATCH_SIZE]
+            )
+
+        return author, [session_cookie(follower) for follower in followers]
+
+    async def run(self, author, cookies, posts):
+        """
+        Opens the connections, publishes the tickets and reports.
+        """
+        application = get_asgi_application()
+        path = reverse("feed_stream")
+
+        gc.collect()
+        tracemalloc.start()
+        baseline = tracemalloc.get_traced_memory()[0]
+        started = time.perf_counter()
+        connections = [Connection(application, path, cookie) for cookie in cookies]
+        await asyncio.gather(*(conn.opened.wait() for conn in connections))
+        elapsed = time.perf_counter() - started
+        # Lets every stream reach its first wait for an event
+        await asyncio.sleep(0.5)
+        gc.collect()
+        held = tracemalloc.get_traced_memory()[0] - baseline
+        tracemalloc.stop()
+
+        refused = sum(conn.status != 200 for conn in connections)
+        if refused:
+            raise CommandError(f"{refused} connections were refused")
+        self.stdout.write(
+            f"{len(connections)} connections opened in {elapsed:.1f}s, "
+            f"{held / len(connections) / 1024:.1f} KiB per idle connection"
+        )
+
+        create_ticket = sync_to_async(Ticket.objects.create)
+        for number in range(posts):
+            published = time.perf_counter()
+            await create_ticket(title=f"Live {number}", author="bench", user=author)
+            deadline = published + 30
+            while (
+                any(len(conn.received) <= number for conn in connections)
+                and time.perf_counter() < deadline
+            ):
+                await asyncio.sleep(0.001)
+
+            latencies = sorted(
+                (conn.received[number] - published) * 1000
+                for conn in connections
+                if len(conn.received) > number
+            )
+            p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+            self.stdout.write(
+                f"ticket {number}: delivered to {len(latencies)}/{len(connections)}  "
+                f"median {statistics.median(latencies):7.2f} ms  "
+                f"p95 {p95:7.2f} ms  max {latencies[-1]:7.2f} ms"
+            )
+
+        await asyncio.gather(*(conn.close() for conn in connections))
+        left = len(live.hub.connected_user_ids())
+        self.stdout.write(f"Subscriptions left after disconnecting: {left}")
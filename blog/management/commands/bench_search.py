@@ -0,0 +1,141 @@
+import random
+import statistics
+import tempfile
+import time
+from itertools import accumulate
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from blog import search
+from blog.models import Ticket, Review
+from blog.seeding import throwaway_database
+from authentication.models import User
+
+BATCH_SIZE = 10000
+
+
+class Command(BaseCommand):
+    """
+    Compares the latency of the FTS5 search with the icontains scan it
+    replaces, on generated tickets and reviews in a throwaway file database.
+    """
+
+    help = "Benchmarks the full-text search against an icontains scan."
+
+    def add_arguments(self, parser):
+        """
+        Adds the options controlling the size of the benchmark.
+        """
+        parser.add_argument(
+            "--rows",
+            type=int,
+            default=1_000_000,
+            help="Number of posts to generate, two thirds of them tickets.",
+        )
+        parser.add_argument(
+            "--queries", type=int, default=20, help="Number of searched words."
+        )
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        """
+        Generates the posts, then times both searches on the same words.
+        """
+        rng = random.Random(options["seed"])
+        # Zipf-like vocabulary: a few frequent words and many rare ones
+        vocabulary = [f"mot{i}" for i in range(20000)]
+        cumulative_weights = list(
+            accumulate(1 / (rank + 1) for rank in range(len(vocabulary)))
+        )
+
+        def words(count):
+            return " ".join(
+                rng.choices(vocabulary, cum_weights=cumulative_weights, k=count)
+            )
+
+        with tempfile.TemporaryDirectory() as directory:
+            with throwaway_database(Path(directory) / "bench_search.sqlite3"):
+                started = time.perf_counter()
+                self.generate(options["rows"], words)
+                self.stdout.write(
+                    f"Generated and indexed {options['rows']} posts "
+                    f"in {time.perf_counter() - started:.1f}s"
+                )
+
+                # Searched words are drawn like the text, common words included
+                terms = words(options["queries"]).split()
+                self.report(
+                    "fts5 bm25",
+                    [self.measure(search.search_rows, term) for term in terms],
+                )
+                self.report(
+                    "icontains", [self.measure(self.scan, term) for term in terms]
+                )
+
+    def generate(self, rows, words):
+        """
+        Inserts the posts in batches. The search triggers index them.
+        """
+        user = User.objects.create(username="bench-search")
+        ticket_count = rows * 2 // 3
+        for start in range(0, ticket_count, BATCH_SIZE):
+            Ticket.objects.bulk_create(
+                Ticket(
+                    title=words(4),
+                    author=words(2),
+                    description=words(20),
+                    user=user,
+                )
+                for _ in range(min(BATCH_SIZE, ticket_count - start))
+            )
+
+        ticket_ids = list(Ticket.objects.values_list("id", flat=True)[:BATCH_SIZE])
+        review_count = rows - ticket_count
+        for start in range(0, review_count, BATCH_SIZE):
+            Review.objects.bulk_create(
+                Review(
+                    ticket_id=ticket_ids[index % len(ticket_ids)],
+                    ticket_user=user,
+                    rating=index % 6,
+                    headline=words(4),
+                    body=words(30),
+                    user=user,
+                )
+                for index in range(start, min(start + BATCH_SIZE, review_count))
+            )
+
+    def scan(self, term):
+        """
+        The search we would write without an index: a page of tickets and
+        reviews containing the term, without ranking.
+        """
+        tickets = Ticket.objects.filter(
+            Q(title__icontains=term)
+            | Q(author__icontains=term)
+            | Q(description__icontains=term)
+        ).values_list("id")
+        reviews = Review.objects.filter(
+            Q(headline__icontains=term) | Q(body__icontains=term)
+        ).values_list("id")
+        return list(tickets.union(reviews, all=True)[:20])
+
+    def measure(self, function, term):
+        """
+        Returns the duration of one call, in milliseconds.
+        """
+        started = time.perf_counter()
+        function(term)
+        return (time.perf_counter() - started) * 1000
+
+    def report(self, label, durations):
+        """
+        Prints the median, 95th percentile and maximum of the durations.
+        """
+        durations = sorted(durations)
+        p95 = durations[min(len(durations) - 1, int(len(durations) * 0.95))]
+        self.stdout.write(
+            f"{label:10s} median {statistics.median(durations):8.2f} ms  "
+            f"p95 {p95:8.2f} ms  max {durations[-1]:8.2f} ms"
+        )
@@ -0,0 +1,217 @@
+import copy
+import random
+import statistics
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connections, transaction
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from blog import feed
+from blog.models import Ticket, Review
+from blog.seeding import seed_graph, throwaway_database
+
+# Connection settings compared by the benchmark: the defaults of Django, with
+# a rollback journal and deferred transactions, and the profile of settings.py
+# with the WAL journal of a deployment, see SQLITE_INIT_COMMAND
+PROFILES = {
+    "django": {
+        "default": {"CONN_MAX_AGE": 0, "OPTIONS": {}},
+        "replica": {
+            "CONN_MAX_AGE": 0,
+            "OPTIONS": {"init_command": "PRAGMA query_only = ON;"},
+        },
+    },
+    "tuned": {
+        alias: {
+            "CONN_MAX_AGE": settings.DATABASES[alias]["CONN_MAX_AGE"],
+            "OPTIONS": {
+                **settings.DATABASES[alias]["OPTIONS"],
+                "init_command": settings.SQLITE_WAL_COMMAND
+                + settings.DATABASES[alias]["OPTIONS"]["init_command"].replace(
+                    settings.SQLITE_WAL_COMMAND, ""
+                ),
+            },
+        }
+        for alias in ("default", "replica")
+    },
+}
+
+
+@contextmanager
+def use_profile(name):
+    """
+    Applies the connection settings of a profile until the end of the with
+    block. Connections are closed so the next ones are opened with them.
+    """
+    connections.close_all()
+    saved = {}
+    for alias, overrides in PROFILES[name].items():
+        settings_dict = connections.settings[alias]
+        saved[alias] = {key: copy.deepcopy(settings_dict[key]) for key in overrides}
+        settings_dict.update(copy.deepcopy(overrides))
+    try:
+        yield
+    finally:
+        connections.close_all()
+        for alias, values in saved.items():
+            connections.settings[alias].update(values)
+
+
+def is_lock_error(error):
+    """
+    Tells whether an error is SQLite failing to get a lock.
+    """
+    return "locked" in str(error) or "busy" in str(error)
+
+
+class Command(BaseCommand):
+    """
+    Concurrency benchmark of the SQLite connection profile. Reader threads
+    load feed pages while writer threads create tickets with a review, as
+    create_ticket_review does, in a throwaway file database. Run once with
+    the defaults of Django and once with the profile of settings.py, it
+    reports the throughput and the rate of "database is locked" errors.
+    """
+
+    help = "Benchmarks concurrent feed reads and writes on SQLite."
+
+    def add_arguments(self, parser):
+        """
+        Adds the options controlling the size of the benchmark.
+        """
+        parser.add_argument("--users", type=int, default=100)
+        parser.add_argument("--readers", type=int, default=8)
+        parser.add_argument("--writers", type=int, default=4)
+        parser.add_argument(
+            "--duration", type=float, default=5, help="Seconds per profile."
+        )
+        parser.add_argument(
+            "--profile",
+            nargs="+",
+            choices=PROFILES,
+            default=list(PROFILES),
+            help="Connection profiles to benchmark.",
+        )
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        """
+        Benchmarks each profile on its own seeded database.
+        """
+        self.stdout.write(
+            f"{'profile':8s} {'kind':7s} {'ops/s':>8s} {'p50 ms':>8s} "
+            f"{'p95 ms':>8s} {'locked':>7s} {'locked %':>8s}"
+        )
+        setup_test_environment()
+        try:
+            for name in options["profile"]:
+                with tempfile.TemporaryDirectory() as directory:
+                    with use_profile(name):
+                        with throwaway_database(Path(directory) / f"{name}.sqlite3"):
+                            users = seed_graph(
+                                users=options["users"], seed=options["seed"]
+                            )
+                            connections.close_all()
+                            self.report(name, self.run(users, options))
+        finally:
+            teardown_test_environment()
+
+    def run(self, users, options):
+        """
+        Runs the readers and writers for the duration of the benchmark.
+
+        Returns:
+            dict: For readers and writers, their durations, lock errors and
+                  the elapsed time.
+        """
+        results = {
+            kind: {"durations": [], "locked": 0} for kind in ("readers", "writers")
+        }
+        lock = threading.Lock()
+        deadline = time.perf_counter() + options["duration"]
+
+        def work(kind, operation, rng):
+            durations = []
+            locked = 0
+            try:
+                while time.perf_counter() < deadline:
+                    user = rng.choice(users)
+                    started = time.perf_counter()
+                    try:
+                        operation(user)
+                    except OperationalError as error:
+                        if not is_lock_error(error):
+                            raise
+                        locked += 1
+                    else:
+                        durations.append((time.perf_counter() - started) * 1000)
+            finally:
+                connections.close_all()
+                with lock:
+                    results[kind]["durations"] += durations
+                    results[kind]["locked"] += locked
+
+        threads = [
+            threading.Thread(
+                target=work, args=("readers", self.read, random.Random(index))
+            )
+            for index in range(options["readers"])
+        ] + [
+            threading.Thread(
+                target=work, args=("writers", self.write, random.Random(-index - 1))
+            )
+            for index in range(options["writers"])
+        ]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        for result in results.values():
+            result["elapsed"] = elapsed
+        return results
+
+    def read(self, user):
+        """
+        Loads the first page of the home feed of a user.
+        """
+        followed_ids = list(user.follows.values_list("id", flat=True))
+        posts, _ = feed.get_feed_page(*feed.visible_branches(user, followed_ids))
+        feed.annotate_reviewed(posts, user)
+
+    def write(self, user):
+        """
+        Creates a ticket with its review in one transaction, after reading
+        the latest ticket of the user like a form validation would.
+        """
+        with transaction.atomic():
+            Ticket.objects.filter(user=user).order_by("-time_created").first()
+            ticket = Ticket.objects.create(title="Bench", author="bench", user=user)
+            Review.objects.create(ticket=ticket, rating=4, headline="Bench", user=user)
+
+    def report(self, name, results):
+        """
+        Prints the throughput, latency percentiles and lock errors of the
+        readers and the writers.
+        """
+        for kind, result in results.items():
+            durations = sorted(result["durations"])
+            attempts = len(durations) + result["locked"]
+            if durations:
+                median = statistics.median(durations)
+                p95 = durations[min(len(durations) - 1, int(len(durations) * 0.95))]
+            else:
+                median = p95 = float("nan")
+            self.stdout.write(
+                f"{name:8s} {kind:7s} {len(durations) / result['elapsed']:8.1f} "
+                f"{median:8.2f} {p95:8.2f} {result['locked']:7d} "
+                f"{100 * result['locked'] / max(attempts, 1):7.1f}%"
+            )
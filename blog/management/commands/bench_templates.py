@@ -0,0 +1,108 @@
+import tempfile
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+from django.template import Engine, RequestContext, engines
+from django.test import RequestFactory, override_settings
+
+from blog import feed, fragments
+from blog.seeding import seed_graph, throwaway_database
+
+# Template rendering the posts of the home feed and of its infinite scroll
+FEED_TEMPLATE = "blog/partials/feed_posts.html"
+
+# Loaders of the engine recompiling the templates at each render
+UNCACHED_LOADERS = [
+    "django.template.loaders.filesystem.Loader",
+    "django.template.loaders.app_directories.Loader",
+]
+
+
+class Command(BaseCommand):
+    """
+    Measures the cost per post of rendering the home feed template, on a
+    page of posts of a seeded graph in a throwaway database. The page is
+    rendered with the configured engine, with the fragment cache warm then
+    cleared before each render, and with an engine whose loaders compile
+    the templates again at each render.
+    """
+
+    help = "Benchmarks the rendering of the feed template."
+
+    def add_arguments(self, parser):
+        """
+        Adds the options controlling the size of the benchmark.
+        """
+        parser.add_argument("--users", type=int, default=100)
+        parser.add_argument(
+            "--posts", type=int, default=50, help="Posts of the rendered page."
+        )
+        parser.add_argument(
+            "--renders", type=int, default=200, help="Renders of each variant."
+        )
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        """
+        Seeds the graph, builds a page of posts and times each variant.
+        """
+        with tempfile.TemporaryDirectory() as directory, override_settings(
+            MEDIA_ROOT=Path(directory)
+        ), throwaway_database():
+            viewer = seed_graph(
+                users=options["users"], seed=options["seed"], photos=0.2
+            )[0]
+            posts, _ = feed.get_feed_page(
+                feed.visible_tickets(viewer),
+                feed.visible_reviews(viewer),
+                page_size=options["posts"],
+            )
+            feed.annotate_reviewed(posts, viewer)
+            request = RequestFactory().get("/home/")
+            request.user = viewer
+
+            configured = engines["django"].engine
+            uncached = Engine(
+                dirs=configured.dirs,
+                loaders=UNCACHED_LOADERS,
+                context_processors=configured.context_processors,
+                libraries=configured.libraries,
+            )
+            variants = (
+                ("warm fragment cache", configured, False),
+                ("cold fragment cache", configured, True),
+                ("cold, uncached loader", uncached, True),
+            )
+
+            self.stdout.write(f"{len(posts)} posts per render")
+            for name, engine, cold in variants:
+                elapsed = self.time_renders(
+                    engine, request, posts, cold, options["renders"]
+                )
+                per_post = elapsed / (options["renders"] * max(len(posts), 1))
+                self.stdout.write(
+                    f"{name:24s} {elapsed / options['renders'] * 1000:8.2f} ms/page "
+                    f"{per_post * 10**6:8.1f} µs/post"
+                )
+
+    def time_renders(self, engine, request, posts, cold, renders):
+        """
+        Renders the feed template repeatedly, after a first untimed render.
+
+        Returns:
+            float: The total time of the timed renders, in seconds.
+        """
+        engine.get_template(FEED_TEMPLATE).render(
+            RequestContext(request, {"posts": posts})
+        )
+        elapsed = 0.0
+        for _ in range(renders):
+            if cold:
+                fragments.get_cache().clear()
+            started = time.perf_counter()
+            engine.get_template(FEED_TEMPLATE).render(
+                RequestContext(request, {"posts": posts})
+            )
+            elapsed += time.perf_counter() - started
+        return elapsed
@@ -0,0 +1,126 @@
+import tempfile
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+
+from blog.upload_samples import (
+    FLAT_TOLERANCE,
+    jpeg_photo,
+    measure_upload,
+    png_bomb,
+    write_upload_request,
+)
+
+# Handlers of a default Django project, to compare with
+DEFAULT_UPLOAD_HANDLERS = [
+    "django.core.files.uploadhandler.MemoryFileUploadHandler",
+    "django.core.files.uploadhandler.TemporaryFileUploadHandler",
+]
+
+
+class Command(BaseCommand):
+    """
+    Measures the peak Python memory of uploading a photo with tracemalloc:
+    the multipart body is read from a file by the upload handlers, the photo
+    form is validated and the image is stored. Photos of growing sizes are
+    uploaded with the configured handlers and with those of a default Django
+    project, then a photo above UPLOAD_MAX_SIZE and a decompression bomb are
+    rejected. The command fails if the peak grows with the size of the
+    accepted photos.
+    """
+
+    help = "Measures the peak memory of photo uploads of growing sizes."
+
+    def add_arguments(self, parser):
+        """
+        Adds the option setting the sizes of the uploaded photos.
+        """
+        parser.add_argument(
+            "--sizes",
+            type=int,
+            nargs="+",
+            default=[1, 4, 16, 64],
+            help="Sizes of the uploaded photos, in MiB.",
+        )
+
+    def handle(self, *args, **options):
+        """
+        Uploads each photo with each set of handlers and reports the peaks.
+        """
+        sizes = sorted(options["sizes"])
+        with tempfile.TemporaryDirectory() as directory, override_settings(
+            MEDIA_ROOT=Path(directory) / "media",
+            FILE_UPLOAD_TEMP_DIR=directory,
+        ):
+            body = Path(directory) / "body"
+            self.stdout.write(
+                f"{'upload':22s} {'handlers':>9s} {'peak KiB':>9s} {'ms':>8s}  result"
+            )
+
+            # The limit is raised to accept every size of the series
+            peaks = []
+            with override_settings(UPLOAD_MAX_SIZE=(sizes[-1] + 1) * 1024 * 1024):
+                # Imports and caches filled by a first upload are not counted
+                length = write_upload_request(body, jpeg_photo(0))
+                self.upload(None, None, settings.FILE_UPLOAD_HANDLERS, body, length)
+                for size in sizes:
+                    length = write_upload_request(body, jpeg_photo(size * 1024 * 1024))
+                    for name, handlers in (
+                        ("default", DEFAULT_UPLOAD_HANDLERS),
+                        ("bounded", settings.FILE_UPLOAD_HANDLERS),
+                    ):
+                        peak = self.upload(
+                            f"{size} MiB photo", name, handlers, body, length
+                        )
+                        if name == "bounded":
+                            peaks.append(peak)
+
+            too_large = settings.UPLOAD_MAX_SIZE + 1024 * 1024
+            length = write_upload_request(body, jpeg_photo(too_large))
+            self.upload(
+                f"{too_large // 1024 // 1024} MiB photo",
+                "bounded",
+                settings.FILE_UPLOAD_HANDLERS,
+                body,
+                length,
+            )
+            length = write_upload_request(body, png_bomb(50_000, 50_000))
+            self.upload(
+                "50000x50000 PNG",
+                "bounded",
+                settings.FILE_UPLOAD_HANDLERS,
+                body,
+                length,
+            )
+
+        growth = peaks[-1] - peaks[0]
+        if growth > FLAT_TOLERANCE:
+            raise CommandError(
+                f"The peak memory grew by {growth // 1024} KiB from "
+                f"{sizes[0]} to {sizes[-1]} MiB."
+            )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"The peak memory is flat: {growth / 1024:+.1f} KiB from "
+                f"{sizes[0]} to {sizes[-1]} MiB."
+            )
+        )
+
+    def upload(self, label, name, handlers, body, length):
+        """
+        Uploads a photo with measure_upload and prints the result unless the label
+        is None.
+
+        Returns:
+            int: The peak memory allocated during the upload, in bytes.
+        """
+        form, peak, elapsed = measure_upload(handlers, body, length)
+        if label is not None:
+            result = "stored" if form.is_valid() else " ".join(form.errors["image"])
+            self.stdout.write(
+                f"{label:22s} {name:>9s} {peak / 1024:9.1f} "
+                f"{elapsed * 1000:8.1f}  {result}"
+            )
+        return peak
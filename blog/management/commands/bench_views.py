@@ -0,0 +1,378 @@
+import itertools
+import json
+import math
+import platform
+import random
+import statistics
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from contextlib import ExitStack
+from pathlib import Path
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from blog import stats, timeline
+from blog.models import Ticket, Review
+from blog.seeding import seed_graph, throwaway_database
+from authentication.models import User
+
+# Views benchmarked, in order, with their request. "args" builds the URL
+# arguments and "data" the POST data from the context of the viewer and the
+# number of the request of this viewer. The write views redirect on success.
+VIEWS = {
+    "home": {"method": "get"},
+    "user_posts": {"method": "get"},
+    "subscriptions": {"method": "get"},
+    "create_ticket": {
+        "method": "post",
+        "data": lambda context, n: {
+            "title": f"Bench {n}",
+            "author": "Bench",
+            "description": "Lorem ipsum " * 10,
+            "edit_ticket": True,
+        },
+    },
+    "create_review": {
+        "method": "post",
+        "args": lambda context, n: [context["tickets"][n % len(context["tickets"])]],
+        "data": lambda context, n: {
+            "headline": f"Bench {n}",
+            "rating": n % 6,
+            "body": "Lorem ipsum " * 10,
+            "edit_review": True,
+        },
+    },
+    "edit_review": {
+        "method": "post",
+        "args": lambda context, n: [context["review"].id],
+        "data": lambda context, n: {
+            "headline": f"Bench {n}",
+            "rating": n % 6,
+            "body": "Lorem ipsum " * 10,
+            "edit_review": True,
+        },
+    },
+    "create_ticket_review": {
+        "method": "post",
+        "data": lambda context, n: {
+            "title": f"Bench {n}",
+            "author": "Bench",
+            "description": "",
+            "edit_ticket": True,
+            "headline": f"Bench {n}",
+            "rating": n % 6,
+            "body": "",
+            "edit_review": True,
+        },
+    },
+    # Each followed user is unfollowed by the next view, the graph is left as seeded
+    "follow_user": {
+        "method": "post",
+        "data": lambda context, n: {"username": context["strangers"][n].username},
+    },
+    "unfollow_user": {
+        "method": "post",
+        "args": lambda context, n: [context["strangers"][n].id],
+    },
+}
+
+# Percentiles of the latencies reported
+PERCENTILES = (50, 95, 99)
+
+
+def _commit():
+    """
+    Returns the git commit of the working tree, None outside of a checkout.
+    """
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=settings.BASE_DIR,
+            capture_output=True,
+            check=True,
+            text=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _percentile(durations, percentile):
+    """
+    Returns a percentile of sorted durations, with the nearest-rank method.
+    """
+    return durations[max(0, math.ceil(len(durations) * percentile / 100) - 1)]
+
+
+class Command(BaseCommand):
+    """
+    Times the main views through the test client on a seeded graph with
+    power-law degrees, in a throwaway file database. Each view is requested
+    by a few viewers in turn: first to warm the caches, then to measure the
+    latency, then a few more times under tracemalloc and with the queries
+    captured, which slows the requests down, to count the queries and
+    measure the peak memory. The results are written as JSON, to compare
+    them across commits.
+    """
+
+    help = "Benchmarks the latency, queries and memory of the main views."
+
+    def add_arguments(self, parser):
+        """
+        Adds the options controlling the seeded graph, the number of
+        requests and the output.
+        """
+        parser.add_argument("--users", type=int, default=1000)
+        parser.add_argument("--follows", type=int, default=20)
+        parser.add_argument("--tickets", type=int, default=5)
+        parser.add_argument("--reviews", type=int, default=5)
+        parser.add_argument("--photos", type=float, default=0.2)
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument(
+            "--viewers", type=int, default=10, help="Users sending the requests."
+        )
+        parser.add_argument(
+            "--requests", type=int, default=200, help="Timed requests per view."
+        )
+        parser.add_argument(
+            "--warmup", type=int, default=20, help="Untimed requests per view."
+        )
+        parser.add_argument(
+            "--profile-requests",
+            type=int,
+            default=20,
+            help="Requests per view counting the queries and the memory.",
+        )
+        parser.add_argument(
+            "--views",
+            nargs="+",
+            choices=list(VIEWS),
+            default=list(VIEWS),
+            help="Views to benchmark.",
+        )
+        parser.add_argument(
+            "--output",
+            type=Path,
+            help="File to write the JSON results to, - for the standard output.",
+        )
+        parser.add_argument(
+            "--compare",
+            type=Path,
+            help="JSON results of a previous run to compare with.",
+        )
+
+    def handle(self, *args, **options):
+        """
+        Seeds the graph, benchmarks each view and reports the results.
+        """
+        baseline = None
+        if options["compare"]:
+            baseline = json.loads(options["compare"].read_text())
+
+        with tempfile.TemporaryDirectory() as directory:
+            with override_settings(
+                DEBUG=False,
+                ALLOWED_HOSTS=["testserver"],
+                MEDIA_ROOT=Path(directory) / "media",
+            ), throwaway_database(Path(directory) / "bench_views.sqlite3"):
+                seeding_started = time.perf_counter()
+                contexts = self.seed(options)
+                seeding = time.perf_counter() - seeding_started
+                views = {
+                    name: self.run_view(name, contexts, options)
+                    for name in options["views"]
+                }
+
+        results = {
+            "commit": _commit(),
+            "python": platform.python_version(),
+            "django": django.get_version(),
+            "feed_mode": settings.FEED_MODE,
+            "options": {
+                name: options[name]
+                for name in (
+                    "users",
+                    "follows",
+                    "tickets",
+                    "reviews",
+                    "photos",
+                    "seed",
+                    "viewers",
+                    "requests",
+                    "warmup",
+                    "profile_requests",
+                )
+            },
+            "seeding_s": round(seeding, 2),
+            "views": views,
+        }
+
+        if options["output"] == Path("-"):
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        self.report(results, baseline)
+        if options["output"]:
+            options["output"].write_text(json.dumps(results, indent=2) + "\n")
+            self.stdout.write(f"Results written to {options['output']}")
+
+    def seed(self, options):
+        """
+        Seeds the graph and prepares the viewers: a logged in client, a
+        review to edit, tickets of others to review and users to follow.
+
+        Returns:
+            list: The context of each viewer.
+        """
+        users = seed_graph(
+            users=options["users"],
+            follows=options["follows"],
+            tickets=options["tickets"],
+            reviews=options["reviews"],
+            seed=options["seed"],
+            power_law=True,
+            photos=options["photos"],
+        )
+        if timeline.is_enabled():
+            for user in users:
+                timeline.rebuild(user)
+
+        per_viewer = math.ceil(
+            (options["warmup"] + options["requests"] + options["profile_requests"])
+            / options["viewers"]
+        )
+        rng = random.Random(options["seed"])
+        contexts = []
+        for viewer in rng.sample(users, min(options["viewers"], len(users))):
+            tickets = list(
+                Ticket.objects.exclude(user=viewer)
+                .order_by("id")
+                .values_list("id", flat=True)[:50]
+            )
+            review = Review.objects.create(
+                ticket_id=tickets[0], rating=3, headline="Bench", user=viewer
+            )
+            stats.review_added(review)
+            strangers = list(
+                User.objects.exclude(id__in=viewer.follows.values("id"))
+                .exclude(id=viewer.id)
+                .order_by("id")[:per_viewer]
+            )
+            if len(strangers) < per_viewer:
+                raise CommandError(
+                    "Not enough users to follow, raise --users or lower --requests."
+                )
+
+            client = Client()
+            client.force_login(viewer)
+            contexts.append(
+                {
+                    "viewer": viewer,
+                    "client": client,
+                    "tickets": tickets,
+                    "review": review,
+                    "strangers": strangers,
+                }
+            )
+        return contexts
+
+    def request(self, name, context):
+        """
+        Sends the next request of a viewer to a view.
+
+        Returns:
+            float: The duration of the request, in milliseconds.
+        """
+        view = VIEWS[name]
+        n = context["requests"]
+        context["requests"] += 1
+        url = reverse(name, args=view.get("args", lambda context, n: [])(context, n))
+        data = view.get("data", lambda context, n: {})(context, n)
+
+        started = time.perf_counter()
+        response = getattr(context["client"], view["method"])(url, data)
+        if response.streaming:
+            b"".join(response.streaming_content)
+        duration = (time.perf_counter() - started) * 1000
+
+        expected = 302 if view["method"] == "post" else 200
+        if response.status_code != expected:
+            raise CommandError(f"{name} answered {response.status_code}")
+        return duration
+
+    def run_view(self, name, contexts, options):
+        """
+        Warms up, times and profiles a view, the viewers taking turns.
+
+        Returns:
+            dict: The latency percentiles, query counts and peak memory.
+        """
+        for context in contexts:
+            context["requests"] = 0
+        turns = itertools.cycle(contexts)
+
+        for _ in range(options["warmup"]):
+            self.request(name, next(turns))
+
+        durations = sorted(
+            self.request(name, next(turns)) for _ in range(options["requests"])
+        )
+
+        # Reads may go to the "replica" connection, see litrevu.routers
+        queries = []
+        peak = 0
+        tracemalloc.start()
+        try:
+            for _ in range(options["profile_requests"]):
+                with ExitStack() as stack:
+                    captured = [
+                        stack.enter_context(CaptureQueriesContext(connections[alias]))
+                        for alias in connections
+                    ]
+                    tracemalloc.reset_peak()
+                    start, _ = tracemalloc.get_traced_memory()
+                    self.request(name, next(turns))
+                    peak = max(peak, tracemalloc.get_traced_memory()[1] - start)
+                queries.append(sum(len(capture) for capture in captured))
+        finally:
+            tracemalloc.stop()
+
+        result = {
+            f"p{percentile}_ms": round(_percentile(durations, percentile), 3)
+            for percentile in PERCENTILES
+        }
+        result["mean_ms"] = round(statistics.fmean(durations), 3)
+        result["queries"] = statistics.median(queries) if queries else None
+        result["max_queries"] = max(queries, default=None)
+        result["peak_memory_kib"] = round(peak / 1024, 1)
+        return result
+
+    def report(self, results, baseline):
+        """
+        Prints the results, with the change from the baseline if any.
+        """
+        self.stdout.write(
+            f"{'view':22s} {'p50 ms':>8s} {'p95 ms':>8s} {'p99 ms':>8s} "
+            f"{'queries':>7s} {'peak KiB':>9s}"
+        )
+        for name, result in results["views"].items():
+            line = (
+                f"{name:22s} {result['p50_ms']:8.2f} {result['p95_ms']:8.2f} "
+                f"{result['p99_ms']:8.2f} {str(result['queries']):>7s} "
+                f"{result['peak_memory_kib']:9.1f}"
+            )
+            previous = (baseline or {}).get("views", {}).get(name)
+            if previous:
+                change = (result["p50_ms"] / previous["p50_ms"] - 1) * 100
+                line += f"  p50 {change:+.0f}%"
+                if result["queries"] is not None and previous["queries"] is not None:
+                    line += f", queries {result['queries'] - previous['queries']:+}"
+            self.stdout.write(line)
+        if baseline:
+            self.stdout.write(f"Compared with commit {baseline.get('commit')}")
@@ -0,0 +1,86 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.template.defaultfilters import filesizeformat
+from django.utils import timezone
+
+from blog import orphans
+
+
+class Command(BaseCommand):
+    """
+    Deletes the photos no ticket displays any more, replaced on an edited
+    ticket or left by a deleted one, with the files no other photo uses.
+    Photos and files younger than --min-age are kept, as an upload in
+    progress may reference them. With --sweep, the files of the photos and
+    renditions directories that no photo references are deleted too.
+    """
+
+    help = "Deletes the photos displayed by no ticket and their unused files."
+
+    def add_arguments(self, parser):
+        """
+        Adds the options controlling the batches, the age of the collected
+        photos and the dry run.
+        """
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=200,
+            help="Photos deleted per transaction.",
+        )
+        parser.add_argument(
+            "--min-age",
+            type=int,
+            default=3600,
+            help="Seconds before an unreferenced photo or file is collected.",
+        )
+        parser.add_argument(
+            "--sweep",
+            action="store_true",
+            help="Also delete the files of the photos and renditions "
+            "directories referenced by no photo.",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only report what would be deleted.",
+        )
+
+    def handle(self, *args, **options):
+        """
+        Collects the photos batch by batch, then sweeps the files, and
+        reports the disk space reclaimed.
+        """
+        if options["batch_size"] < 1:
+            raise CommandError("--batch-size must be positive.")
+        before = timezone.now() - datetime.timedelta(seconds=options["min_age"])
+        verb = "Would delete" if options["dry_run"] else "Deleted"
+
+        photos = files = size = 0
+        for batch_photos, batch_files, batch_size in orphans.collect_photos(
+            before, options["batch_size"], options["dry_run"]
+        ):
+            photos += batch_photos
+            files += batch_files
+            size += batch_size
+            self.stdout.write(
+                f"{verb} {batch_photos} photos, {batch_files} files "
+                f"({filesizeformat(batch_size)})"
+            )
+
+        if options["sweep"]:
+            swept, swept_size = orphans.sweep_files(before, options["dry_run"])
+            self.stdout.write(
+                f"{verb} {swept} unreferenced files ({filesizeformat(swept_size)})"
+            )
+            files += swept
+            size += swept_size
+
+        reclaimed = "would be reclaimed" if options["dry_run"] else "reclaimed"
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{verb} {photos} photos and {files} files, "
+                f"{filesizeformat(size)} {reclaimed}"
+            )
+        )
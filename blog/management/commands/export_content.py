@@ -0,0 +1,83 @@
+import json
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from blog import transfer
+
+
+class Command(BaseCommand):
+    """
+    Exports users, follows, photos, tickets and reviews to one JSONL file
+    per model in a directory. Rows are streamed in id order with a server
+    side iterator, so memory stays bounded whatever the size of the tables.
+    Only the rows existing when the export started are exported, and
+    references to rows created meanwhile are dropped (see
+    blog.transfer.export_rows), so the export imports cleanly even when the
+    site is in use.
+    Run again on the same directory after an interruption, the export
+    resumes after the last complete row of each file. Media files are not
+    copied, see the --media option of import_content.
+    """
+
+    help = "Exports the content of the site to JSONL files."
+
+    def add_arguments(self, parser):
+        """
+        Adds the output directory and the size of the fetched chunks.
+        """
+        parser.add_argument("directory", type=Path, help="Output directory.")
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=2000,
+            help="Rows fetched from the database at once.",
+        )
+
+    def handle(self, *args, **options):
+        """
+        Exports every model in turn and reports the throughput.
+        """
+        directory = options["directory"]
+        directory.mkdir(parents=True, exist_ok=True)
+
+        manifest = transfer.read_json(directory / transfer.MANIFEST_NAME)
+        if manifest is not None and manifest.get("format") != transfer.FORMAT_VERSION:
+            raise CommandError(
+                f"{directory} holds an export of an older format, "
+                "export to an empty directory."
+            )
+        if manifest is None:
+            manifest = transfer.new_manifest()
+            transfer.write_json(directory / transfer.MANIFEST_NAME, manifest)
+
+        for name, model in transfer.SECTIONS:
+            path = directory / f"{name}.jsonl"
+            rows = transfer.export_rows(name, model, manifest["max_ids"])
+
+            last_id = None
+            if path.exists():
+                last_line = transfer.last_complete_line(path)
+                if last_line is not None:
+                    last_id = json.loads(last_line)["id"]
+                    rows = rows.filter(id__gt=last_id)
+
+            fields = transfer.section_fields(model)
+            started = time.perf_counter()
+            count = 0
+            with open(path, "ab") as file:
+                for values in rows.iterator(chunk_size=options["chunk_size"]):
+                    file.write(transfer.encode_row(fields, values))
+                    count += 1
+            elapsed = time.perf_counter() - started
+
+            resumed = f", resumed after id {last_id}" if last_id is not None else ""
+            self.stdout.write(
+                f"{name}: {count} rows in {elapsed:.1f}s "
+                f"({count / max(elapsed, 1e-9):.0f} rows/s{resumed})"
+            )
+
+        manifest["complete"] = True
+        transfer.write_json(directory / transfer.MANIFEST_NAME, manifest)
+        self.stdout.write(self.style.SUCCESS(f"Content exported to {directory}"))
@@ -0,0 +1,255 @@
+import time
+from pathlib import Path
+
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Max
+
+from blog import stats, transfer
+from blog.models import PHOTO_FILE_FIELDS, Photo, Ticket, Review
+from authentication.models import User
+
+# File of the export directory recording the progress of the import
+STATE_NAME = "import_state.json"
+
+# Rows imported between two progress lines
+PROGRESS_EVERY = 100_000
+
+
+class Command(BaseCommand):
+    """
+    Imports the JSONL files written by export_content, in batches inserted
+    with bulk_create. Imported rows get new ids, shifted past the largest id
+    of their table when the import started, and users are matched with the
+    existing ones by username: the content can be loaded into a site that
+    already has some. Files are read line by line, only one batch is held in
+    memory.
+
+    The progress is saved after each batch in import_state.json, next to the
+    files. Run the same command again after an interruption to resume; a
+    batch imported again is skipped as its ids already exist.
+    """
+
+    help = "Imports content exported by export_content."
+
+    def add_arguments(self, parser):
+        """
+        Adds the export directory, the batch size and the media option.
+        """
+        parser.add_argument("directory", type=Path, help="Export directory.")
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Rows inserted per transaction.",
+        )
+        parser.add_argument(
+            "--media",
+            type=Path,
+            help="MEDIA_ROOT of the exported site, to copy the photo files from.",
+        )
+
+    def handle(self, *args, **options):
+        """
+        Imports every model in turn, then copies the media files if asked.
+        """
+        directory = options["directory"]
+        manifest = transfer.read_json(directory / transfer.MANIFEST_NAME)
+        if manifest is None or not manifest["complete"]:
+            raise CommandError(
+                f"{directory} holds no complete export, run export_content again."
+            )
+        if manifest.get("format") != transfer.FORMAT_VERSION:
+            raise CommandError(
+                f"{directory} holds an export of an older format, "
+                "run export_content again."
+            )
+
+        state_path = directory / STATE_NAME
+        state = transfer.read_json(state_path)
+        if state is None:
+            state = {
+                "offsets": {
+                    name: model.objects.aggregate(max_id=Max("id"))["max_id"] or 0
+                    for name, model in transfer.SECTIONS
+                },
+                "positions": {},
+            }
+            transfer.write_json(state_path, state)
+        elif state.get("complete"):
+            self.stdout.write(f"Already imported, delete {state_path} to import again.")
+            return
+        else:
+            self.stdout.write("Resuming the interrupted import")
+
+        self.state = state
+        self.sections = {model: name for name, model in transfer.SECTIONS}
+        with transfer.preserve_timestamps(Photo, Ticket, Review):
+            for name, model in transfer.SECTIONS:
+                self.import_section(
+                    directory / f"{name}.jsonl", name, model, options, state_path
+                )
+
+        # Imported reviews may have been exported after their ticket
+        stats.recompute(Ticket.objects.filter(id__gt=state["offsets"]["tickets"]))
+        models = [model for _, model in transfer.SECTIONS]
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(no_style(), models):
+                cursor.execute(sql)
+
+        if options["media"]:
+            self.copy_media(directory / "photos.jsonl", options["media"])
+
+        state["complete"] = True
+        transfer.write_json(state_path, state)
+        self.stdout.write(
+            self.style.SUCCESS(
+                "Content imported. Run rebuild_timelines if FEED_MODE is push."
+            )
+        )
+
+    def import_section(self, path, name, model, options, state_path):
+        """
+        Imports a JSONL file in batches, from the position saved by the last
+        run, and reports the throughput.
+        """
+        position = self.state["positions"].get(name, 0)
+        started = time.perf_counter()
+        count = 0
+
+        with open(path, "rb") as file:
+            file.seek(position)
+            while True:
+                batch = []
+                while len(batch) < options["batch_size"]:
+                    line = file.readline()
+                    if not line.endswith(b"\n"):
+                        break
+                    batch.append(transfer.decode_row(model, line))
+                if not batch:
+                    break
+
+                with transaction.atomic():
+                    self.insert(model, batch)
+                self.state["positions"][name] = file.tell()
+                transfer.write_json(state_path, self.state)
+
+                count += len(batch)
+                if count % PROGRESS_EVERY < len(batch):
+                    self.report(name, count, started)
+
+        self.report(name, count, started)
+
+    def report(self, name, count, started):
+        """
+        Prints the number of rows imported and the throughput.
+        """
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f"{name}: {count} rows in {elapsed:.1f}s "
+            f"({count / max(elapsed, 1e-9):.0f} rows/s)"
+        )
+
+    def map_id(self, model, old_id):
+        """
+        Returns the id given to an imported row in this database.
+        """
+        return old_id + self.state["offsets"][self.sections[model]]
+
+    def insert(self, model, rows):
+        """
+        Inserts a batch of rows with their ids and foreign keys mapped to
+        this database. Rows whose id or unique fields already exist, imported
+        by an interrupted run, are skipped: a user whose username is taken
+        is merged with the existing user.
+        """
+        keys = transfer.user_keys(model)
+        if keys:
+            rows = self.resolve_users(rows, keys)
+
+        objects = []
+        for row in rows:
+            for field in model._meta.concrete_fields:
+                value = row.get(field.attname)
+                if value is None or field.related_model is User:
+                    continue
+                if field.primary_key:
+                    row[field.attname] = self.map_id(model, value)
+                elif field.is_relation:
+                    row[field.attname] = self.map_id(field.related_model, value)
+            if model is transfer.Follow:
+                # Follows are not referenced, they get new ids
+                del row["id"]
+            objects.append(model(**row))
+
+        model.objects.bulk_create(objects, ignore_conflicts=True)
+
+    def resolve_users(self, rows, keys):
+        """
+        Sets the user foreign keys of a batch to the users of this database
+        having the exported usernames, with one query. Nothing is kept
+        between batches, whatever the number of merged users. A user renamed
+        during the export is found by its imported id instead, and the rows
+        of a user found neither way are skipped.
+
+        Args:
+            rows: The decoded rows of the batch.
+            keys: The user foreign keys of the model, see transfer.user_keys.
+
+        Returns:
+            list: The rows whose users exist.
+        """
+        user_ids = dict(
+            User.objects.filter(
+                username__in={row[key] for row in rows for _, key in keys}
+            ).values_list("username", "id")
+        )
+        unknown = set()
+        for row in rows:
+            for field, key in keys:
+                user_id = user_ids.get(row.pop(key))
+                if user_id is None:
+                    user_id = self.map_id(User, row[field.attname])
+                    unknown.add(user_id)
+                row[field.attname] = user_id
+
+        if unknown:
+            unknown -= set(
+                User.objects.filter(id__in=unknown).values_list("id", flat=True)
+            )
+        return [
+            row
+            for row in rows
+            if not any(row[field.attname] in unknown for field, _ in keys)
+        ]
+
+    def copy_media(self, photos_path, media_root):
+        """
+        Copies the files of the imported photos from the media directory of
+        the exported site, skipping those already present.
+        """
+        started = time.perf_counter()
+        copied = missing = 0
+        with open(photos_path, "rb") as file:
+            for line in file:
+                row = transfer.decode_row(Photo, line)
+                for field in PHOTO_FILE_FIELDS:
+                    name = row.get(field)
+                    if not name or default_storage.exists(name):
+                        continue
+                    source = media_root / name
+                    if not source.exists():
+                        missing += 1
+                        continue
+                    with open(source, "rb") as content:
+                        default_storage.save(name, File(content))
+                    copied += 1
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f"media: {copied} files copied in {elapsed:.1f}s "
+            f"({copied / max(elapsed, 1e-9):.0f} files/s), {missing} missing"
+        )
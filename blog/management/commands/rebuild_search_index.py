@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from blog import search
+
+
+class Command(BaseCommand):
+    """
+    Recreates the full-text search index of tickets and reviews from scratch.
+    The index is otherwise kept in sync by SQLite triggers.
+    """
+
+    help = "Rebuilds the full-text search index of tickets and reviews."
+
+    def handle(self, *args, **options):
+        """
+        Refills the index and reports the number of indexed posts.
+        """
+        if connection.vendor != "sqlite":
+            raise CommandError("The search index requires SQLite with FTS5.")
+
+        count = search.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Indexed {count} posts"))
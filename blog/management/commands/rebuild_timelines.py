@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from blog import timeline
+from authentication.models import User
+
+
+class Command(BaseCommand):
+    """
+    Recomputes the materialized timelines used when FEED_MODE is "push".
+    Run it after switching to push mode or to repair drifted timelines.
+    """
+
+    help = "Rebuilds the materialized home feed timelines."
+
+    def add_arguments(self, parser):
+        """
+        Adds an optional list of usernames to restrict the rebuild.
+        """
+        parser.add_argument(
+            "usernames",
+            nargs="*",
+            help="Only rebuild the timelines of these users (default: all users).",
+        )
+
+    def handle(self, *args, **options):
+        """
+        Rebuilds the timeline of each selected user and reports the entry counts.
+        """
+        users = User.objects.order_by("id")
+        if options["usernames"]:
+            users = users.filter(username__in=options["usernames"])
+            missing = set(options["usernames"]) - set(
+                users.values_list("username", flat=True)
+            )
+            if missing:
+                raise CommandError(f"Unknown users: {', '.join(sorted(missing))}")
+
+        total = 0
+        for user in users.iterator():
+            count = timeline.rebuild(user)
+            total += count
+            self.stdout.write(f"{user.username}: {count} entries")
+
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt timelines: {total} entries"))
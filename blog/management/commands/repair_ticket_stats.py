@@ -0,0 +1,51 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from blog import stats
+
+
+class Command(BaseCommand):
+    """
+    Recomputes the review count, rating sum and last review time stored on
+    every ticket from its reviews. The statistics are otherwise updated with
+    each review, run it after importing data or deleting users.
+    """
+
+    help = "Recomputes the review statistics stored on the tickets."
+
+    def add_arguments(self, parser):
+        """
+        Adds the option to only report the drifted tickets.
+        """
+        parser.add_argument(
+            "--check",
+            action="store_true",
+            help="Only report the tickets whose statistics are wrong, and fail "
+            "if there are any.",
+        )
+
+    def handle(self, *args, **options):
+        """
+        Reports the drifted tickets, then repairs every ticket.
+        """
+        drifted = list(stats.find_drift())
+        for ticket in drifted:
+            self.stdout.write(
+                f"Ticket {ticket.id}: {ticket.review_count} reviews rated "
+                f"{ticket.rating_sum} in total, last one at "
+                f"{ticket.last_review_time}, {ticket.actual_count} rated "
+                f"{ticket.actual_sum} at {ticket.actual_last} expected"
+            )
+
+        if options["check"]:
+            if drifted:
+                raise CommandError(f"{len(drifted)} tickets have wrong statistics")
+            self.stdout.write(self.style.SUCCESS("Ticket statistics are up to date"))
+            return
+
+        count = stats.recompute()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Recomputed the statistics of {count} tickets "
+                f"({len(drifted)} were wrong)"
+            )
+        )
@@ -0,0 +1,98 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from blog import transfer
+from blog.seeding import seed_graph
+from authentication.models import User
+
+
+class Command(BaseCommand):
+    """
+    Fills the configured database with synthetic users, follows, tickets,
+    photos and reviews, for development and load tests. The same options
+    and seed always generate the same content. The rows are inserted with
+    bulk writes in one transaction, bypassing the signals: run
+    rebuild_timelines afterwards if FEED_MODE is push.
+    """
+
+    help = "Generates synthetic users, follows, tickets and reviews."
+
+    def add_arguments(self, parser):
+        """
+        Adds the options controlling the size and the shape of the content.
+        """
+        parser.add_argument("--users", type=int, default=1000)
+        parser.add_argument(
+            "--follows",
+            type=int,
+            default=20,
+            help="Mean number of users followed by each user.",
+        )
+        parser.add_argument(
+            "--tickets", type=int, default=5, help="Tickets created by each user."
+        )
+        parser.add_argument(
+            "--reviews", type=int, default=5, help="Reviews written by each user."
+        )
+        parser.add_argument(
+            "--photos",
+            type=float,
+            default=0.0,
+            help="Share of the tickets having a photo, between 0 and 1.",
+        )
+        parser.add_argument(
+            "--uniform",
+            action="store_true",
+            help="Every user follows --follows users drawn uniformly, instead "
+            "of power-law degrees.",
+        )
+        parser.add_argument(
+            "--exponent",
+            type=float,
+            default=1.0,
+            help="Exponent of the Zipf popularity of the followed users.",
+        )
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument(
+            "--password",
+            help="Password of the generated users, who cannot log in without one.",
+        )
+
+    def handle(self, *args, **options):
+        """
+        Generates the content and reports the number of rows inserted.
+        """
+        if not 0 <= options["photos"] <= 1:
+            raise CommandError("--photos must be between 0 and 1.")
+        prefix = f"seed{options['seed']}-"
+        if User.objects.filter(username__startswith=prefix).exists():
+            raise CommandError(f"Users {prefix}* already exist, choose another --seed.")
+
+        before = {name: model.objects.count() for name, model in transfer.SECTIONS}
+        started = time.perf_counter()
+        with transaction.atomic():
+            seed_graph(
+                users=options["users"],
+                follows=options["follows"],
+                tickets=options["tickets"],
+                reviews=options["reviews"],
+                seed=options["seed"],
+                password=options["password"],
+                power_law=not options["uniform"],
+                exponent=options["exponent"],
+                photos=options["photos"],
+            )
+        elapsed = time.perf_counter() - started
+
+        total = 0
+        for name, model in transfer.SECTIONS:
+            count = model.objects.count() - before[name]
+            total += count
+            self.stdout.write(f"{name}: {count}")
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{total} rows in {elapsed:.1f}s ({total / max(elapsed, 1e-9):.0f} rows/s)"
+            )
+        )
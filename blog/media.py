@@ -0,0 +1,190 @@
+import mimetypes
+import os
+import re
+import stat
+from pathlib import Path
+from urllib.parse import quote
+
+from django.conf import settings
+from django.contrib.auth.decorators import login_required
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseNotModified
+from django.utils._os import safe_join
+from django.utils.http import http_date, parse_http_date_safe
+from django.views.decorators.http import require_safe
+from django.views.static import was_modified_since
+
+# Names holding a hash of their content: a changed file gets a new name, so
+# what a browser cached under such a name never goes stale
+IMMUTABLE_NAME = re.compile(r"(?:^|[/._-])[0-9a-f]{16,}(?:[._-]|$)")
+
+# Range header asking for a single range of bytes, "start-end", "start-" or
+# "-length" for the end of the file. Requests for several ranges get the
+# whole file.
+BYTE_RANGE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+class FileRange:
+    """
+    File-like object reading a range of bytes of an open file. It exposes
+    the file descriptor with the file positioned at the start of the range,
+    so servers implementing wsgi.file_wrapper with sendfile send the range,
+    bounded by the Content-Length header, without copying it through Python.
+    """
+
+    def __init__(self, file, start, length):
+        file.seek(start)
+        self.file = file
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def close(self):
+        self.file.close()
+
+
+def is_immutable(name):
+    """
+    Tells whether a media file is named after a hash of its content.
+    """
+    return IMMUTABLE_NAME.search(name) is not None
+
+
+def byte_range(header, size):
+    """
+    Parses the Range header of a request.
+
+    Args:
+        header: The value of the Range header, None if there is none.
+        size: The size of the file, in bytes.
+
+    Returns:
+        tuple: (start, end) of the range requested, end included and clipped
+               to the file, None when the whole file must be sent.
+
+    Raises:
+        ValueError: The range starts past the end of the file.
+    """
+    match = BYTE_RANGE.match(header or "")
+    if match is None or match.groups() == ("", ""):
+        return None
+    first, last = match.groups()
+    if not first:
+        length = int(last)
+        if not length or not size:
+            raise ValueError("Empty suffix range")
+        return max(0, size - length), size - 1
+    start = int(first)
+    if last and int(last) < start:
+        return None
+    end = size - 1 if not last else min(int(last), size - 1)
+    if start >= size:
+        raise ValueError("Range past the end of the file")
+    return start, end
+
+
+def set_cache_headers(response, name):
+    """
+    Lets browsers keep files named after their content for
+    MEDIA_IMMUTABLE_MAX_AGE seconds without revalidating them, and
+    revalidate the other files on each use. Media are reserved to logged in
+    users, so shared caches must not store them.
+    """
+    if is_immutable(name):
+        response["Cache-Control"] = (
+            f"private, max-age={settings.MEDIA_IMMUTABLE_MAX_AGE}, immutable"
+        )
+    else:
+        response["Cache-Control"] = "private, no-cache"
+    return response
+
+
+@login_required
+@require_safe
+def serve_media(request, path):
+    """
+    Serves an uploaded file to logged in users.
+
+    With MEDIA_ACCEL set, the view only checks the access and the path, and
+    hands the file to the front server: nginx sends the file of the internal
+    location MEDIA_ACCEL_PREFIX named by X-Accel-Redirect, Apache with
+    mod_xsendfile or lighttpd the file named by X-Sendfile. They handle the
+    conditional and range requests themselves.
+
+    Otherwise the file is streamed by the application server, without
+    copying it through Python when it implements wsgi.file_wrapper with
+    sendfile. If-Modified-Since gets a 304 answer and a single byte range a
+    206 one, honoring If-Range.
+
+    Args:
+        request: The HTTP request object.
+        path: The path of the file, relative to MEDIA_ROOT.
+
+    Returns:
+        HttpResponse: The file, or the instructions for the front server.
+    """
+    try:
+        full_path = Path(safe_join(settings.MEDIA_ROOT, path))
+    except SuspiciousFileOperation:
+        raise Http404("Fichier introuvable.")
+    name = Path(os.path.relpath(full_path, settings.MEDIA_ROOT)).as_posix()
+    content_type = mimetypes.guess_type(full_path.name)[0] or "application/octet-stream"
+
+    if settings.MEDIA_ACCEL == "x-accel-redirect":
+        response = HttpResponse(content_type=content_type)
+        response["X-Accel-Redirect"] = settings.MEDIA_ACCEL_PREFIX + quote(name)
+        return set_cache_headers(response, name)
+    if settings.MEDIA_ACCEL == "x-sendfile":
+        response = HttpResponse(content_type=content_type)
+        response["X-Sendfile"] = str(full_path)
+        return set_cache_headers(response, name)
+
+    try:
+        status = full_path.stat()
+    except OSError:
+        raise Http404("Fichier introuvable.")
+    if not stat.S_ISREG(status.st_mode):
+        raise Http404("Fichier introuvable.")
+    last_modified = http_date(status.st_mtime)
+
+    if not was_modified_since(
+        request.headers.get("If-Modified-Since"), status.st_mtime
+    ):
+        response = HttpResponseNotModified()
+        response["Last-Modified"] = last_modified
+        return set_cache_headers(response, name)
+
+    try:
+        requested = byte_range(request.headers.get("Range"), status.st_size)
+    except ValueError:
+        response = HttpResponse(status=416)
+        response["Content-Range"] = f"bytes */{status.st_size}"
+        return response
+    # A range of an older version of the file would be mixed with the new one
+    if_range = request.headers.get("If-Range")
+    if if_range and parse_http_date_safe(if_range) != int(status.st_mtime):
+        requested = None
+
+    file = full_path.open("rb")
+    if requested is None:
+        response = FileResponse(file, content_type=content_type)
+    else:
+        start, end = requested
+        response = FileResponse(
+            FileRange(file, start, end - start + 1),
+            status=206,
+            content_type=content_type,
+        )
+        response["Content-Length"] = end - start + 1
+        response["Content-Range"] = f"bytes {start}-{end}/{status.st_size}"
+    response["Accept-Ranges"] = "bytes"
+    response["Last-Modified"] = last_modified
+    return set_cache_headers(response, name)
@@ -1,21 +1,52 @@
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.conf import settings
 from django.db import models
+from django.db.models import F, FloatField
+from django.db.models.functions import Cast
+
+from .storage import ContentAddressedStorage
+
+# Review statistics of a ticket, maintained by blog.stats with F-expressions
+# and never written back from a ticket instance that may be out of date
+TICKET_STATS_FIELDS = ("review_count", "rating_sum", "last_review_time")
+
+# Average rating of a ticket computed from its counter columns, NULL for a
+# ticket without reviews. Queries ordering by it use ticket_top_rated_idx.
+AVERAGE_RATING = Cast("rating_sum", FloatField()) / F("review_count")
+
+# File fields of a photo: the uploaded image and its renditions
+PHOTO_FILE_FIELDS = ("image", "thumbnail", "thumbnail_webp", "detail", "detail_webp")
 
 
 class Photo(models.Model):
     """
     Represents a photo uploaded by a user, which can be associated with a ticket or review.
+    Smaller renditions of the image are generated after the upload, see blog.images.
+    Images are stored under the hash of their content, so photos of identical
+    uploads share their files. Photos no ticket displays any more are deleted
+    by "python manage.py collect_photos".
 
     Attributes:
         image (ImageField): The image file uploaded by the user, optional.
         uploader (ForeignKey): The user who uploaded the photo.
         date_created (DateTimeField): Timestamp of when the photo was uploaded.
+        width (PositiveIntegerField): Width of the image once oriented, set with the renditions.
+        height (PositiveIntegerField): Height of the image once oriented, set with the renditions.
+        thumbnail (ImageField): JPEG rendition displayed in the feeds.
+        thumbnail_webp (ImageField): WebP version of the thumbnail.
+        detail (ImageField): Larger JPEG rendition for high density screens.
+        detail_webp (ImageField): WebP version of the detail rendition.
     """
 
-    image = models.ImageField(blank=True)
+    image = models.ImageField(blank=True, storage=ContentAddressedStorage())
     uploader = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     date_created = models.DateTimeField(auto_now_add=True)
+    width = models.PositiveIntegerField(null=True, blank=True)
+    height = models.PositiveIntegerField(null=True, blank=True)
+    thumbnail = models.ImageField(blank=True)
+    thumbnail_webp = models.ImageField(blank=True)
+    detail = models.ImageField(blank=True)
+    detail_webp = models.ImageField(blank=True)
 
 
 class Ticket(models.Model):
@@ -29,6 +60,14 @@ class Ticket(models.Model):
         user (ForeignKey): A reference to the user who created the ticket.
         image (ForeignKey): A reference to an optional photo linked to the ticket.
         time_created (DateTimeField): The timestamp when the ticket was created.
+        time_edited (DateTimeField): The timestamp of the last change, used to
+            version the cached rendering of the ticket.
+        review_count (PositiveIntegerField): The number of reviews of the ticket.
+        rating_sum (PositiveIntegerField): The sum of the ratings of its reviews.
+        last_review_time (DateTimeField): The creation time of its latest review.
+
+    The review statistics are maintained by blog.stats and recomputed with
+    "python manage.py repair_ticket_stats".
     """
 
     title = models.CharField(max_length=128)
@@ -37,6 +76,48 @@ class Ticket(models.Model):
     user = models.ForeignKey(to=settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     image = models.ForeignKey(Photo, null=True, on_delete=models.SET_NULL, blank=True)
     time_created = models.DateTimeField(auto_now_add=True)
+    time_edited = models.DateTimeField(auto_now=True)
+    review_count = models.PositiveIntegerField(default=0)
+    rating_sum = models.PositiveIntegerField(default=0)
+    last_review_time = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        """
+        Metaclass used to index the tickets of a user in feed order and the
+        tickets by average rating.
+        """
+
+        indexes = [
+            models.Index(fields=["user", "time_created"], name="ticket_user_time_idx"),
+            models.Index(
+                AVERAGE_RATING.desc(),
+                F("review_count").desc(),
+                F("id").desc(),
+                name="ticket_top_rated_idx",
+            ),
+        ]
+
+    def save(self, *args, **kwargs):
+        """
+        Saves the ticket without overwriting the review statistics of an
+        existing ticket, which may have changed since it was loaded.
+        """
+        if not self._state.adding and kwargs.get("update_fields") is None:
+            kwargs["update_fields"] = [
+                field.name
+                for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in TICKET_STATS_FIELDS
+            ]
+        super().save(*args, **kwargs)
+
+    @property
+    def average_rating(self):
+        """
+        Returns the average rating of the ticket, None without reviews.
+        """
+        if not self.review_count:
+            return None
+        return self.rating_sum / self.review_count
 
 
 class Review(models.Model):
@@ -49,7 +130,12 @@ class Review(models.Model):
         headline (CharField): The title or headline of the review.
         body (TextField): The body or content of the review. This field is optional.
         user (ForeignKey): A reference to the user who wrote the review.
+        ticket_user (ForeignKey): The user who created the reviewed ticket,
+            copied from the ticket so the reviews answering the tickets of a
+            user are read in feed order on an index.
         time_created (DateTimeField): The timestamp when the review was created.
+        time_edited (DateTimeField): The timestamp of the last change, used to
+            version the cached rendering of the review.
     """
 
     ticket = models.ForeignKey(to=Ticket, on_delete=models.CASCADE)
@@ -60,4 +146,77 @@ class Review(models.Model):
     headline = models.CharField(max_length=128)
     body = models.TextField(max_length=8192, blank=True)
     user = models.ForeignKey(to=settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    ticket_user = models.ForeignKey(
+        to=settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="+"
+    )
     time_created = models.DateTimeField(auto_now_add=True)
+    time_edited = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        """
+        Metaclass used to index the reviews of a user, the reviews
+        answering the tickets of a user and the reviews of a ticket in feed
+        order, and to look up the review of a user on a ticket.
+        """
+
+        indexes = [
+            models.Index(fields=["user", "time_created"], name="review_user_time_idx"),
+            models.Index(
+                fields=["ticket_user", "time_created"],
+                name="review_ticket_owner_time_idx",
+            ),
+            models.Index(
+                fields=["ticket", "time_created"], name="review_ticket_time_idx"
+            ),
+            models.Index(fields=["ticket", "user"], name="review_ticket_user_idx"),
+        ]
+
+    def save(self, *args, **kwargs):
+        """
+        Saves the review, copying the owner of its ticket on creation.
+        """
+        if self.ticket_user_id is None:
+            self.ticket_user_id = self.ticket.user_id
+        super().save(*args, **kwargs)
+
+
+class FeedEntry(models.Model):
+    """
+    Represents a post materialized in the timeline of a user. Entries are
+    written by a job when a ticket or review is published (fan-out on
+    write) so the home feed can be read from this single table when
+    FEED_MODE is "push".
+
+    Attributes:
+        owner (ForeignKey): The user whose timeline contains the entry.
+        ticket (ForeignKey): The ticket shown by the entry, if it is a ticket.
+        review (ForeignKey): The review shown by the entry, if it is a review.
+        time_created (DateTimeField): The creation time of the post, copied to
+            keep the timeline ordered without a join.
+    """
+
+    owner = models.ForeignKey(
+        to=settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="feed_entries",
+    )
+    # Deleting the post removes it from every timeline
+    ticket = models.ForeignKey(Ticket, null=True, blank=True, on_delete=models.CASCADE)
+    review = models.ForeignKey(Review, null=True, blank=True, on_delete=models.CASCADE)
+    time_created = models.DateTimeField()
+
+    class Meta:
+        """
+        Metaclass used to keep a post only once per timeline and to index the
+        timeline in reading order.
+        """
+
+        unique_together = (
+            ("owner", "ticket"),
+            ("owner", "review"),
+        )
+        indexes = [
+            models.Index(
+                fields=["owner", "-time_created", "-id"], name="feedentry_timeline_idx"
+            ),
+        ]
@@ -0,0 +1,131 @@
+import os
+from pathlib import Path
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+
+from .models import PHOTO_FILE_FIELDS, Photo
+from .renditions import RENDITIONS_DIR
+from .storage import PHOTOS_DIR
+
+
+def unreferenced_photos(uploaded_before):
+    """
+    Returns the photos displayed by no ticket, uploaded before a time. The
+    recent ones are spared: their ticket may not be saved yet.
+    """
+    return Photo.objects.filter(ticket__isnull=True, date_created__lt=uploaded_before)
+
+
+def _file_size(name, modified_before):
+    """
+    Returns the size of a media file, None if it is missing or was modified
+    after a time: it may have just been saved again for a new photo, see
+    blog.storage.
+    """
+    try:
+        status = os.stat(Path(settings.MEDIA_ROOT) / name)
+    except OSError:
+        return None
+    if status.st_mtime >= modified_before.timestamp():
+        return None
+    return status.st_size
+
+
+def _delete_files(names):
+    """
+    Deletes media files, ignoring those already gone.
+    """
+    for name in names:
+        (Path(settings.MEDIA_ROOT) / name).unlink(missing_ok=True)
+
+
+def collect_photos(uploaded_before, batch_size=200, dry_run=False):
+    """
+    Deletes the photos displayed by no ticket, by batches of ids, and their
+    files no other photo uses. A file is kept while a photo still displayed
+    by a ticket references it, identical uploads sharing their files. Each
+    batch is deleted in a transaction, its files once it is committed.
+
+    Args:
+        uploaded_before: Photos uploaded and files modified after this time
+            are kept.
+        batch_size: The number of photos deleted per transaction.
+        dry_run: Whether to only count what would be deleted.
+
+    Yields:
+        tuple: (photos, files, size) deleted by each batch, size in bytes.
+    """
+    orphans = unreferenced_photos(uploaded_before)
+    last_id = 0
+    while True:
+        batch = list(
+            orphans.filter(id__gt=last_id)
+            .order_by("id")
+            .values_list("id", *PHOTO_FILE_FIELDS)[:batch_size]
+        )
+        if not batch:
+            return
+        last_id = batch[-1][0]
+        ids = [row[0] for row in batch]
+        names = {name for row in batch for name in row[1:] if name}
+
+        # Photos that are orphans too do not keep a file, they are collected
+        # by this batch or a later one
+        used = Q()
+        for field in PHOTO_FILE_FIELDS:
+            used |= Q(**{f"{field}__in": names})
+        kept = set()
+        for row in (
+            Photo.objects.filter(used)
+            .exclude(id__in=orphans.values("id"))
+            .values_list(*PHOTO_FILE_FIELDS)
+        ):
+            kept.update(row)
+
+        files = {}
+        for name in names - kept:
+            size = _file_size(name, uploaded_before)
+            if size is not None:
+                files[name] = size
+
+        if not dry_run:
+            with transaction.atomic():
+                Photo.objects.filter(id__in=ids).delete()
+                transaction.on_commit(lambda names=list(files): _delete_files(names))
+        yield len(ids), len(files), sum(files.values())
+
+
+def sweep_files(modified_before, dry_run=False):
+    """
+    Deletes the files of the photos and renditions directories that no
+    photo references, left for instance by the photos deleted with their
+    uploader. The names referenced by every photo are held in memory.
+
+    Args:
+        modified_before: Files modified after this time are kept.
+        dry_run: Whether to only count what would be deleted.
+
+    Returns:
+        tuple: (files, size) deleted, size in bytes.
+    """
+    referenced = set()
+    for row in Photo.objects.values_list(*PHOTO_FILE_FIELDS).iterator(chunk_size=2000):
+        referenced.update(row)
+
+    count = total = 0
+    media_root = Path(settings.MEDIA_ROOT)
+    for directory in (PHOTOS_DIR, RENDITIONS_DIR):
+        for path in (media_root / directory).rglob("*"):
+            name = path.relative_to(media_root).as_posix()
+            if not path.is_file() or name in referenced:
+                continue
+            size = _file_size(name, modified_before)
+            if size is None:
+                continue
+            if not dry_run:
+                path.unlink(missing_ok=True)
+            count += 1
+            total += size
+    return count, total
@@ -0,0 +1,59 @@
+from pathlib import Path
+
+from PIL import Image, ImageOps
+
+# Directory of the renditions, relative to MEDIA_ROOT
+RENDITIONS_DIR = "renditions"
+
+# Bounding box of each rendition, the feeds display thumbnails 200px wide
+RENDITION_SIZES = {
+    "thumbnail": (400, 400),
+    "detail": (1200, 1200),
+}
+
+# Pillow format and file extension of each encoding, keyed by field suffix
+RENDITION_FORMATS = {
+    "": ("JPEG", "jpg"),
+    "_webp": ("WEBP", "webp"),
+}
+
+QUALITY = 82
+
+
+def render(source_path, media_root, key):
+    """
+    Generates the renditions of an uploaded photo. This function only relies
+    on Pillow so it can run in a worker process without Django.
+    The renditions are written without the EXIF metadata of the original,
+    after applying its orientation.
+
+    Args:
+        source_path: Path of the original image.
+        media_root: Path of the media directory to write the renditions in.
+        key: The name of the renditions, the hash of the original for the
+            content-addressed photos, so identical uploads share them.
+
+    Returns:
+        dict: The values of the Photo fields: oriented dimensions of the
+              original and names of the rendition files relative to media_root.
+    """
+    target_dir = Path(media_root) / RENDITIONS_DIR
+    target_dir.mkdir(parents=True, exist_ok=True)
+
+    with Image.open(source_path) as original:
+        image = ImageOps.exif_transpose(original)
+        if image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+
+    fields = {"width": image.width, "height": image.height}
+    for name, size in RENDITION_SIZES.items():
+        rendition = image.copy()
+        rendition.thumbnail(size, Image.Resampling.LANCZOS)
+        for suffix, (image_format, extension) in RENDITION_FORMATS.items():
+            relative_path = f"{RENDITIONS_DIR}/{key}_{name}.{extension}"
+            rendition.save(
+                Path(media_root) / relative_path, image_format, quality=QUALITY
+            )
+            fields[f"{name}{suffix}"] = relative_path
+
+    return fields
@@ -0,0 +1,185 @@
+import re
+
+from django.conf import settings
+from django.db import connection
+
+from . import feed
+
+SEARCH_TABLE = "blog_search"
+
+# Weight of each column in the bm25 ranking, in the order of the table columns
+COLUMN_WEIGHTS = {
+    "title": 10.0,
+    "author": 5.0,
+    "description": 1.0,
+    "headline": 8.0,
+    "body": 1.0,
+}
+
+# Tickets and reviews share the index: the rowid of a ticket is 2 * id and
+# the rowid of a review is 2 * id + 1
+SCHEMA = [
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5(
+        {", ".join(COLUMN_WEIGHTS)}, tokenize = 'unicode61 remove_diacritics 2'
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_ticket_insert
+    AFTER INSERT ON blog_ticket BEGIN
+        INSERT INTO {SEARCH_TABLE}(rowid, title, author, description)
+        VALUES (new.id * 2, new.title, new.author, new.description);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_ticket_update
+    AFTER UPDATE OF title, author, description ON blog_ticket BEGIN
+        DELETE FROM {SEARCH_TABLE} WHERE rowid = old.id * 2;
+        INSERT INTO {SEARCH_TABLE}(rowid, title, author, description)
+        VALUES (new.id * 2, new.title, new.author, new.description);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_ticket_delete
+    AFTER DELETE ON blog_ticket BEGIN
+        DELETE FROM {SEARCH_TABLE} WHERE rowid = old.id * 2;
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_review_insert
+    AFTER INSERT ON blog_review BEGIN
+        INSERT INTO {SEARCH_TABLE}(rowid, headline, body)
+        VALUES (new.id * 2 + 1, new.headline, new.body);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_review_update
+    AFTER UPDATE OF headline, body ON blog_review BEGIN
+        DELETE FROM {SEARCH_TABLE} WHERE rowid = old.id * 2 + 1;
+        INSERT INTO {SEARCH_TABLE}(rowid, headline, body)
+        VALUES (new.id * 2 + 1, new.headline, new.body);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_review_delete
+    AFTER DELETE ON blog_review BEGIN
+        DELETE FROM {SEARCH_TABLE} WHERE rowid = old.id * 2 + 1;
+    END
+    """,
+]
+
+
+def install(using_connection=connection):
+    """
+    Creates the FTS5 table and the triggers keeping it in sync with the
+    tickets and reviews, if they do not exist. Only SQLite is supported.
+
+    Args:
+        using_connection: The database connection to install the index in.
+
+    Returns:
+        bool: True if the index is available on this connection.
+    """
+    if using_connection.vendor != "sqlite":
+        return False
+    with using_connection.cursor() as cursor:
+        for statement in SCHEMA:
+            cursor.execute(statement)
+    return True
+
+
+def rebuild(using_connection=connection):
+    """
+    Refills the search index from the tickets and reviews, then merges its
+    segments for faster queries.
+
+    Returns:
+        int: The number of indexed posts.
+    """
+    install(using_connection)
+    with using_connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {SEARCH_TABLE}")
+        cursor.execute(
+            f"INSERT INTO {SEARCH_TABLE}(rowid, title, author, description) "
+            "SELECT id * 2, title, author, description FROM blog_ticket"
+        )
+        cursor.execute(
+            f"INSERT INTO {SEARCH_TABLE}(rowid, headline, body) "
+            "SELECT id * 2 + 1, headline, body FROM blog_review"
+        )
+        cursor.execute(
+            f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}) VALUES ('optimize')"
+        )
+        cursor.execute(f"SELECT count(*) FROM {SEARCH_TABLE}")
+        return cursor.fetchone()[0]
+
+
+def to_match_expression(query):
+    """
+    Turns free text typed by a user into an FTS5 query matching posts that
+    contain every word. Words are quoted so the FTS5 syntax cannot be injected.
+
+    Args:
+        query: The text typed by the user.
+
+    Returns:
+        str: The MATCH expression, empty if the text has no word.
+    """
+    words = re.findall(r"\w+", query)
+    if not words:
+        return ""
+    return " ".join(f'"{word}"' for word in words)
+
+
+def search_rows(query, page=1, page_size=None):
+    """
+    Runs a search and returns one page of results, every matching post
+    being ranked with bm25.
+
+    Args:
+        query: The text typed by the user.
+        page: The page number, starting at 1.
+        page_size: The number of results per page, defaults to FEED_PAGE_SIZE.
+
+    Returns:
+        tuple: (rows, has_next) where rows are (post_type, post_id, rank)
+               tuples, best match first.
+    """
+    page_size = page_size or settings.FEED_PAGE_SIZE
+    expression = to_match_expression(query)
+    if not expression:
+        return [], False
+
+    weights = ", ".join(str(weight) for weight in COLUMN_WEIGHTS.values())
+    with connection.cursor() as cursor:
+        # SQLite keeps only the LIMIT + OFFSET best rows while sorting, so
+        # the memory of a page does not grow with the number of matches
+        cursor.execute(
+            f"SELECT rowid, bm25({SEARCH_TABLE}, {weights}) AS rank "
+            f"FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s "
+            "ORDER BY rank LIMIT %s OFFSET %s",
+            [expression, page_size + 1, (page - 1) * page_size],
+        )
+        results = cursor.fetchall()
+
+    rows = [
+        (feed.REVIEW if rowid % 2 else feed.TICKET, rowid // 2, rank)
+        for rowid, rank in results[:page_size]
+    ]
+    return rows, len(results) > page_size
+
+
+def search(query, page=1, page_size=None):
+    """
+    Searches tickets and reviews and loads one page of matching posts.
+
+    Args:
+        query: The text typed by the user.
+        page: The page number, starting at 1.
+        page_size: The number of results per page, defaults to FEED_PAGE_SIZE.
+
+    Returns:
+        tuple: (posts, has_next) with posts in the format of feed.get_feed_page.
+    """
+    rows, has_next = search_rows(query, page, page_size)
+    return feed.hydrate_posts(rows), has_next
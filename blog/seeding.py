@@ -0,0 +1,290 @@
+import io
+import itertools
+import pkgutil
+import random
+import tempfile
+from contextlib import contextmanager
+from importlib import import_module
+from pathlib import Path
+
+from django.apps import apps
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.db import DEFAULT_DB_ALIAS, connection, connections
+from django.test import override_settings
+from PIL import Image
+
+from . import renditions, stats
+from .models import Photo, Ticket, Review
+from authentication.models import User
+
+# Pareto shape of the number of users followed by each user with
+# power_law=True, a few users follow many times the mean
+OUT_DEGREE_SHAPE = 2.0
+
+# Distinct image files shared by the seeded photos
+PHOTO_FILES = 8
+
+
+def _uniform_follows(rng, user_ids, follows):
+    """
+    Yields the follows of a graph where every user follows the same number
+    of users, drawn uniformly. The positions of the followed users are
+    drawn among the others' positions, those past the user's own being
+    shifted by one, so no list of the other users is built for each user.
+    """
+    count = min(follows, len(user_ids) - 1)
+    for position, user_id in enumerate(user_ids):
+        for index in rng.sample(range(len(user_ids) - 1), count):
+            followed_id = user_ids[index + (index >= position)]
+            yield User.follows.through(from_user_id=user_id, to_user_id=followed_id)
+
+
+def _power_law_follows(rng, user_ids, follows, exponent):
+    """
+    Yields the follows of a graph with power-law degrees, like on social
+    networks. The number of users followed by each user is drawn from a
+    Pareto distribution of mean about `follows`, and the followed users are
+    drawn with a Zipf popularity of the given exponent: a few accounts
+    gather most of the followers.
+    """
+    if len(user_ids) < 2:
+        return
+    by_popularity = list(user_ids)
+    rng.shuffle(by_popularity)
+    cum_weights = list(
+        itertools.accumulate(
+            1 / rank**exponent for rank in range(1, len(by_popularity) + 1)
+        )
+    )
+    scale = follows * (OUT_DEGREE_SHAPE - 1) / OUT_DEGREE_SHAPE
+
+    for user_id in user_ids:
+        degree = min(
+            len(user_ids) - 1,
+            max(1, round(scale * rng.paretovariate(OUT_DEGREE_SHAPE))),
+        )
+        followed_ids = set()
+        # Popular users are drawn again and again, give up after a few rounds
+        for _ in range(10):
+            followed_ids.update(
+                rng.choices(
+                    by_popularity,
+                    cum_weights=cum_weights,
+                    k=degree - len(followed_ids),
+                )
+            )
+            followed_ids.discard(user_id)
+            if len(followed_ids) >= degree:
+                break
+        for followed_id in sorted(followed_ids):
+            yield User.follows.through(from_user_id=user_id, to_user_id=followed_id)
+
+
+def _photo_files(rng, seed):
+    """
+    Writes the image files of the seeded photos with their renditions.
+
+    Returns:
+        list: The values of the Photo fields of each file.
+    """
+    files = []
+    for i in range(PHOTO_FILES):
+        buffer = io.BytesIO()
+        color = tuple(rng.randrange(256) for _ in range(3))
+        Image.new("RGB", (1600, 1200), color).save(buffer, "JPEG")
+        storage = Photo._meta.get_field("image").storage
+        name = storage.save("seed.jpg", ContentFile(buffer.getvalue()))
+        fields = renditions.render(
+            storage.path(name), settings.MEDIA_ROOT, Path(name).stem
+        )
+        files.append({"image": name, **fields})
+    return files
+
+
+def seed_graph(
+    users=40,
+    follows=8,
+    tickets=10,
+    reviews=6,
+    seed=0,
+    password=None,
+    power_law=False,
+    exponent=1.0,
+    photos=0.0,
+):
+    """
+    Fills the database with a reproducible graph of users, follows, tickets
+    and reviews, written with bulk inserts.
+
+    Args:
+        users: The number of users to create.
+        follows: The number of users followed by each user, the mean number
+            with power_law.
+        tickets: The number of tickets created by each user.
+        reviews: The number of reviews written by each user.
+        seed: The seed of the random generator.
+        password: The password of the created users, unusable if None.
+        power_law: Whether the numbers of followed users and of followers
+            follow power laws rather than being uniform.
+        exponent: The exponent of the popularity of the users with power_law.
+        photos: The share of the tickets having a photo, between 0 and 1.
+
+    Returns:
+        list: The created users.
+    """
+    rng = random.Random(seed)
+    hashed_password = make_password(password)
+
+    created_users = User.objects.bulk_create(
+        User(username=f"seed{seed}-user{i:05d}", password=hashed_password)
+        for i in range(users)
+    )
+    user_ids = [user.id for user in created_users]
+
+    User.follows.through.objects.bulk_create(
+        (
+            _power_law_follows(rng, user_ids, follows, exponent)
+            if power_law
+            else _uniform_follows(rng, user_ids, follows)
+        ),
+        batch_size=500,
+    )
+
+    new_tickets = [
+        Ticket(
+            title=f"Livre {rng.randrange(10**6)}",
+            author=f"Auteur {rng.randrange(1000)}",
+            description="Lorem ipsum " * rng.randrange(1, 20),
+            user_id=user_id,
+        )
+        for user_id in user_ids
+        for _ in range(tickets)
+    ]
+    if photos:
+        files = _photo_files(rng, seed)
+        illustrated = [ticket for ticket in new_tickets if rng.random() < photos]
+        created_photos = Photo.objects.bulk_create(
+            (
+                Photo(uploader_id=ticket.user_id, **rng.choice(files))
+                for ticket in illustrated
+            ),
+            batch_size=500,
+        )
+        for ticket, photo in zip(illustrated, created_photos):
+            ticket.image = photo
+    created_tickets = Ticket.objects.bulk_create(new_tickets, batch_size=500)
+    ticket_ids = [ticket.id for ticket in created_tickets]
+
+    Review.objects.bulk_create(
+        (
+            Review(
+                ticket_id=ticket.id,
+                ticket_user_id=ticket.user_id,
+                rating=rng.randrange(6),
+                headline=f"Critique {rng.randrange(10**6)}",
+                body="Lorem ipsum " * rng.randrange(1, 40),
+                user_id=user_id,
+            )
+            for user_id in user_ids
+            for ticket in rng.sample(
+                created_tickets, min(reviews, len(created_tickets))
+            )
+        ),
+        batch_size=500,
+    )
+    # Bulk inserts bypass the views maintaining the review statistics
+    if ticket_ids:
+        stats.recompute(
+            Ticket.objects.filter(id__range=(min(ticket_ids), max(ticket_ids)))
+        )
+
+    return created_users
+
+
+def session_cookie(user):
+    """
+    Opens a session logged in as a user, for benchmarks sending requests
+    without the test client.
+
+    Args:
+        user: The user to log in.
+
+    Returns:
+        str: The value of the Cookie header of the session.
+    """
+    session = import_module(settings.SESSION_ENGINE).SessionStore()
+    session[SESSION_KEY] = str(user.pk)
+    session[BACKEND_SESSION_KEY] = settings.AUTHENTICATION_BACKENDS[0]
+    session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+    session.create()
+    return f"{settings.SESSION_COOKIE_NAME}={session.session_key}"
+
+
+def migration_modules():
+    """
+    Returns the MIGRATION_MODULES setting of a test database. The migrations
+    of the project are generated locally (see README), so the tables of the
+    applications whose migrations package is still empty are created
+    straight from their models.
+
+    Returns:
+        dict: MIGRATION_MODULES with None for those applications.
+    """
+    modules = dict(settings.MIGRATION_MODULES)
+    for app_config in apps.get_app_configs():
+        try:
+            package = import_module(f"{app_config.name}.migrations")
+        except ImportError:
+            continue
+        if not any(pkgutil.iter_modules(package.__path__)):
+            modules[app_config.label] = None
+    return modules
+
+
+@contextmanager
+def throwaway_database(path=None):
+    """
+    Creates an empty, migrated test database for a benchmark and destroys it
+    on exit, see migration_modules. The connections mirroring the default
+    one, like the read-only "replica", are pointed at it too. The sessions
+    cache, which also holds the authenticated users, is moved to a temporary
+    location so that its entries are not mixed with those of the real
+    database.
+
+    Args:
+        path: The file of the database, in memory if None.
+    """
+    if path is not None:
+        connection.settings_dict["TEST"]["NAME"] = str(path)
+    with override_settings(MIGRATION_MODULES=migration_modules()):
+        old_name = connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, serialize=False
+        )
+    mirrors = {
+        alias: connections[alias].settings_dict["NAME"]
+        for alias in connections
+        if connections[alias].settings_dict["TEST"].get("MIRROR") == DEFAULT_DB_ALIAS
+    }
+    for alias in mirrors:
+        connections[alias].close()
+        connections[alias].creation.set_as_test_mirror(connection.settings_dict)
+    session_cache = settings.SESSION_CACHE_ALIAS
+    try:
+        with tempfile.TemporaryDirectory() as directory, override_settings(
+            CACHES={
+                **settings.CACHES,
+                session_cache: {
+                    **settings.CACHES[session_cache],
+                    "LOCATION": directory,
+                },
+            }
+        ):
+            yield
+    finally:
+        for alias, name in mirrors.items():
+            connections[alias].close()
+            connections[alias].settings_dict["NAME"] = name
+        connection.creation.destroy_test_db(old_name, verbosity=0)
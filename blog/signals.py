@@ -0,0 +1,127 @@
+from django.db import connections, transaction
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_migrate,
+    post_save,
+    pre_delete,
+)
+from django.dispatch import receiver
+
+from . import fragments, live, search, suggestions, timeline
+from .models import Photo, Ticket, Review
+from authentication.models import User
+
+
+@receiver(post_save, sender=Ticket)
+def fan_out_new_ticket(sender, instance, created, **kwargs):
+    """
+    Queues the push of a newly created ticket to the timelines that should
+    display it.
+    """
+    if created and timeline.is_enabled():
+        timeline.schedule_fan_out(instance)
+
+
+@receiver(post_save, sender=Review)
+def fan_out_new_review(sender, instance, created, **kwargs):
+    """
+    Queues the push of a newly created review to the timelines that should
+    display it.
+    """
+    if created and timeline.is_enabled():
+        timeline.schedule_fan_out(instance)
+
+
+@receiver(post_save, sender=Ticket)
+def publish_new_ticket(sender, instance, created, **kwargs):
+    """
+    Notifies the live feed connections once a new ticket is committed.
+    """
+    if created:
+        transaction.on_commit(lambda: live.publish_ticket(instance))
+
+
+@receiver(post_save, sender=Review)
+def publish_new_review(sender, instance, created, **kwargs):
+    """
+    Notifies the live feed connections once a new review is committed.
+    """
+    if created:
+        transaction.on_commit(lambda: live.publish_review(instance))
+
+
+@receiver(m2m_changed, sender=User.follows.through)
+def update_timelines_on_follow(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Backfills or prunes timelines when the follows graph changes.
+    The relation can be changed from either side: on the reverse side,
+    instance is the followed user and pk_set holds the followers.
+    """
+    if not timeline.is_enabled():
+        return
+
+    if action == "pre_clear":
+        related = instance.followers if reverse else instance.follows
+        pk_set = set(related.values_list("id", flat=True))
+    elif action not in ("post_add", "post_remove"):
+        return
+
+    update = timeline.backfill if action == "post_add" else timeline.prune
+    for pk in pk_set:
+        if reverse:
+            update(User.objects.get(pk=pk), instance.pk)
+        else:
+            update(instance, pk)
+
+
+@receiver(m2m_changed, sender=User.follows.through)
+def invalidate_follow_suggestions(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Drops the cached follow suggestions of the users whose follows changed.
+    On the reverse side, those are the followers in pk_set. The suggestions
+    of their own followers expire with SUGGESTIONS_CACHE_TIMEOUT.
+    """
+    if action == "pre_clear":
+        if reverse:
+            pk_set = set(instance.followers.values_list("id", flat=True))
+    elif action not in ("post_add", "post_remove"):
+        return
+
+    suggestions.invalidate(*(pk_set if reverse else [instance.pk]))
+
+
+@receiver(post_save, sender=Ticket)
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Ticket)
+@receiver(post_delete, sender=Review)
+def invalidate_post_fragment(sender, instance, **kwargs):
+    """
+    Drops the cached rendering of a saved or deleted ticket or review.
+    """
+    fragments.invalidate(instance)
+
+
+@receiver(post_save, sender=Photo)
+@receiver(pre_delete, sender=Photo)
+def invalidate_photo_fragments(sender, instance, **kwargs):
+    """
+    Drops the cached renderings of the tickets displaying a photo. Deletion is
+    handled before the fact, as the tickets are detached from the photo
+    without being saved.
+    """
+    fragments.invalidate(
+        *Ticket.objects.filter(image=instance).only(
+            "id", "time_edited", "review_count", "rating_sum"
+        )
+    )
+
+
+@receiver(post_migrate)
+def install_search_index(sender, using, **kwargs):
+    """
+    Creates the full-text search index and its triggers after the blog
+    tables are migrated.
+    """
+    if sender.name == "blog":
+        search.install(connections[using])
@@ -0,0 +1,169 @@
+from django.conf import settings
+from django.db.models import (
+    Case,
+    Count,
+    F,
+    Max,
+    OuterRef,
+    Q,
+    Subquery,
+    Sum,
+    Value,
+    When,
+)
+from django.db.models.functions import Coalesce, Greatest
+
+from . import feed
+from .models import AVERAGE_RATING, Ticket, Review
+
+# Review statistics stored on the tickets. Every change is a single UPDATE
+# computed by SQLite from the current values with F-expressions, so
+# concurrent reviews of the same ticket cannot overwrite each other's
+# counts. Callers run them in the transaction saving the review.
+
+
+def review_added(review):
+    """
+    Counts a new review in the statistics of its ticket.
+
+    Args:
+        review: The saved review.
+    """
+    Ticket.objects.filter(id=review.ticket_id).update(
+        review_count=F("review_count") + 1,
+        rating_sum=F("rating_sum") + review.rating,
+        # Reviews committed out of order keep the latest time
+        last_review_time=Greatest(
+            Coalesce("last_review_time", Value(review.time_created)),
+            Value(review.time_created),
+        ),
+    )
+
+
+def rating_changed(review, old_rating):
+    """
+    Applies the new rating of an edited review to the statistics of its
+    ticket.
+
+    Args:
+        review: The saved review.
+        old_rating: The rating of the review before the edit.
+    """
+    if review.rating != old_rating:
+        Ticket.objects.filter(id=review.ticket_id).update(
+            rating_sum=F("rating_sum") + (review.rating - old_rating)
+        )
+
+
+def review_removed(review):
+    """
+    Removes a deleted review from the statistics of its ticket.
+
+    Args:
+        review: The deleted review, with its ticket_id and rating.
+    """
+    Ticket.objects.filter(id=review.ticket_id).update(
+        review_count=F("review_count") - 1,
+        rating_sum=F("rating_sum") - review.rating,
+        last_review_time=Subquery(
+            Review.objects.filter(ticket=OuterRef("id"))
+            .order_by()
+            .values("ticket")
+            .annotate(latest=Max("time_created"))
+            .values("latest")
+        ),
+    )
+
+
+def recompute(tickets=None):
+    """
+    Recomputes the review statistics of tickets from their reviews, with a
+    single UPDATE.
+
+    Args:
+        tickets: A queryset of the tickets to repair, all of them if None.
+
+    Returns:
+        int: The number of tickets updated.
+    """
+    if tickets is None:
+        tickets = Ticket.objects.all()
+
+    reviews = Review.objects.filter(ticket=OuterRef("id")).order_by().values("ticket")
+    return tickets.update(
+        review_count=Coalesce(
+            Subquery(reviews.annotate(count=Count("id")).values("count")), 0
+        ),
+        rating_sum=Coalesce(
+            Subquery(reviews.annotate(total=Sum("rating")).values("total")), 0
+        ),
+        last_review_time=Subquery(
+            reviews.annotate(latest=Max("time_created")).values("latest")
+        ),
+    )
+
+
+def find_drift(tickets=None):
+    """
+    Returns the tickets whose statistics differ from their reviews: review
+    count, rating sum or last review time.
+
+    Args:
+        tickets: A queryset of the tickets to check, all of them if None.
+
+    Returns:
+        QuerySet: The tickets whose stored statistics are wrong.
+    """
+    if tickets is None:
+        tickets = Ticket.objects.all()
+
+    # Comparing a NULL last review time is neither true nor false in SQL,
+    # so the comparison is turned into a boolean with Case
+    in_sync = Q(review_count=F("actual_count"), rating_sum=F("actual_sum")) & (
+        Q(last_review_time=F("actual_last"))
+        | Q(last_review_time__isnull=True, actual_last__isnull=True)
+    )
+    return (
+        tickets.annotate(
+            actual_count=Count("review"),
+            actual_sum=Coalesce(Sum("review__rating"), 0),
+            actual_last=Max("review__time_created"),
+        )
+        .alias(in_sync=Case(When(in_sync, then=True), default=False))
+        .filter(in_sync=False)
+        .order_by("id")
+    )
+
+
+def top_rated(page=1, page_size=None, min_reviews=None):
+    """
+    Loads one page of the tickets with the best average rating, read in the
+    order of the ticket_top_rated_idx index. Ties are broken by the number
+    of reviews.
+
+    Args:
+        page: The page number, starting at 1.
+        page_size: The number of tickets per page, defaults to FEED_PAGE_SIZE.
+        min_reviews: The number of reviews a ticket needs to be ranked,
+                     defaults to TOP_RATED_MIN_REVIEWS.
+
+    Returns:
+        tuple: (posts, has_next) with posts in the format of feed.get_feed_page.
+    """
+    page_size = page_size or settings.FEED_PAGE_SIZE
+    if min_reviews is None:
+        min_reviews = settings.TOP_RATED_MIN_REVIEWS
+    offset = (page - 1) * page_size
+
+    tickets = list(
+        Ticket.objects.filter(review_count__gte=max(min_reviews, 1))
+        .select_related("user", "image")
+        .order_by(AVERAGE_RATING.desc(), "-review_count", "-id")[
+            offset : offset + page_size + 1
+        ]
+    )
+    posts = [
+        {"type": feed.TICKET, "ticket": ticket, "cursor": None}
+        for ticket in tickets[:page_size]
+    ]
+    return posts, len(tickets) > page_size
@@ -0,0 +1,54 @@
+import hashlib
+import os
+import posixpath
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+# Directory of the uploaded photos, relative to MEDIA_ROOT
+PHOTOS_DIR = "photos"
+
+
+@deconstructible(path="blog.storage.ContentAddressedStorage")
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    File system storage naming each file after the SHA-256 hash of its
+    content, in PHOTOS_DIR/<first two hex digits>/. Identical uploads share
+    one file: saving a content already stored returns the existing name
+    without writing it again. The existing file is touched instead, so that
+    blog.orphans, which spares recently modified files, does not delete it
+    while the photo referencing it again is being saved.
+
+    The names never change content, so browsers may cache them for good,
+    see blog.media.
+    """
+
+    def save(self, name, content, max_length=None):
+        """
+        Saves a file under the hash of its content.
+
+        Args:
+            name: The name of the uploaded file, only its extension is kept.
+            content: The content of the file.
+            max_length: The maximum length of the name.
+
+        Returns:
+            str: The name of the stored file.
+        """
+        if name is None:
+            name = content.name
+        if not hasattr(content, "chunks"):
+            content = File(content, name)
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        content.seek(0)
+
+        key = digest.hexdigest()
+        extension = posixpath.splitext(name)[1].lower()
+        name = f"{PHOTOS_DIR}/{key[:2]}/{key}{extension}"
+        if self.exists(name):
+            os.utime(self.path(name))
+            return name
+        return super().save(name, content, max_length)
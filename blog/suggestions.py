@@ -0,0 +1,125 @@
+from collections import Counter
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+
+from authentication.models import User
+
+Follow = User.follows.through
+
+
+def cache_key(user_id):
+    """
+    Returns the cache key of the follow suggestions of a user.
+    """
+    return f"suggestions:{user_id}"
+
+
+def follow_snapshot(user_id, followed_ids=None):
+    """
+    Loads the part of the follows graph needed to suggest users to follow,
+    with two queries whose size is bounded whatever the popularity of the
+    accounts involved: the users followed by the user, then the follows of
+    the SUGGESTIONS_MAX_SOURCES most recently followed ones, at most
+    SUGGESTIONS_MAX_FANOUT each (their most recent ones).
+
+    Args:
+        user_id: The id of the user to suggest accounts to.
+        followed_ids: The ids followed by the user, most recent first, if
+            already loaded.
+
+    Returns:
+        tuple: (followed_ids, adjacency) with the set of the ids followed by
+               the user and, for each source, the list of the ids it follows.
+    """
+    if followed_ids is None:
+        followed_ids = list(
+            Follow.objects.filter(from_user_id=user_id)
+            .order_by("-id")
+            .values_list("to_user_id", flat=True)
+        )
+    sources = followed_ids[: settings.SUGGESTIONS_MAX_SOURCES]
+
+    adjacency = {source: [] for source in sources}
+    edges = (
+        Follow.objects.filter(from_user_id__in=sources)
+        .annotate(
+            rank=Window(
+                RowNumber(), partition_by=F("from_user_id"), order_by=F("id").desc()
+            )
+        )
+        .filter(rank__lte=settings.SUGGESTIONS_MAX_FANOUT)
+        .values_list("from_user_id", "to_user_id")
+    )
+    for source, target in edges:
+        adjacency[source].append(target)
+    return set(followed_ids), adjacency
+
+
+def rank_candidates(user_id, followed_ids, adjacency, count=None):
+    """
+    Ranks the users followed by the users one follows, by the number of them
+    following each candidate. Ties are broken by the oldest account first.
+
+    Args:
+        user_id: The id of the user to suggest accounts to.
+        followed_ids: The ids of the users already followed.
+        adjacency: The ids followed by each followed user.
+        count: The number of suggestions, defaults to SUGGESTIONS_COUNT.
+
+    Returns:
+        list: (candidate_id, mutual_count) tuples, best first.
+    """
+    count = count or settings.SUGGESTIONS_COUNT
+    mutuals = Counter(
+        target
+        for targets in adjacency.values()
+        for target in targets
+        if target != user_id and target not in followed_ids
+    )
+    return sorted(mutuals.items(), key=lambda item: (-item[1], item[0]))[:count]
+
+
+def get_suggestions(user, followed_ids=None):
+    """
+    Returns the users suggested to a user, computed from a snapshot of the
+    follows graph and cached for SUGGESTIONS_CACHE_TIMEOUT seconds. The
+    cache of a user is dropped when they follow or unfollow someone.
+
+    Args:
+        user: The user to suggest accounts to.
+        followed_ids: The ids followed by the user, most recent first, if
+            already loaded.
+
+    Returns:
+        list: Dicts with the suggested "user" and their "mutual_count",
+              the number of followed users following them.
+    """
+    ranked = cache.get(cache_key(user.id))
+    if ranked is None:
+        ranked = rank_candidates(user.id, *follow_snapshot(user.id, followed_ids))
+        cache.set(cache_key(user.id), ranked, settings.SUGGESTIONS_CACHE_TIMEOUT)
+
+    users = User.objects.in_bulk([candidate_id for candidate_id, _ in ranked])
+    return [
+        {"user": users[candidate_id], "mutual_count": mutual_count}
+        for candidate_id, mutual_count in ranked
+        if candidate_id in users
+    ]
+
+
+async def aget_suggestions(user, followed_ids=None):
+    """
+    Async version of get_suggestions.
+    """
+    return await sync_to_async(get_suggestions)(user, followed_ids)
+
+
+def invalidate(*user_ids):
+    """
+    Drops the cached suggestions of the given users.
+    """
+    cache.delete_many([cache_key(user_id) for user_id in user_ids])
@@ -1,8 +1,22 @@
 from django import template
+from django.urls import reverse
+from django.utils.html import format_html
+from django.utils.safestring import mark_safe
+from blog import fragments
 from blog.models import Review
 
 register = template.Library()
 
+# Markup of the stars of each rating, one full star per point
+STAR_RATINGS = {
+    rating: mark_safe(
+        '<div class="stars">'
+        + '<span class="star text-dark">&#9733;</span>' * rating
+        + "</div>"
+    )
+    for rating in range(6)
+}
+
 
 @register.simple_tag(takes_context=True)
 def get_poster_display(context, user):
@@ -24,24 +38,27 @@ def get_poster_display(context, user):
 
 
 @register.filter
-def range_filter(value):
+def star_rating(rating):
     """
-    This filter creates a range of numbers from 1 to the given value.
+    This filter returns the stars of a rating, from markup computed once
+    for each rating rather than rendered for each review.
 
     Args:
-        value: The maximum value of the range.
+        rating: The rating of a review, from 0 to 5.
 
     Returns:
-        range: A range of numbers from 1 to the given value.
+        str: The HTML of the stars, empty for an unknown rating.
     """
-    return range(1, value + 1)
+    return STAR_RATINGS.get(rating, "")
 
 
 @register.simple_tag(takes_context=True)
 def is_ticket_already_reviewed(context, ticket):
     """
     Checks if a user has already written a review for a given ticket.
-    Returns True if a review exists, otherwise False.
+    Returns True if a review exists, otherwise False. Uses the flag set by
+    feed.annotate_reviewed when available and only queries the database
+    otherwise.
 
     Args:
         context: The context of the template.
@@ -50,6 +67,86 @@ def is_ticket_already_reviewed(context, ticket):
     Returns:
         bool: True if a review exists, otherwise False.
     """
+    already_reviewed = getattr(ticket, "already_reviewed", None)
+    if already_reviewed is not None:
+        return already_reviewed
+
     user = context["user"]
 
     return Review.objects.filter(ticket=ticket, user=user).exists()
+
+
+def _render_body(context, template_name, **values):
+    """
+    Renders the part of a post that does not depend on the viewer, stored in
+    the fragment cache.
+    """
+    body_template = context.template.engine.get_template(template_name)
+    return body_template.render(context.new(values))
+
+
+@register.simple_tag(takes_context=True)
+def ticket_snippet(context, ticket):
+    """
+    Renders a ticket. Its content and review statistics come from the
+    fragment cache, rendered with ticket_body.html on a miss. The author and
+    the button to review the ticket, which depend on the viewer, are
+    rendered here without a template: they are rendered for every post of
+    every page. The button is hidden if the user already reviewed the
+    ticket or is reviewing it.
+
+    Args:
+        context: The context of the template.
+        ticket: The ticket to render.
+
+    Returns:
+        str: The HTML of the ticket.
+    """
+    body = fragments.render(
+        ticket,
+        lambda: _render_body(context, "blog/partials/ticket_body.html", ticket=ticket),
+    )
+    author = ""
+    if ticket.user_id:
+        author = format_html("{} a demandé une critique", ticket.user)
+    button = ""
+    if (
+        ticket.id is not None
+        and not context.get("creating_review")
+        and not is_ticket_already_reviewed(context, ticket)
+    ):
+        button = format_html(
+            '<a href="{}" class="btn btn-primary">Créer une critique</a>',
+            reverse("create_review", args=[ticket.id]),
+        )
+    return format_html(
+        '<div class="ticket">\n<p>{}</p>\n{}{}\n</div>',
+        author,
+        mark_safe(body),
+        button,
+    )
+
+
+@register.simple_tag(takes_context=True)
+def review_snippet(context, review):
+    """
+    Renders a review followed by its ticket. Its content comes from the
+    fragment cache, rendered with review_body.html on a miss.
+
+    Args:
+        context: The context of the template.
+        review: The review to render.
+
+    Returns:
+        str: The HTML of the review and its ticket.
+    """
+    body = fragments.render(
+        review,
+        lambda: _render_body(context, "blog/partials/review_body.html", review=review),
+    )
+    return format_html(
+        '<div class="review">\n<p>{} a publié une critique</p>\n{}</div>\n{}',
+        review.user,
+        mark_safe(body),
+        ticket_snippet(context, review.ticket),
+    )
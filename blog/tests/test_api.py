@@ -0,0 +1,58 @@
+from datetime import timedelta
+
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from authentication.models import User
+from blog.models import Review, Ticket
+
+
+class TicketReviewPagesTests(TestCase):
+    """
+    api_ticket returns the reviews of a ticket one page at a time, with the
+    cursor and limit of the other endpoints.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.viewer = User.objects.create_user("viewer", password="pw-12345xyz")
+        cls.ticket = Ticket.objects.create(title="Populaire", user=cls.viewer)
+        reviews = Review.objects.bulk_create(
+            Review(
+                ticket=cls.ticket,
+                ticket_user=cls.viewer,
+                user=User.objects.create_user(f"reader{index}"),
+                rating=index % 6,
+                headline=f"Critique {index}",
+            )
+            for index in range(7)
+        )
+        # Two reviews share each creation time
+        now = timezone.now()
+        for index, review in enumerate(reviews):
+            Review.objects.filter(id=review.id).update(
+                time_created=now - timedelta(minutes=index // 2)
+            )
+        cls.expected = list(
+            cls.ticket.review_set.order_by("-time_created", "-id").values_list(
+                "id", flat=True
+            )
+        )
+
+    def setUp(self):
+        self.client.force_login(self.viewer)
+
+    def test_every_review_is_paginated(self):
+        url = reverse("api_ticket", args=[self.ticket.id])
+        found = []
+        params = {"limit": 3}
+        while True:
+            data = self.client.get(url, params).json()
+            self.assertEqual(data["id"], self.ticket.id)
+            self.assertLessEqual(len(data["reviews"]), 3)
+            found.extend(review["id"] for review in data["reviews"])
+            if data["next_cursor"] is None:
+                break
+            params["cursor"] = data["next_cursor"]
+        self.assertEqual(found, self.expected)
@@ -0,0 +1,67 @@
+import re
+
+from django.core.cache import caches
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import path
+
+from authentication.models import User
+from blog import async_views
+from litrevu.urls import urlpatterns as site_urlpatterns
+
+# The site with the async views also served under /async/
+urlpatterns = [
+    path("async/subscriptions/", async_views.subscriptions),
+    *site_urlpatterns,
+]
+
+CSRF_TOKEN = re.compile(r'name="csrfmiddlewaretoken" value="\w+"')
+
+
+@override_settings(ROOT_URLCONF=__name__)
+class AsyncViewsTests(TestCase):
+    """
+    The async views render the same pages as the sync views they replace.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        names = ["viewer", "alice", "bob", "carol", "dave", "erin", "frank"]
+        users = {
+            name: User.objects.create_user(name, password="pw-12345xyz")
+            for name in names
+        }
+        cls.viewer = users["viewer"]
+        # Followed in another order than their ids
+        for name in ("carol", "alice", "bob"):
+            cls.viewer.follows.add(users[name])
+        for name in ("erin", "dave", "alice"):
+            users[name].follows.add(cls.viewer)
+        users["alice"].follows.add(users["frank"], users["dave"])
+        users["bob"].follows.add(users["frank"])
+
+    def setUp(self):
+        self.client.force_login(self.viewer)
+        # The users and suggestions cached here must not leak to other tests
+        self.addCleanup(self.clear_caches)
+
+    def clear_caches(self):
+        for cache in caches.all():
+            cache.clear()
+
+    def page(self, page_path):
+        """
+        Returns the content of a page without its random CSRF tokens, and
+        the number of queries it ran with empty caches.
+        """
+        self.clear_caches()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(page_path)
+        self.assertEqual(response.status_code, 200)
+        return CSRF_TOKEN.sub("", response.content.decode()), len(queries)
+
+    def test_subscriptions(self):
+        self.assertEqual(
+            self.page("/async/subscriptions/"), self.page("/subscriptions/")
+        )
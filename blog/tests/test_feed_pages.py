@@ -0,0 +1,114 @@
+from django.db import connection
+from django.test import TestCase
+
+from authentication.models import User
+from blog import feed
+from blog.models import Review, Ticket
+
+
+def _walk(tickets, reviews, page_size):
+    """
+    Reads every page of a feed and returns the (post_type, post_id) of the
+    posts in order.
+    """
+    posts = []
+    cursor = None
+    while True:
+        rows, has_more = feed.get_feed_rows(
+            tickets, reviews, cursor=cursor, page_size=page_size
+        )
+        posts += [(row[0], row[1]) for row in rows]
+        if not has_more:
+            return posts
+        cursor = rows[-1][3]
+
+
+class FeedBranchTests(TestCase):
+    """
+    The branches of visible_branches show the same feed as visible_tickets
+    and visible_reviews, and a page costs the same whatever the history.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.viewer = User.objects.create_user("viewer", password="pw-12345xyz")
+        cls.followed = [
+            User.objects.create_user(f"followed{i}", password="pw-12345xyz")
+            for i in range(3)
+        ]
+        cls.stranger = User.objects.create_user("stranger", password="pw-12345xyz")
+        cls.viewer.follows.add(*cls.followed)
+        for author in [cls.viewer, *cls.followed, cls.stranger]:
+            for i in range(4):
+                ticket = Ticket.objects.create(title=f"Livre {i}", user=author)
+                # Reviews of the viewer are visible on any ticket, those of
+                # the others only on the tickets of visible users
+                for reviewer in (cls.viewer, cls.stranger):
+                    Review.objects.create(
+                        ticket=ticket, rating=i, headline="Avis", user=reviewer
+                    )
+
+    def branches(self):
+        followed_ids = list(self.viewer.follows.values_list("id", flat=True))
+        return feed.visible_branches(self.viewer, followed_ids)
+
+    def test_same_posts_as_the_visible_querysets(self):
+        expected = _walk(
+            feed.visible_tickets(self.viewer), feed.visible_reviews(self.viewer), 50
+        )
+        self.assertEqual(len(expected), len(set(expected)))
+        for page_size in (1, 3, 7, 100):
+            with self.subTest(page_size=page_size):
+                self.assertEqual(_walk(*self.branches(), page_size), expected)
+
+    def test_newer_pages(self):
+        rows, _ = feed.get_feed_rows(*self.branches(), page_size=100)
+        oldest = rows[-1][3]
+        newer, has_more = feed.get_feed_rows(
+            *self.branches(), cursor=oldest, page_size=5, newer=True
+        )
+        self.assertTrue(has_more)
+        self.assertEqual([row[:2] for row in newer], [row[:2] for row in rows[-6:-1]])
+
+    def steps(self, cursor):
+        """
+        Returns the number of SQLite virtual machine steps, by thousands,
+        of reading the page following a cursor.
+        """
+        steps = []
+        connection.ensure_connection()
+        connection.connection.set_progress_handler(lambda: steps.append(1), 1000)
+        try:
+            feed.get_feed_rows(*self.branches(), cursor=cursor, page_size=5)
+        finally:
+            connection.connection.set_progress_handler(None, 1000)
+        return len(steps)
+
+    def add_history(self, posts):
+        """
+        Adds posts to every visible user, older than the existing ones.
+        """
+        for author in [self.viewer, *self.followed]:
+            tickets = Ticket.objects.bulk_create(
+                Ticket(title="Ancien", user=author) for _ in range(posts)
+            )
+            Review.objects.bulk_create(
+                Review(
+                    ticket=ticket,
+                    ticket_user=author,
+                    rating=1,
+                    headline="Ancien",
+                    user=self.stranger,
+                )
+                for ticket in tickets
+            )
+        Ticket.objects.filter(title="Ancien").update(time_created="2000-01-01")
+        Review.objects.filter(headline="Ancien").update(time_created="2000-01-01")
+
+    def test_page_cost_does_not_grow_with_the_history(self):
+        rows, _ = feed.get_feed_rows(*self.branches(), page_size=10)
+        cursor = rows[-1][3]
+        self.add_history(50)
+        short = self.steps(cursor)
+        self.add_history(1000)
+        self.assertLessEqual(self.steps(cursor), short * 1.2 + 5)
@@ -0,0 +1,64 @@
+from django.test import TestCase
+from django.urls import reverse
+
+from authentication.models import User
+from blog import stats
+from blog.models import Review, Ticket
+
+
+class FeedValidatorTests(TestCase):
+    """
+    The home feed answers 304 while the page is unchanged, and a full page
+    once anything it displays changed.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.viewer = User.objects.create_user("viewer", password="pw-12345xyz")
+        cls.followed = User.objects.create_user("followed", password="pw-12345xyz")
+        cls.stranger = User.objects.create_user("stranger", password="pw-12345xyz")
+        cls.viewer.follows.add(cls.followed)
+        Ticket.objects.create(title="Suivi", user=cls.followed)
+        # Reviewed by the viewer, the ticket of a stranger shows in the feed
+        cls.ticket = Ticket.objects.create(title="Inconnu", user=cls.stranger)
+        review = Review.objects.create(
+            ticket=cls.ticket, rating=4, headline="Bien", user=cls.viewer
+        )
+        stats.review_added(review)
+
+    def setUp(self):
+        self.client.force_login(self.viewer)
+        # The first page sets the CSRF cookie, which is part of the ETag
+        self.client.get(reverse("home"))
+        response = self.client.get(reverse("home"))
+        self.assertEqual(response.status_code, 200)
+        self.etag = response["ETag"]
+
+    def assertChanged(self, changed):
+        response = self.client.get(reverse("home"), HTTP_IF_NONE_MATCH=self.etag)
+        self.assertEqual(response.status_code, 200 if changed else 304)
+
+    def test_unchanged_page_is_not_modified(self):
+        self.assertChanged(False)
+
+    def test_edited_ticket_of_a_review(self):
+        self.ticket.title = "Renommé"
+        self.ticket.save()
+        self.assertChanged(True)
+
+    def test_statistics_of_the_ticket_of_a_review(self):
+        # The review of another stranger is not in the feed of the viewer,
+        # but the number of reviews of the ticket is
+        review = Review.objects.create(
+            ticket=self.ticket,
+            rating=1,
+            headline="Bof",
+            user=User.objects.create_user("other", password="pw-12345xyz"),
+        )
+        stats.review_added(review)
+        self.assertChanged(True)
+
+    def test_renamed_followed_user(self):
+        self.followed.username = "renamed"
+        self.followed.save()
+        self.assertChanged(True)
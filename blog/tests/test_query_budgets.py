@@ -0,0 +1,418 @@
+import json
+import os
+import re
+from contextlib import contextmanager
+from pathlib import Path
+
+from django.core.cache import caches
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern, get_resolver, reverse
+
+from authentication.backends import CachedModelBackend
+from authentication.models import User
+from blog import feed, stats
+from blog.models import Review, Ticket
+from blog.seeding import seed_graph
+
+BASELINE_PATH = Path(__file__).resolve().parents[1] / "query_plans.json"
+
+# Set UPDATE_QUERY_PLANS=1 to record the current plans as the new baseline
+UPDATE_BASELINE = bool(os.environ.get("UPDATE_QUERY_PLANS"))
+
+# Tables of subqueries and joins aliased by Django, as in "blog_ticket" V0
+TABLE_ALIAS = re.compile(r'"(\w+)" (?:AS )?"?([A-Z]\d+)\b')
+
+# Access paths from the worst to the best one
+ACCESS_RANKS = {"scan": 0, "index scan": 1, "search": 2}
+
+
+def _ticket_of(fixture):
+    """
+    Creates a throwaway ticket of the viewer.
+    """
+    return Ticket.objects.create(title="Budget", user=fixture["viewer"])
+
+
+def _cursor_of(fixture):
+    """
+    Returns the feed cursor of the newest ticket of the viewer.
+    """
+    ticket = fixture["viewer"].ticket_set.latest("time_created")
+    return feed.encode_cursor(feed.TICKET, ticket.id, ticket.time_created)
+
+
+def _strangers_of(fixture):
+    """
+    Returns the usernames of up to 50 users the viewer does not follow yet,
+    and an unknown username.
+    """
+    viewer = fixture["viewer"]
+    usernames = (
+        User.objects.exclude(id__in=viewer.follows.values("id"))
+        .exclude(id=viewer.id)
+        .values_list("username", flat=True)[:50]
+    )
+    return "\n".join([*usernames, "budget-unknown-user"])
+
+
+def _review_of(fixture):
+    """
+    Creates a throwaway review of the viewer, counted in the statistics of
+    its ticket like the views do.
+    """
+    review = Review.objects.create(
+        ticket=fixture["other_ticket"],
+        rating=3,
+        headline="Budget",
+        user=fixture["viewer"],
+    )
+    stats.review_added(review)
+    return review
+
+
+def _media_of(fixture):
+    """
+    Stores a media file and returns its name.
+    """
+    return default_storage.save("budget/budget.txt", ContentFile(b"budget"))
+
+
+# Request made on each named route and number of SQL queries it runs.
+# "args" builds the URL arguments and "data" the POST data from the fixture,
+# sent as JSON when "content_type" is given.
+ROUTES = {
+    "login": {"method": "get", "budget": 0, "anonymous": True},
+    "signup": {"method": "get", "budget": 0, "anonymous": True},
+    "home": {"method": "get", "budget": 6},
+    "home_posts": {
+        "method": "get",
+        "budget": 4,
+        "data": lambda fixture: {"before": _cursor_of(fixture)},
+    },
+    "feed_stream": {"method": "get", "budget": 0},
+    "home_new_count": {
+        "method": "get",
+        "budget": 2,
+        "data": lambda fixture: {"after": _cursor_of(fixture)},
+    },
+    "user_posts": {"method": "get", "budget": 7},
+    "subscriptions": {"method": "get", "budget": 4},
+    "create_ticket": {"method": "get", "budget": 0},
+    "create_ticket_review": {"method": "get", "budget": 0},
+    "edit_ticket": {
+        "method": "get",
+        "budget": 1,
+        "args": lambda fixture: [fixture["own_ticket"].id],
+    },
+    "create_review": {
+        "method": "get",
+        "budget": 2,
+        "args": lambda fixture: [fixture["other_ticket"].id],
+    },
+    "edit_review": {
+        "method": "get",
+        "budget": 3,
+        "args": lambda fixture: [fixture["own_review"].id],
+    },
+    "follow_user": {
+        "method": "post",
+        "budget": 3,
+        "data": lambda fixture: {"username": fixture["stranger"].username},
+    },
+    "bulk_follow": {
+        "method": "post",
+        "budget": 4,
+        "data": lambda fixture: {"usernames": _strangers_of(fixture)},
+    },
+    "unfollow_user": {
+        "method": "post",
+        "budget": 2,
+        "args": lambda fixture: [fixture["followed"].id],
+    },
+    "delete_review": {
+        "method": "post",
+        "budget": 6,
+        "args": lambda fixture: [_review_of(fixture).id],
+    },
+    "delete_ticket": {
+        "method": "post",
+        "budget": 4,
+        "args": lambda fixture: [_ticket_of(fixture).id],
+    },
+    "top_rated": {"method": "get", "budget": 2},
+    "search": {
+        "method": "get",
+        "budget": 3,
+        "data": lambda fixture: {"q": "Livre"},
+    },
+    "fragment_cache_stats": {"method": "get", "budget": 0},
+    "api_feed": {"method": "get", "budget": 4},
+    "api_posts": {"method": "get", "budget": 4},
+    "api_ticket": {
+        "method": "get",
+        "budget": 3,
+        "args": lambda fixture: [fixture["other_ticket"].id],
+    },
+    "api_create_ticket": {
+        "method": "post",
+        "budget": 1,
+        "data": lambda fixture: {"title": "Budget", "author": "API"},
+        "content_type": "application/json",
+    },
+    "api_create_review": {
+        "method": "post",
+        "budget": 6,
+        "args": lambda fixture: [fixture["other_ticket"].id],
+        "data": lambda fixture: {"headline": "Budget", "rating": 4, "body": "API"},
+        "content_type": "application/json",
+    },
+    "media": {
+        "method": "get",
+        "budget": 0,
+        "args": lambda fixture: [_media_of(fixture)],
+    },
+    "logout": {"method": "post", "budget": 2},
+}
+
+
+def _named_routes():
+    """
+    Returns the names of the routes declared in the root URLconf.
+    """
+    return {
+        pattern.name
+        for pattern in get_resolver().url_patterns
+        if isinstance(pattern, URLPattern) and pattern.name
+    }
+
+
+def _explain(sql):
+    """
+    Returns the lines of the EXPLAIN QUERY PLAN output of a query.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(f"EXPLAIN QUERY PLAN {sql}")
+        return [row[-1] for row in cursor.fetchall()]
+
+
+def _index_tables():
+    """
+    Returns the table of every index of the database.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT name, tbl_name FROM sqlite_master WHERE type = 'index'")
+        return dict(cursor.fetchall())
+
+
+def _read_tables(sql, target, line, index_tables):
+    """
+    Returns the tables that the target of a SCAN or SEARCH line of a plan
+    may be: the target itself, or the tables it aliases in the query. An
+    alias reused for other tables in other subqueries is resolved with the
+    index the line reads.
+    """
+    aliased = {table for table, alias in TABLE_ALIAS.findall(sql) if alias == target}
+    if not aliased:
+        return {target}
+    index = re.search(r"INDEX (\w+)", line)
+    if index and index_tables.get(index[1]) in aliased:
+        return {index_tables[index[1]]}
+    return aliased
+
+
+def _table_accesses(queries, index_tables):
+    """
+    Returns the worst access path used for each table read by queries, a
+    list of (sql, plan) pairs, whatever the alias of the table.
+    """
+    accesses = {}
+    for sql, plan in queries:
+        for line in plan:
+            words = line.split()
+            if len(words) < 2 or words[0] not in ("SCAN", "SEARCH"):
+                continue
+            if words[0] == "SEARCH":
+                access = "search"
+            elif "USING" in words:
+                access = "index scan"
+            else:
+                access = "scan"
+            for table in _read_tables(sql, words[1], line, index_tables):
+                if (
+                    table not in accesses
+                    or ACCESS_RANKS[access] < ACCESS_RANKS[accesses[table]]
+                ):
+                    accesses[table] = access
+    return accesses
+
+
+def _regressions(baseline, accesses):
+    """
+    Returns the tables read with a worse access path than in the baseline,
+    as messages.
+    """
+    return [
+        f"{table} access went from {access} to {accesses[table]}"
+        for table, access in baseline.items()
+        if table in accesses and ACCESS_RANKS[accesses[table]] < ACCESS_RANKS[access]
+    ]
+
+
+@contextmanager
+def _rolled_back():
+    """
+    Runs a block in a savepoint rolled back at its end, so that every route
+    is requested on the same seeded data.
+    """
+    with transaction.atomic():
+        yield
+        transaction.set_rollback(True)
+
+
+class QueryBudgetTests(TestCase):
+    """
+    Query regression suite. Every named route is requested as a user of a
+    seeded graph and must run the number of SQL queries given by ROUTES.
+    The plans of its SELECT queries are compared with the baseline of
+    query_plans.json: a table going from an index search to a scan fails,
+    including the tables of subqueries read under an alias.
+
+    The test case holds a transaction open on "default", so the reads that
+    go to "replica" in production run there too, see litrevu.routers.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        seeded = seed_graph(users=60, seed=0, password="budget-password")
+        viewer = seeded[0]
+        cls.fixture = {
+            "viewer": viewer,
+            "followed": viewer.follows.first(),
+            "stranger": viewer.followers.exclude(id__in=viewer.follows.values("id"))
+            .exclude(id=viewer.id)
+            .first()
+            or seeded[-1],
+            "own_ticket": viewer.ticket_set.first(),
+            "other_ticket": Ticket.objects.exclude(user=viewer)
+            .exclude(review__user=viewer)
+            .first(),
+        }
+        cls.fixture["own_review"] = _review_of(cls.fixture)
+
+    def prepare(self, name):
+        """
+        Builds the request of a route: the client, logged in as the viewer
+        with their user cached like on any request after the first one, the
+        URL and the keyword arguments of the request.
+        """
+        route = ROUTES[name]
+        for cache in caches.all():
+            cache.clear()
+        client = Client()
+        if not route.get("anonymous"):
+            client.force_login(self.fixture["viewer"])
+            CachedModelBackend().get_user(self.fixture["viewer"].id)
+        url = reverse(name, args=route.get("args", lambda fixture: [])(self.fixture))
+        kwargs = {"data": route.get("data", lambda fixture: {})(self.fixture)}
+        if "content_type" in route:
+            kwargs["content_type"] = route["content_type"]
+        return getattr(client, route["method"]), url, kwargs
+
+    def send(self, method, url, kwargs):
+        """
+        Sends a request built by prepare and reads its whole body, running
+        the commit callbacks like outside of a test.
+        """
+        with self.captureOnCommitCallbacks(execute=True):
+            response = method(url, **kwargs)
+            if response.streaming:
+                # Streamed bodies run their queries while being consumed
+                b"".join(response.streaming_content)
+        self.assertLess(response.status_code, 400)
+
+    def test_every_route_has_a_budget(self):
+        self.assertEqual(_named_routes() - set(ROUTES), set())
+
+    def test_query_budgets(self):
+        for name, route in ROUTES.items():
+            with self.subTest(route=name), _rolled_back():
+                request = self.prepare(name)
+                with self.assertNumQueries(route["budget"]):
+                    self.send(*request)
+
+    def test_query_plans(self):
+        index_tables = _index_tables()
+        results = {}
+        for name in ROUTES:
+            with _rolled_back():
+                request = self.prepare(name)
+                with CaptureQueriesContext(connection) as captured:
+                    self.send(*request)
+                queries = [
+                    (query["sql"], _explain(query["sql"]))
+                    for query in captured.captured_queries
+                    if query["sql"].startswith("SELECT")
+                ]
+            results[name] = {
+                "queries": len(captured),
+                "tables": _table_accesses(queries, index_tables),
+                "plans": [plan for _, plan in queries],
+            }
+
+        if UPDATE_BASELINE:
+            BASELINE_PATH.write_text(json.dumps(results, indent=2) + "\n")
+            return
+        baseline = json.loads(BASELINE_PATH.read_text())
+        for name, result in results.items():
+            with self.subTest(route=name):
+                self.assertEqual(
+                    _regressions(
+                        baseline.get(name, {}).get("tables", {}), result["tables"]
+                    ),
+                    [],
+                )
+
+    def test_scan_of_an_aliased_table_is_a_regression(self):
+        index_tables = _index_tables()
+        # U0 is the ticket table in one subquery and the follows in the other
+        sql = (
+            'SELECT V0."id" FROM "blog_ticket" V0 WHERE V0."user_id" IN '
+            '(SELECT U0."to_user_id" FROM "authentication_user_follows" U0) '
+            'OR V0."id" IN (SELECT U0."id" FROM "blog_ticket" U0)'
+        )
+        follows = (
+            "SEARCH U0 USING COVERING INDEX "
+            "authentication_user_follows_from_user_id_fc061e74 (from_user_id=?)"
+        )
+        self.assertEqual(
+            _read_tables(sql, "U0", follows, index_tables),
+            {"authentication_user_follows"},
+        )
+        baseline = _table_accesses(
+            [
+                (
+                    sql,
+                    [
+                        "SEARCH V0 USING COVERING INDEX ticket_user_time_idx (user_id=?)",
+                        follows,
+                    ],
+                )
+            ],
+            index_tables,
+        )
+        self.assertEqual(
+            baseline,
+            {"blog_ticket": "search", "authentication_user_follows": "search"},
+        )
+
+        scanned = _table_accesses([(sql, ["SCAN V0", follows])], index_tables)
+        self.assertEqual(
+            _regressions(baseline, scanned),
+            ["blog_ticket access went from search to scan"],
+        )
+        scanned = _table_accesses([(sql, ["SCAN U0"])], index_tables)
+        self.assertEqual(len(_regressions(baseline, scanned)), 2)
@@ -0,0 +1,44 @@
+from django.test import TestCase
+
+from authentication.models import User
+from blog import feed, search
+from blog.models import Ticket
+
+
+class SearchRankingTests(TestCase):
+    """
+    search_rows ranks every matching post with bm25, however many posts
+    match and however old the best one is.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user("reader", password="pw-12345xyz")
+        cls.oldest = Ticket.objects.create(title="Dune", author="Frank", user=user)
+        # Newer posts only mentioning the word once in a long description
+        Ticket.objects.bulk_create(
+            Ticket(
+                title=f"Roman {index}",
+                description="Une longue critique de science-fiction " * 20 + "dune",
+                user=user,
+            )
+            for index in range(6000)
+        )
+
+    def test_older_more_relevant_post_comes_first(self):
+        rows, has_next = search.search_rows("dune", page_size=10)
+        self.assertEqual(rows[0][:2], (feed.TICKET, self.oldest.id))
+        self.assertTrue(has_next)
+
+    def test_every_match_is_paginated(self):
+        found = []
+        page = 1
+        has_next = True
+        while has_next:
+            rows, has_next = search.search_rows("dune", page, page_size=1000)
+            found.extend(rows)
+            page += 1
+        self.assertEqual(len(found), 6001)
+        self.assertEqual(found[0][1], self.oldest.id)
+        ranks = [rank for _, _, rank in found]
+        self.assertEqual(ranks, sorted(ranks))
@@ -0,0 +1,48 @@
+from datetime import timedelta
+
+from django.test import TestCase
+
+from authentication.models import User
+from blog import stats
+from blog.models import Review, Ticket
+
+
+class TicketStatsDriftTests(TestCase):
+    """
+    find_drift reports the tickets whose stored statistics differ from
+    their reviews, and recompute repairs them.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("reviewer", password="pw-12345xyz")
+        cls.ticket = Ticket.objects.create(title="Relu", user=cls.user)
+        cls.review = Review.objects.create(
+            ticket=cls.ticket, rating=4, headline="Bien", user=cls.user
+        )
+        stats.review_added(cls.review)
+        # Without reviews, the statistics are zero and the last time is NULL
+        cls.unreviewed = Ticket.objects.create(title="Seul", user=cls.user)
+
+    def test_statistics_in_sync(self):
+        self.assertQuerySetEqual(stats.find_drift(), [])
+
+    def test_review_count_drift(self):
+        Ticket.objects.filter(id=self.ticket.id).update(review_count=2)
+        self.assertQuerySetEqual(stats.find_drift(), [self.ticket])
+
+    def test_last_review_time_drift(self):
+        Ticket.objects.filter(id=self.ticket.id).update(
+            last_review_time=self.review.time_created - timedelta(days=1)
+        )
+        Ticket.objects.filter(id=self.unreviewed.id).update(
+            last_review_time=self.review.time_created
+        )
+        self.assertQuerySetEqual(stats.find_drift(), [self.ticket, self.unreviewed])
+
+        self.assertEqual(stats.recompute(), 2)
+        self.assertQuerySetEqual(stats.find_drift(), [])
+        self.ticket.refresh_from_db()
+        self.unreviewed.refresh_from_db()
+        self.assertEqual(self.ticket.last_review_time, self.review.time_created)
+        self.assertIsNone(self.unreviewed.last_review_time)
@@ -0,0 +1,84 @@
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from authentication.models import User
+from blog import timeline
+from blog.models import FeedEntry, Review, Ticket
+from jobs import queue
+from jobs.models import Job
+
+
+@override_settings(FEED_MODE="push", TIMELINE_FAN_OUT_INLINE=False)
+class FanOutJobTests(TestCase):
+    """
+    New posts are pushed to the timelines by a job, not by the request
+    publishing them.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user("author", password="pw-12345xyz")
+        cls.reviewer = User.objects.create_user("reviewer", password="pw-12345xyz")
+        cls.followers = [
+            User.objects.create_user(f"follower{index}", password="pw-12345xyz")
+            for index in range(5)
+        ]
+        cls.author.followers.add(cls.reviewer, *cls.followers)
+
+    def run_jobs(self):
+        while job := queue.claim("test"):
+            self.assertTrue(queue.run(job), Job.objects.get(id=job.id).last_error)
+
+    def owners(self, **post):
+        return set(FeedEntry.objects.filter(**post).values_list("owner_id", flat=True))
+
+    def test_ticket_is_pushed_by_a_job(self):
+        with self.assertNumQueries(2):
+            ticket = Ticket.objects.create(title="Nouveau", user=self.author)
+        self.assertEqual(self.owners(ticket=ticket), set())
+
+        self.run_jobs()
+        self.assertEqual(
+            self.owners(ticket=ticket),
+            {self.author.id, self.reviewer.id, *(user.id for user in self.followers)},
+        )
+
+    def test_review_is_pushed_by_a_job(self):
+        ticket = Ticket.objects.create(title="Nouveau", user=self.author)
+        review = Review.objects.create(
+            ticket=ticket, rating=3, headline="Pas mal", user=self.reviewer
+        )
+        self.run_jobs()
+        self.assertEqual(
+            self.owners(review=review),
+            {self.author.id, self.reviewer.id, *(user.id for user in self.followers)},
+        )
+
+    def test_followers_are_written_in_batches(self):
+        self.addCleanup(setattr, timeline, "BATCH_SIZE", timeline.BATCH_SIZE)
+        timeline.BATCH_SIZE = 2
+        Ticket.objects.create(title="Nouveau", user=self.author)
+
+        with CaptureQueriesContext(connection) as queries:
+            self.run_jobs()
+        inserts = [
+            query["sql"]
+            for query in queries
+            if query["sql"].startswith('INSERT OR IGNORE INTO "blog_feedentry"')
+        ]
+        # The author and 6 followers, 2 per INSERT
+        self.assertEqual(len(inserts), 4)
+        self.assertEqual(FeedEntry.objects.count(), 7)
+
+    def test_deleted_post_is_skipped(self):
+        ticket = Ticket.objects.create(title="Supprimé", user=self.author)
+        ticket.delete()
+        self.run_jobs()
+        self.assertFalse(FeedEntry.objects.exists())
+
+    @override_settings(TIMELINE_FAN_OUT_INLINE=True)
+    def test_inline_fan_out(self):
+        ticket = Ticket.objects.create(title="Nouveau", user=self.author)
+        self.assertFalse(Job.objects.exists())
+        self.assertEqual(len(self.owners(ticket=ticket)), 7)
@@ -0,0 +1,69 @@
+import tempfile
+from pathlib import Path
+
+from django.conf import settings
+from django.test import SimpleTestCase, override_settings
+
+from blog.upload_samples import (
+    FLAT_TOLERANCE,
+    jpeg_photo,
+    measure_upload,
+    png_bomb,
+    write_upload_request,
+)
+
+MIB = 1024 * 1024
+
+
+class BoundedUploadTests(SimpleTestCase):
+    """
+    Photos are streamed to disk by BoundedUploadHandler and checked by
+    PhotoForm from their header: the peak memory of an upload does not
+    depend on the size of the photo.
+    """
+
+    def setUp(self):
+        self.body = Path(self.enterContext(tempfile.TemporaryDirectory())) / "body"
+
+    def upload(self, content):
+        """
+        Uploads content as the image of the photo form with the configured
+        handlers.
+
+        Returns:
+            tuple: (form, peak) the validated form and the peak memory of
+                   the upload, in bytes.
+        """
+        length = write_upload_request(self.body, content)
+        form, peak, _ = measure_upload(settings.FILE_UPLOAD_HANDLERS, self.body, length)
+        return form, peak
+
+    def assertRejected(self, form, code):
+        self.assertFalse(form.is_valid())
+        self.assertEqual(
+            [error.code for error in form.errors.as_data()["image"]], [code]
+        )
+
+    @override_settings(UPLOAD_MAX_SIZE=9 * MIB)
+    def test_peak_memory_is_flat(self):
+        # Imports and caches filled by a first upload are not counted
+        self.upload(jpeg_photo(0))
+        peaks = []
+        for size in (1, 2, 4, 8):
+            form, peak = self.upload(jpeg_photo(size * MIB))
+            self.assertTrue(form.is_valid(), form.errors)
+            peaks.append(peak)
+        # None of the photos is held in memory, even the small ones
+        self.assertLess(max(peaks) - min(peaks), FLAT_TOLERANCE, peaks)
+        self.assertLess(max(peaks), MIB, peaks)
+
+    @override_settings(UPLOAD_MAX_SIZE=MIB)
+    def test_oversized_upload_is_rejected(self):
+        form, peak = self.upload(jpeg_photo(4 * MIB))
+        self.assertRejected(form, "file_too_large")
+        self.assertLess(peak, MIB)
+
+    def test_pixel_bomb_is_rejected(self):
+        form, peak = self.upload(png_bomb(50_000, 50_000))
+        self.assertRejected(form, "too_many_pixels")
+        self.assertLess(peak, MIB)
@@ -0,0 +1,282 @@
+from itertools import chain, islice
+
+from django.conf import settings
+from django.db.models import Q
+
+from . import feed
+from .models import FeedEntry, Ticket, Review
+from authentication.models import User
+from jobs.queue import enqueue, task
+
+# Number of entries written per INSERT when filling timelines, and of
+# followers read at once by a fan-out
+BATCH_SIZE = 500
+
+
+def is_enabled():
+    """
+    Tells whether timelines are materialized, i.e. whether FEED_MODE is "push".
+    """
+    return settings.FEED_MODE == "push"
+
+
+def _follower_ids(user_id, exclude=()):
+    """
+    Yields the ids of the users following the given user, read BATCH_SIZE
+    at a time.
+
+    Args:
+        user_id: The id of the followed user.
+        exclude: Ids of followers to skip.
+    """
+    return (
+        User.objects.filter(follows=user_id)
+        .exclude(id__in=exclude)
+        .values_list("id", flat=True)
+        .iterator(chunk_size=BATCH_SIZE)
+    )
+
+
+def _write_entries(entries):
+    """
+    Inserts feed entries in batches, skipping those already in a timeline.
+    Entries may be given as a generator, only one batch is held in memory.
+    """
+    entries = iter(entries)
+    while batch := list(islice(entries, BATCH_SIZE)):
+        FeedEntry.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+@task
+def fan_out_ticket(ticket_id):
+    """
+    Job adding a new ticket to the timeline of its author and of their
+    followers, see schedule_fan_out.
+
+    Args:
+        ticket_id: The id of the ticket, which may have been deleted since.
+    """
+    ticket = Ticket.objects.filter(id=ticket_id).first()
+    if ticket is None:
+        return
+    authors = {ticket.user_id}
+    _write_entries(
+        FeedEntry(owner_id=owner_id, ticket=ticket, time_created=ticket.time_created)
+        for owner_id in chain(authors, _follower_ids(ticket.user_id, authors))
+    )
+
+
+@task
+def fan_out_review(review_id):
+    """
+    Job adding a new review to the timeline of its author, of the author of
+    the reviewed ticket and of the followers of the latter, see
+    schedule_fan_out.
+
+    Args:
+        review_id: The id of the review, which may have been deleted since.
+    """
+    review = Review.objects.filter(id=review_id).first()
+    if review is None:
+        return
+    authors = {review.user_id, review.ticket_user_id}
+    _write_entries(
+        FeedEntry(owner_id=owner_id, review=review, time_created=review.time_created)
+        for owner_id in chain(authors, _follower_ids(review.ticket_user_id, authors))
+    )
+
+
+def schedule_fan_out(post):
+    """
+    Queues the fan-out of a newly created ticket or review as a
+    fan_out_ticket or fan_out_review job, run by the run_jobs workers so the
+    request publishing the post does not write one entry per follower. The
+    job is enqueued in the current transaction: it is only seen once the
+    post is committed. The entries keep the creation time of the post, so
+    the timelines stay ordered however late the job runs. The fan-out is run
+    inline when TIMELINE_FAN_OUT_INLINE is True.
+
+    Args:
+        post: The ticket or review that was just created.
+    """
+    if isinstance(post, Ticket):
+        job, kwargs = fan_out_ticket, {"ticket_id": post.id}
+    else:
+        job, kwargs = fan_out_review, {"review_id": post.id}
+
+    if settings.TIMELINE_FAN_OUT_INLINE:
+        job(**kwargs)
+    else:
+        enqueue(job, **kwargs)
+
+
+def backfill(user, followed_user_id):
+    """
+    Copies the existing posts of a newly followed user into a timeline.
+
+    Args:
+        user: The user who started following someone.
+        followed_user_id: The id of the followed user.
+    """
+    tickets = Ticket.objects.filter(user_id=followed_user_id)
+    reviews = Review.objects.filter(ticket__user_id=followed_user_id)
+    _write_entries(
+        FeedEntry(owner=user, ticket_id=ticket_id, time_created=time_created)
+        for ticket_id, time_created in tickets.values_list(
+            "id", "time_created"
+        ).iterator(chunk_size=BATCH_SIZE)
+    )
+    _write_entries(
+        FeedEntry(owner=user, review_id=review_id, time_created=time_created)
+        for review_id, time_created in reviews.values_list(
+            "id", "time_created"
+        ).iterator(chunk_size=BATCH_SIZE)
+    )
+
+
+def prune(user, unfollowed_user_id):
+    """
+    Removes the posts of an unfollowed user from a timeline. Reviews written
+    by the owner of the timeline stay visible.
+
+    Args:
+        user: The user who stopped following someone.
+        unfollowed_user_id: The id of the unfollowed user.
+    """
+    FeedEntry.objects.filter(owner=user).filter(
+        Q(ticket__user_id=unfollowed_user_id)
+        | (Q(review__ticket__user_id=unfollowed_user_id) & ~Q(review__user=user))
+    ).delete()
+
+
+def rebuild(user):
+    """
+    Recomputes the whole timeline of a user from the tickets and reviews
+    visible to them.
+
+    Args:
+        user: The user whose timeline is rebuilt.
+
+    Returns:
+        int: The number of entries in the rebuilt timeline.
+    """
+    FeedEntry.objects.filter(owner=user).delete()
+    _write_entries(
+        FeedEntry(owner=user, ticket_id=ticket_id, time_created=time_created)
+        for ticket_id, time_created in feed.visible_tickets(user)
+        .values_list("id", "time_created")
+        .iterator(chunk_size=BATCH_SIZE)
+    )
+    _write_entries(
+        FeedEntry(owner=user, review_id=review_id, time_created=time_created)
+        for review_id, time_created in feed.visible_reviews(user)
+        .values_list("id", "time_created")
+        .iterator(chunk_size=BATCH_SIZE)
+    )
+    return FeedEntry.objects.filter(owner=user).count()
+
+
+def timeline_rows_query(user, cursor=None, page_size=None, newer=False):
+    """
+    Builds the query reading one page of the materialized timeline of a user.
+
+    Args:
+        user: The owner of the timeline.
+        cursor: The cursor of an entry, the page starts after it if given.
+        page_size: The number of posts per page, defaults to FEED_PAGE_SIZE.
+        newer: Read the entries added since the cursor instead, oldest page
+               first. Requires a cursor.
+
+    Returns:
+        QuerySet: The (entry_id, time_created, ticket_id, review_id) rows of
+                  the page and the first row of the following one, or None
+                  if there is nothing to read.
+    """
+    page_size = page_size or settings.FEED_PAGE_SIZE
+    position = feed.decode_cursor(cursor) if cursor else None
+    # Cursors of the pull feed do not point at entries
+    if position and position[0] != feed.ENTRY:
+        position = None
+
+    entries = FeedEntry.objects.filter(owner=user)
+    if newer:
+        if not position:
+            return None
+        entries = entries.filter(feed.newer_than(position, feed.ENTRY))
+        ordering = ("time_created", "id")
+    else:
+        if position:
+            entries = entries.filter(feed.older_than(position, feed.ENTRY))
+        ordering = ("-time_created", "-id")
+
+    return entries.order_by(*ordering).values_list(
+        "id", "time_created", "ticket_id", "review_id"
+    )[: page_size + 1]
+
+
+def paginate_entries(entry_rows, page_size=None, newer=False):
+    """
+    Cuts the rows read by timeline_rows_query to one page, newest first, and
+    turns them into feed rows.
+
+    Returns:
+        tuple: (rows, has_more), in the same format as feed.get_feed_rows.
+    """
+    page_size = page_size or settings.FEED_PAGE_SIZE
+    has_more = len(entry_rows) > page_size
+    entry_rows = entry_rows[:page_size]
+    if newer:
+        entry_rows.reverse()
+
+    rows = [
+        (
+            feed.TICKET if ticket_id else feed.REVIEW,
+            ticket_id or review_id,
+            time_created,
+            feed.encode_cursor(feed.ENTRY, entry_id, time_created),
+        )
+        for entry_id, time_created, ticket_id, review_id in entry_rows
+    ]
+    return rows, has_more
+
+
+def get_timeline_rows(user, cursor=None, page_size=None, newer=False):
+    """
+    Reads one page of the materialized timeline of a user, newest first.
+
+    Returns:
+        tuple: (rows, has_more), in the same format as feed.get_feed_rows.
+    """
+    query = timeline_rows_query(user, cursor, page_size, newer)
+    if query is None:
+        return [], False
+    return paginate_entries(list(query), page_size, newer)
+
+
+async def aget_timeline_rows(user, cursor=None, page_size=None, newer=False):
+    """
+    Async version of get_timeline_rows.
+    """
+    query = timeline_rows_query(user, cursor, page_size, newer)
+    if query is None:
+        return [], False
+    return paginate_entries([row async for row in query], page_size, newer)
+
+
+def get_timeline_page(user, cursor=None, page_size=None):
+    """
+    Loads one page of the materialized timeline of a user.
+
+    Returns:
+        tuple: (posts, next_cursor), in the same format as feed.get_feed_page.
+    """
+    rows, has_more = get_timeline_rows(user, cursor, page_size)
+    return feed.hydrate_posts(rows), rows[-1][3] if has_more else None
+
+
+async def aget_timeline_page(user, cursor=None, page_size=None):
+    """
+    Async version of get_timeline_page.
+    """
+    rows, has_more = await aget_timeline_rows(user, cursor, page_size)
+    return await feed.ahydrate_posts(rows), rows[-1][3] if has_more else None
@@ -0,0 +1,235 @@
+import datetime
+import json
+import os
+from contextlib import contextmanager
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models
+from django.db.models import Case, Max, Q, When
+
+from .models import Photo, Ticket, Review
+from authentication.models import User
+
+Follow = User.follows.through
+
+# Content exported by export_content and loaded by import_content, one JSONL
+# file per model, in an order where every foreign key points to a model
+# imported before. Timelines, jobs and the search index are derived data,
+# rebuilt after an import.
+SECTIONS = (
+    ("users", User),
+    ("follows", Follow),
+    ("photos", Photo),
+    ("tickets", Ticket),
+    ("reviews", Review),
+)
+
+# Fields of the users that are exported
+USER_FIELDS = (
+    "id",
+    "username",
+    "password",
+    "email",
+    "first_name",
+    "last_name",
+    "is_active",
+    "is_staff",
+    "is_superuser",
+    "date_joined",
+    "last_login",
+)
+
+# File recording the upper id bound of each model, so a resumed export stops
+# at the same rows, and whether the export is complete
+MANIFEST_NAME = "manifest.json"
+
+# Version of the format of the exported rows, recorded in the manifest
+FORMAT_VERSION = 2
+
+
+def new_manifest():
+    """
+    Returns the manifest of an export starting now, bounding every section
+    to the rows that exist.
+    """
+    return {
+        "format": FORMAT_VERSION,
+        "max_ids": {
+            name: model.objects.aggregate(max_id=Max("id"))["max_id"] or 0
+            for name, model in SECTIONS
+        },
+        "complete": False,
+    }
+
+
+class ExportEncoder(DjangoJSONEncoder):
+    """
+    JSON encoder keeping the microseconds of the datetimes, which
+    DjangoJSONEncoder truncates to milliseconds.
+    """
+
+    def default(self, o):
+        if isinstance(o, datetime.datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+encoder = ExportEncoder(separators=(",", ":"))
+
+
+def user_keys(model):
+    """
+    Returns the foreign keys of a model to the users, with the key of the
+    username of the user in the exported rows. The import finds the users
+    by username, whether they were imported or merged with an existing one.
+    """
+    return tuple(
+        (field, f"{field.name}__username")
+        for field in model._meta.concrete_fields
+        if field.is_relation and field.related_model is User
+    )
+
+
+def section_fields(model):
+    """
+    Returns the names of the columns exported for a model, foreign keys
+    being exported as ids, followed by the usernames of the users they
+    reference.
+    """
+    if model is User:
+        return USER_FIELDS
+    return tuple(field.attname for field in model._meta.concrete_fields) + tuple(
+        key for _, key in user_keys(model)
+    )
+
+
+def export_rows(name, model, max_ids):
+    """
+    Returns the rows of a section within the bounds of the manifest. A row
+    created or edited during the export may reference a row created after
+    the export started, above the bound of its section and missing from the
+    export: an optional foreign key to it is exported as null, and a row
+    with such a required foreign key is left out.
+
+    Args:
+        name: The name of the section.
+        model: The model of the section.
+        max_ids: The upper id bound of each section.
+
+    Returns:
+        QuerySet: Tuples of the values of section_fields(model), in id order.
+    """
+    rows = model.objects.filter(id__lte=max_ids[name]).order_by("id")
+    if model is User:
+        return rows.values_list(*USER_FIELDS)
+
+    sections = {model: name for name, model in SECTIONS}
+    columns = []
+    for field in model._meta.concrete_fields:
+        section = sections.get(field.related_model)
+        if section is None:
+            columns.append(field.attname)
+            continue
+        in_bounds = Q(**{f"{field.attname}__lte": max_ids[section]})
+        if field.null:
+            columns.append(Case(When(in_bounds, then=field.attname)))
+        else:
+            rows = rows.filter(in_bounds)
+            columns.append(field.attname)
+    return rows.values_list(*columns, *(key for _, key in user_keys(model)))
+
+
+def encode_row(fields, values):
+    """
+    Encodes a row of values as a JSON line.
+    """
+    return (encoder.encode(dict(zip(fields, values))) + "\n").encode()
+
+
+def decode_row(model, line):
+    """
+    Decodes a JSON line into the values of the model fields, converting
+    dates and times from their ISO format.
+    """
+    fields = {field.attname: field for field in model._meta.concrete_fields}
+    return {
+        name: fields[name].to_python(value) if name in fields else value
+        for name, value in json.loads(line).items()
+    }
+
+
+def _rfind_newline(file, end):
+    """
+    Returns the position of the last new line before a position of a file
+    opened in binary mode, -1 if there is none. Reads the file backwards.
+    """
+    while end > 0:
+        start = max(0, end - 4096)
+        file.seek(start)
+        newline = file.read(end - start).rfind(b"\n")
+        if newline != -1:
+            return start + newline
+        end = start
+    return -1
+
+
+def last_complete_line(path):
+    """
+    Returns the last complete line of a JSONL file, after truncating the
+    partial line left by an interrupted export.
+
+    Args:
+        path: The file to inspect.
+
+    Returns:
+        bytes: The last line, None if the file holds no complete line.
+    """
+    with open(path, "rb+") as file:
+        last = _rfind_newline(file, file.seek(0, os.SEEK_END))
+        file.truncate(last + 1)
+        if last == -1:
+            return None
+        start = _rfind_newline(file, last) + 1
+        file.seek(start)
+        return file.read(last - start)
+
+
+@contextmanager
+def preserve_timestamps(*model_classes):
+    """
+    Disables auto_now and auto_now_add on the date fields of the models, so
+    the imported creation and edition times are kept.
+    """
+    saved = []
+    for model in model_classes:
+        for field in model._meta.concrete_fields:
+            if isinstance(field, models.DateField):
+                saved.append((field, field.auto_now, field.auto_now_add))
+                field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def read_json(path):
+    """
+    Reads a manifest or the progress of an import, None if there is none.
+    """
+    try:
+        with open(path) as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return None
+
+
+def write_json(path, data):
+    """
+    Writes a manifest or the progress of an import. The file is replaced at
+    once, so an interruption leaves either the previous or the new content.
+    """
+    temporary = f"{path}.tmp"
+    with open(temporary, "w") as file:
+        json.dump(data, file)
+    os.replace(temporary, path)
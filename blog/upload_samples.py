@@ -0,0 +1,117 @@
+import io
+import struct
+import time
+import tracemalloc
+import zlib
+
+from django.core.handlers.wsgi import WSGIRequest
+from django.test import override_settings
+from PIL import Image
+
+from . import forms
+from .models import Photo
+
+BOUNDARY = "BenchUploadsBoundary"
+
+# Growth of the peak memory between the smallest and the largest upload
+# beyond which the peak is not considered flat, in bytes
+FLAT_TOLERANCE = 256 * 1024
+
+
+def jpeg_photo(size):
+    """
+    Returns a JPEG photo of 2000x1500 pixels padded to `size` bytes, the
+    decoders ignore the data after the end of the image.
+    """
+    buffer = io.BytesIO()
+    Image.effect_noise((2000, 1500), 64).convert("RGB").save(buffer, "JPEG")
+    data = buffer.getvalue()
+    return data + bytes(max(0, size - len(data)))
+
+
+def png_bomb(width, height):
+    """
+    Returns a tiny PNG file whose header declares width x height pixels.
+    """
+
+    def chunk(kind, data):
+        return (
+            struct.pack(">I", len(data))
+            + kind
+            + data
+            + struct.pack(">I", zlib.crc32(kind + data))
+        )
+
+    header = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + chunk(b"IHDR", header)
+        + chunk(b"IDAT", zlib.compress(b"\x00" * 1024))
+        + chunk(b"IEND", b"")
+    )
+
+
+def write_upload_request(path, content):
+    """
+    Writes the multipart body of a request uploading `content` as the image
+    of the photo form.
+
+    Returns:
+        int: The length of the body.
+    """
+    with open(path, "wb") as body:
+        body.write(
+            (
+                f"--{BOUNDARY}\r\n"
+                'Content-Disposition: form-data; name="image"; filename="photo.jpg"\r\n'
+                "Content-Type: image/jpeg\r\n\r\n"
+            ).encode()
+        )
+        body.write(content)
+        body.write(f"\r\n--{BOUNDARY}--\r\n".encode())
+        return body.tell()
+
+
+def measure_upload(handlers, body, length):
+    """
+    Parses the request of a body file written by write_upload_request,
+    validates the photo form and stores the image if it is valid, under
+    tracemalloc.
+
+    Args:
+        handlers: The upload handlers parsing the request.
+        body: The path of the body file.
+        length: The length of the body.
+
+    Returns:
+        tuple: (form, peak, elapsed) the validated form, the peak memory
+               allocated during the upload in bytes and its duration in
+               seconds.
+    """
+    with override_settings(FILE_UPLOAD_HANDLERS=handlers), open(body, "rb") as stream:
+        request = WSGIRequest(
+            {
+                "REQUEST_METHOD": "POST",
+                "PATH_INFO": "/create_ticket/",
+                "SERVER_NAME": "testserver",
+                "SERVER_PORT": "80",
+                "wsgi.url_scheme": "http",
+                "CONTENT_TYPE": f"multipart/form-data; boundary={BOUNDARY}",
+                "CONTENT_LENGTH": str(length),
+                "wsgi.input": stream,
+            }
+        )
+        tracemalloc.start()
+        try:
+            started = time.perf_counter()
+            form = forms.PhotoForm(request.POST, request.FILES)
+            if form.is_valid():
+                image = form.cleaned_data["image"]
+                Photo._meta.get_field("image").storage.save(image.name, image)
+            elapsed = time.perf_counter() - started
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+            for upload in request.FILES.values():
+                upload.close()
+    return form, peak, elapsed
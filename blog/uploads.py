@@ -0,0 +1,94 @@
+from django import forms
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from django.template.defaultfilters import filesizeformat
+from PIL import Image
+
+
+class BoundedUploadHandler(TemporaryFileUploadHandler):
+    """
+    Upload handler writing each chunk of an uploaded file to a temporary
+    file as it arrives, so no upload is held in memory whatever its size.
+    The data past UPLOAD_MAX_SIZE bytes is dropped instead of written: the
+    file is marked too_large and rejected by the form.
+    """
+
+    def new_file(self, *args, **kwargs):
+        """
+        Opens the temporary file of a new upload, not too large until a
+        chunk goes past UPLOAD_MAX_SIZE.
+        """
+        super().new_file(*args, **kwargs)
+        self.file.too_large = False
+
+    def receive_data_chunk(self, raw_data, start):
+        """
+        Writes a chunk to the temporary file, or drops it and marks the file
+        too large if it ends past UPLOAD_MAX_SIZE.
+
+        Args:
+            raw_data: The bytes of the chunk.
+            start: The offset of the chunk in the file.
+
+        Returns:
+            None: The chunk is consumed, no later handler receives it.
+        """
+        if start + len(raw_data) > settings.UPLOAD_MAX_SIZE:
+            self.file.too_large = True
+            return None
+        return super().receive_data_chunk(raw_data, start)
+
+
+def validate_image_header(file):
+    """
+    Checks the size of an uploaded image and the number of pixels declared
+    by its header, without decoding it. Pillow only reads the header when
+    opening an image, so a decompression bomb is rejected before its pixels
+    are ever decompressed.
+
+    Args:
+        file: The uploaded file.
+
+    Raises:
+        ValidationError: The file is too large or the image has too many
+            pixels.
+    """
+    if getattr(file, "too_large", False) or file.size > settings.UPLOAD_MAX_SIZE:
+        raise ValidationError(
+            "L'image ne doit pas dépasser %(size)s.",
+            code="file_too_large",
+            params={"size": filesizeformat(settings.UPLOAD_MAX_SIZE)},
+        )
+
+    source = (
+        file.temporary_file_path() if hasattr(file, "temporary_file_path") else file
+    )
+    try:
+        with Image.open(source) as image:
+            width, height = image.size
+    except Image.DecompressionBombError:
+        width = height = None
+    except Exception:
+        # Not an image, reported by ImageField
+        return
+    finally:
+        file.seek(0)
+    if width is None or width * height > settings.PHOTO_MAX_PIXELS:
+        raise ValidationError(
+            "L'image ne doit pas dépasser %(pixels)s millions de pixels.",
+            code="too_many_pixels",
+            params={"pixels": settings.PHOTO_MAX_PIXELS // 10**6},
+        )
+
+
+class BoundedImageField(forms.ImageField):
+    """
+    Image field checking the size and the pixels of the image with
+    validate_image_header before ImageField opens and verifies it.
+    """
+
+    def to_python(self, data):
+        if data not in self.empty_values:
+            validate_image_header(data)
+        return super().to_python(data)
@@ -1,94 +1,196 @@
+from django.conf import settings
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
+from django.contrib.admin.views.decorators import staff_member_required
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.template.loader import render_to_string
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
 from django.contrib import messages
+from django.db import transaction
 from .models import Ticket, Review
-from . import forms
-from authentication.forms import FollowUsersForm
-from authentication.models import User
-from itertools import chain
-from django.db.models import Q
+from . import (
+    feed,
+    forms,
+    fragments,
+    images,
+    live,
+    search,
+    stats,
+    suggestions,
+    timeline,
+)
+from authentication import follows
+from authentication.forms import BulkFollowForm, FollowUsersForm
+
+
+def home_validators(request):
+    """
+    Returns the ETag and Last-Modified validators of the home feed.
+    """
+    user = request.user
+    return feed.get_validators(
+        request, feed.visible_tickets(user), feed.visible_reviews(user)
+    )
+
+
+def posts_validators(request):
+    """
+    Returns the ETag and Last-Modified validators of the posts page.
+    """
+    user = request.user
+    return feed.get_validators(request, user.ticket_set.all(), user.review_set.all())
+
+
+def home_rows(request, cursor=None, newer=False):
+    """
+    Reads one page of rows of the home feed, from the materialized timeline
+    or merged on the fly depending on FEED_MODE.
+    """
+    user = request.user
+    if timeline.is_enabled():
+        return timeline.get_timeline_rows(user, cursor=cursor, newer=newer)
+    return feed.get_feed_rows(
+        *feed.visible_branches(user, follows.followed_ids(request)),
+        cursor=cursor,
+        newer=newer,
+    )
 
 
 @login_required
+@cache_control(private=True, no_cache=True)
+@condition(
+    etag_func=lambda request: home_validators(request)[0],
+    last_modified_func=lambda request: home_validators(request)[1],
+)
 def home(request):
     """
     Displays the home page with tickets and reviews of the current user
-    and the users they follow. Posts are sorted by creation time (newest first).
+    and the users they follow. Posts are sorted by creation time (newest first)
+    and paginated with a cursor given in the "cursor" query parameter.
+    Depending on FEED_MODE, posts are merged on the fly or read from the
+    materialized timeline of the user. Browsers revalidate the page with
+    its ETag and get a 304 response while the feed is unchanged.
 
     Context:
-        posts (list): A combined list of tickets and reviews sorted by their
+        posts (list): One page of tickets and reviews sorted by their
                       creation time.
+        next_cursor (str): The cursor of the next page, None on the last page.
     """
 
     user = request.user
+    cursor = request.GET.get("cursor")
 
-    # Fetch tickets the user or users they follow have created
-    viewable_tickets = Ticket.objects.filter(
-        Q(user=user) | Q(user__in=user.follows.all())
-    ).select_related("image")
-
-    # Fetch reviews written by the user or about tickets of the user or their followed users
-    viewable_reviews = Review.objects.filter(
-        Q(user=user) | Q(ticket__user=user) | Q(ticket__user__in=user.follows.all())
-    ).select_related("ticket__image")
-
-    # Combine tickets and reviews into one list of posts
-    tickets = [{"type": "ticket", "ticket": ticket} for ticket in viewable_tickets]
-
-    reviews = [
-        {"type": "review", "review": review, "ticket": review.ticket}
-        for review in viewable_reviews
-    ]
-
-    # Sort the posts by their creation time (most recent first)
-    posts = sorted(
-        chain(tickets, reviews),
-        key=lambda post: (
-            post["review"].time_created
-            if post["type"] == "review"
-            else post["ticket"].time_created
-        ),
-        reverse=True,
-    )
+    if timeline.is_enabled():
+        posts, next_cursor = timeline.get_timeline_page(user, cursor=cursor)
+    else:
+        posts, next_cursor = feed.get_feed_page(
+            *feed.visible_branches(user, follows.followed_ids(request)), cursor=cursor
+        )
+    feed.annotate_reviewed(posts, user)
 
-    context = {"posts": posts}
+    context = {
+        "posts": posts,
+        "next_cursor": next_cursor,
+        "poll_interval": settings.FEED_POLL_INTERVAL,
+    }
 
     return render(request, "blog/home.html", context)
 
 
 @login_required
-def user_posts(request):
+def home_posts(request):
     """
-    Displays posts (tickets and reviews) created by the logged-in user.
+    Returns the rendered posts of the home feed following a cursor, for the
+    infinite scroll and the new posts banner of the home page. Posts older
+    than the "before" cursor are returned newest first, or the posts newer
+    than the "after" cursor, oldest page first.
+
+    Returns:
+        JsonResponse: The "html" of the posts, the "cursor" to send with the
+                      next request in the same direction and whether more
+                      posts follow ("has_more").
+    """
+    after = request.GET.get("after")
+    cursor = after or request.GET.get("before")
+    if not cursor:
+        return JsonResponse({"error": "Curseur manquant."}, status=400)
+
+    rows, has_more = home_rows(request, cursor=cursor, newer=bool(after))
+    posts = feed.annotate_reviewed(feed.hydrate_posts(rows), request.user)
+
+    if rows:
+        cursor = rows[0][3] if after else rows[-1][3]
+    html = render_to_string(
+        "blog/partials/feed_posts.html", {"posts": posts}, request=request
+    )
+    return JsonResponse({"html": html, "cursor": cursor, "has_more": has_more})
 
-    Context:
-        posts (list): A combined list of tickets and reviews created by the user.
+
+@login_required
+def home_new_count(request):
     """
+    Counts the posts published in the home feed since the "after" cursor,
+    for the new posts banner. Polling costs two indexed queries, reading
+    the follows then at most a page of posts per followed user, and the
+    count stops at FEED_PAGE_SIZE.
 
-    # Fetch the user's tickets and reviews
-    user_tickets = request.user.ticket_set.all().select_related("image")
+    Returns:
+        JsonResponse: The "count" of new posts and whether there are more.
+    """
+    rows, has_more = home_rows(request, cursor=request.GET.get("after"), newer=True)
+    return JsonResponse({"count": len(rows), "has_more": has_more})
 
-    user_reviews = request.user.review_set.select_related("ticket__image")
 
-    # Combine the tickets and reviews into a list of posts
-    tickets = [{"type": "ticket", "ticket": ticket} for ticket in user_tickets]
-    reviews = [
-        {"type": "review", "review": review, "ticket": review.ticket}
-        for review in user_reviews
-    ]
+@login_required
+async def feed_stream(request):
+    """
+    Streams server-sent events announcing the posts published in the home
+    feed of the current user. The connection stays open until the browser
+    leaves, an idle connection only holds a coroutine and a small queue.
+    Under WSGI each connection would hold a worker thread, so the stream is
+    refused with a 204 response and the page falls back to polling.
+    """
+    if not isinstance(request, ASGIRequest):
+        return HttpResponse(status=204)
 
-    # Sort the posts by their creation time (most recent first)
-    posts = sorted(
-        chain(tickets, reviews),
-        key=lambda post: (
-            post["review"].time_created
-            if post["type"] == "review"
-            else post["ticket"].time_created
-        ),
-        reverse=True,
+    user = await request.auser()
+    response = StreamingHttpResponse(
+        live.event_stream(live.hub.subscribe(user.id)),
+        content_type="text/event-stream",
     )
+    response["Cache-Control"] = "no-cache"
+    # Keeps nginx from buffering the events
+    response["X-Accel-Buffering"] = "no"
+    return response
 
-    context = {"posts": posts}
+
+@login_required
+@cache_control(private=True, no_cache=True)
+@condition(
+    etag_func=lambda request: posts_validators(request)[0],
+    last_modified_func=lambda request: posts_validators(request)[1],
+)
+def user_posts(request):
+    """
+    Displays posts (tickets and reviews) created by the logged-in user,
+    paginated with a cursor given in the "cursor" query parameter.
+    Unchanged pages are answered with a 304 response.
+
+    Context:
+        posts (list): One page of tickets and reviews created by the user.
+        next_cursor (str): The cursor of the next page, None on the last page.
+    """
+
+    posts, next_cursor = feed.get_feed_page(
+        request.user.ticket_set.all(),
+        request.user.review_set.all(),
+        cursor=request.GET.get("cursor"),
+    )
+    feed.annotate_reviewed(posts, request.user)
+
+    context = {"posts": posts, "next_cursor": next_cursor}
 
     return render(request, "blog/posts.html", context)
 
@@ -117,10 +219,10 @@ def ticket_upload(request):
                 photo = photo_form.save(commit=False)
                 photo.uploader = request.user
                 photo.save()
+                images.schedule_renditions(photo)
                 ticket.image = photo
 
             ticket.save()
-            print(f"Ticket ID: {ticket.id}")
             messages.success(request, "Votre ticket a été créé avec succès !")
             return redirect("home")
         else:
@@ -145,26 +247,23 @@ def edit_ticket(request, ticket_id):
     """
     ticket = get_object_or_404(Ticket, id=ticket_id, user=request.user)
     edit_form = forms.TicketForm(instance=ticket)
-    photo_form = forms.PhotoForm(instance=ticket.image if ticket.image else None)
+    photo_form = forms.PhotoForm()
 
     if request.method == "POST":
 
         edit_form = forms.TicketForm(request.POST, instance=ticket)
-        photo_form = forms.PhotoForm(
-            request.POST,
-            request.FILES,
-            instance=ticket.photo if hasattr(ticket, "photo") else None,
-        )
-
-        if edit_form.is_valid():
-            ticket = edit_form.save()
-
-            photo = photo_form.save(commit=False)
-            photo.ticket = ticket
-            photo.uploader = request.user
-            photo.save()
+        photo_form = forms.PhotoForm(request.POST, request.FILES)
 
-            ticket.image = photo
+        if all([edit_form.is_valid(), photo_form.is_valid()]):
+            ticket = edit_form.save(commit=False)
+            # A new image replaces the photo, the previous one is left to
+            # collect_photos
+            if "image" in request.FILES:
+                photo = photo_form.save(commit=False)
+                photo.uploader = request.user
+                photo.save()
+                images.schedule_renditions(photo)
+                ticket.image = photo
             ticket.save()
 
             return redirect("home")
@@ -209,7 +308,9 @@ def review_upload(request, ticket_id):
             review = review_form.save(commit=False)
             review.user = request.user
             review.ticket = ticket
-            review.save()
+            with transaction.atomic():
+                review.save()
+                stats.review_added(review)
             messages.success(request, "Votre critique a été ajoutée avec succès !")
             return redirect("home")
     else:
@@ -238,9 +339,13 @@ def edit_review(request, review_id):
     ticket = review.ticket
 
     if request.method == "POST":
+        # The form sets the new rating on the review while validating
+        old_rating = review.rating
         edit_form = forms.ReviewForm(request.POST, instance=review)
         if edit_form.is_valid():
-            edit_form.save()
+            with transaction.atomic():
+                edit_form.save()
+                stats.rating_changed(review, old_rating)
             return redirect("home")
 
     context = {
@@ -264,7 +369,9 @@ def delete_review(request, review_id):
     review = get_object_or_404(Review, id=review_id, user=request.user)
 
     if request.method == "POST":
-        review.delete()
+        with transaction.atomic():
+            review.delete()
+            stats.review_removed(review)
         return redirect("home")
 
 
@@ -294,13 +401,16 @@ def create_ticket_review(request):
                 photo = photo_form.save(commit=False)
                 photo.uploader = request.user
                 photo.save()
+                images.schedule_renditions(photo)
                 ticket.image = photo
-            ticket.save()
 
             review = review_form.save(commit=False)
             review.user = request.user
-            review.ticket = ticket
-            review.save()
+            with transaction.atomic():
+                ticket.save()
+                review.ticket = ticket
+                review.save()
+                stats.review_added(review)
 
             messages.success(request, "Votre ticket a été créé avec succès !")
             return redirect("home")
@@ -317,15 +427,29 @@ def create_ticket_review(request):
     return render(request, "blog/create_ticket_review.html", context=context)
 
 
+def subscriptions_context(request, form):
+    """
+    Returns the context of the subscriptions page. The followed users are
+    loaded once and also give the suggestions the ids they need.
+    """
+    return {
+        "following": follows.followed_users(request),
+        "followers": request.user.followers.all(),
+        "form": form,
+        "suggestions": suggestions.get_suggestions(
+            request.user, follows.followed_ids(request)
+        ),
+    }
+
+
 @login_required
 def follow_user(request):
     """
-    Allows a user to follow another user.
+    Allows a user to follow another user. An invalid username displays the
+    subscriptions page again.
 
     Context:
-        form (Form): The form for selecting a user to follow.
-        followed_users (QuerySet): The list of users the current user is following.
-        followers (QuerySet): The list of followers of the current user.
+        See subscriptions.
     """
 
     form = FollowUsersForm(request.POST, request_user=request.user)
@@ -334,17 +458,45 @@ def follow_user(request):
         if form.is_valid():
             user_to_follow = form.cleaned_data["username"]
             request.user.follows.add(user_to_follow)
+            follows.forget_follows(request)
             messages.success(request, f"Vous suivez maintenant {user_to_follow}.")
             return redirect("subscriptions")
         else:
             form = FollowUsersForm(request_user=request.user)
 
-    context = {
-        "form": form,
-        "followed_users": request.user.follows.all(),
-        "followers": request.user.followers.all(),
-    }
-    return render(request, "blog/subscriptions.html", context)
+    return render(
+        request, "blog/subscriptions.html", subscriptions_context(request, form)
+    )
+
+
+@login_required
+def bulk_follow(request):
+    """
+    Allows a user to follow many users at once, from a pasted list of
+    usernames or a CSV file. The users that can be followed are followed
+    and the other usernames are reported with the reason.
+
+    Context:
+        form (Form): The form to submit the usernames.
+        followed (list): The users followed by the submission.
+        errors (dict): The error message of each rejected username.
+    """
+    form = BulkFollowForm(request_user=request.user)
+    followed = []
+    errors = {}
+
+    if request.method == "POST":
+        form = BulkFollowForm(request.POST, request.FILES, request_user=request.user)
+        if form.is_valid():
+            followed = form.save()
+            errors = form.username_errors
+            if followed:
+                messages.success(
+                    request, f"Vous suivez maintenant {len(followed)} utilisateur(s)."
+                )
+
+    context = {"form": form, "followed": followed, "errors": errors}
+    return render(request, "blog/bulk_follow.html", context)
 
 
 @login_required
@@ -356,10 +508,12 @@ def unfollow_user(request, user_id):
         user_to_unfollow (User): The user to be unfollowed.
     """
 
-    user_to_unfollow = User.objects.get(id=user_id)
+    followed = {user.id: user for user in follows.followed_users(request)}
+    user_to_unfollow = followed.get(user_id)
 
-    if user_to_unfollow in request.user.follows.all():
-        request.user.follows.remove(user_to_unfollow)
+    if user_to_unfollow is not None:
+        request.user.follows.remove(user_id)
+        follows.forget_follows(request)
         messages.success(request, f"Vous ne suivez plus {user_to_unfollow}.")
     else:
         messages.warning(
@@ -375,18 +529,76 @@ def subscriptions(request):
     Displays a list of users the current user follows and who follows them.
 
     Context:
-        following (QuerySet): The list of users the current user is following.
+        following (list): The users the current user is following, the most
+                          recently followed first.
         followers (QuerySet): The list of users following the current user.
         form (Form): The form to follow other users.
+        suggestions (list): Users followed by the users the current user
+                            follows, with their number of mutual follows.
     """
 
-    following = request.user.follows.all()
-    followers = request.user.followers.all()
     form = FollowUsersForm(request.POST, request_user=request.user)
+    return render(
+        request, "blog/subscriptions.html", subscriptions_context(request, form)
+    )
 
-    print("Following:", following)
-    print("Followers:", followers)
 
-    context = {"following": following, "followers": followers, "form": form}
+@login_required
+def search_posts(request):
+    """
+    Searches tickets and reviews by title, author, description, headline and
+    body with the full-text index. Results are ranked with bm25 and paginated
+    with the "page" query parameter.
+
+    Context:
+        query (str): The searched text.
+        posts (list): One page of matching tickets and reviews, best first.
+        next_page (int): The number of the next page, None on the last page.
+    """
+    query = request.GET.get("q", "").strip()
+    try:
+        page = max(int(request.GET.get("page", 1)), 1)
+    except ValueError:
+        page = 1
+
+    posts, has_next = search.search(query, page)
+    feed.annotate_reviewed(posts, request.user)
+
+    context = {
+        "query": query,
+        "posts": posts,
+        "next_page": page + 1 if has_next else None,
+    }
+    return render(request, "blog/search.html", context)
 
-    return render(request, "blog/subscriptions.html", context)
+
+@login_required
+def top_rated(request):
+    """
+    Displays the tickets with the best average rating among those with at
+    least TOP_RATED_MIN_REVIEWS reviews, read from the review statistics
+    stored on the tickets. Paginated with the "page" query parameter.
+
+    Context:
+        posts (list): One page of tickets, best rated first.
+        next_page (int): The number of the next page, None on the last page.
+    """
+    try:
+        page = max(int(request.GET.get("page", 1)), 1)
+    except ValueError:
+        page = 1
+
+    posts, has_next = stats.top_rated(page)
+    feed.annotate_reviewed(posts, request.user)
+
+    context = {"posts": posts, "next_page": page + 1 if has_next else None}
+    return render(request, "blog/top_rated.html", context)
+
+
+@staff_member_required
+def fragment_cache_stats(request):
+    """
+    Returns the hit and miss counters of the rendered posts cache of the
+    process serving the request, as JSON. Reserved to staff members.
+    """
+    return JsonResponse(fragments.stats())
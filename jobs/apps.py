@@ -0,0 +1,15 @@
+from django.apps import AppConfig
+
+
+class JobsConfig(AppConfig):
+    """
+    Configuration for the Jobs application.
+    This class defines the settings for the Jobs app in the Django project.
+
+    Attributes:
+        default_auto_field: The default auto field type for the application.
+        name: The name of the application.
+    """
+
+    default_auto_field = "django.db.models.BigAutoField"
+    name = "jobs"
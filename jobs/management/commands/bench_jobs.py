@@ -0,0 +1,101 @@
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from jobs import queue
+from jobs.models import Job
+from jobs.tasks import noop
+
+
+class Command(BaseCommand):
+    """
+    Measures the throughput of the job queue in a throwaway file database:
+    jobs enqueued per second by concurrent producers, then jobs claimed and
+    run per second by concurrent workers.
+    """
+
+    help = "Benchmarks enqueue and dequeue throughput of the job queue."
+
+    def add_arguments(self, parser):
+        """
+        Adds the options controlling the size of the benchmark.
+        """
+        parser.add_argument(
+            "--jobs", type=int, default=2000, help="Jobs enqueued per round."
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            nargs="+",
+            default=[1, 2, 4, 8],
+            help="Numbers of concurrent producers and workers to benchmark.",
+        )
+
+    def handle(self, *args, **options):
+        """
+        Runs one round per number of workers and prints the throughputs.
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            # A file database, the in-memory one cannot be shared by threads
+            connection.settings_dict["TEST"]["NAME"] = str(
+                Path(directory) / "bench_jobs.sqlite3"
+            )
+            old_name = connection.creation.create_test_db(
+                verbosity=0, autoclobber=True, serialize=False
+            )
+            try:
+                self.stdout.write("workers  enqueue/s  dequeue/s")
+                for workers in options["workers"]:
+                    enqueue_rate, dequeue_rate = self.run_round(
+                        options["jobs"], workers
+                    )
+                    self.stdout.write(
+                        f"{workers:7d}  {enqueue_rate:9.0f}  {dequeue_rate:9.0f}"
+                    )
+            finally:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def run_round(self, jobs, workers):
+        """
+        Enqueues then drains jobs with the given concurrency.
+
+        Returns:
+            tuple: The enqueue and dequeue rates in jobs per second.
+        """
+        Job.objects.all().delete()
+
+        def produce(count):
+            try:
+                for _ in range(count):
+                    queue.enqueue(noop)
+            finally:
+                connection.close()
+
+        started = time.perf_counter()
+        self.run_threads(produce, [jobs // workers] * workers)
+        enqueue_rate = (jobs // workers * workers) / (time.perf_counter() - started)
+
+        stop = threading.Event()
+        started = time.perf_counter()
+        self.run_threads(
+            lambda name: queue.work(name, stop, burst=True),
+            [f"bench-{i}" for i in range(workers)],
+        )
+        elapsed = time.perf_counter() - started
+        dequeue_rate = Job.objects.filter(status=Job.DONE).count() / elapsed
+
+        return enqueue_rate, dequeue_rate
+
+    def run_threads(self, target, arguments):
+        """
+        Runs target once per argument, each call in its own thread.
+        """
+        threads = [threading.Thread(target=target, args=(arg,)) for arg in arguments]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
@@ -0,0 +1,112 @@
+import os
+import signal
+import socket
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from jobs import queue
+
+
+class Command(BaseCommand):
+    """
+    Worker running the jobs stored in the database with a pool of threads.
+    The main thread refreshes the lock of the running jobs every
+    JOBS_HEARTBEAT_INTERVAL seconds, so long jobs are not taken for those
+    of a dead worker, and requeues the stale jobs and deletes the old
+    finished ones every JOBS_MAINTENANCE_INTERVAL seconds. SIGINT and
+    SIGTERM stop the workers once their current job is finished.
+    """
+
+    help = "Runs the background jobs stored in the database."
+
+    def add_arguments(self, parser):
+        """
+        Adds the options controlling the pool of worker threads.
+        """
+        parser.add_argument(
+            "--workers", type=int, default=2, help="Number of worker threads."
+        )
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=1.0,
+            help="Seconds to wait when the queue is empty.",
+        )
+        parser.add_argument(
+            "--burst",
+            action="store_true",
+            help="Exit once no job is due instead of waiting for new ones.",
+        )
+
+    def handle(self, *args, **options):
+        """
+        Starts the worker threads and waits for them to finish.
+        """
+        stop = threading.Event()
+
+        def request_stop(signum, frame):
+            self.stdout.write("Stopping after the current jobs...")
+            stop.set()
+
+        signal.signal(signal.SIGINT, request_stop)
+        signal.signal(signal.SIGTERM, request_stop)
+
+        name = f"{socket.gethostname()}-{os.getpid()}"
+        worker_names = [f"{name}-{i}" for i in range(options["workers"])]
+        processed = []
+        threads = [
+            threading.Thread(
+                target=lambda worker_name: processed.append(
+                    queue.work(
+                        worker_name,
+                        stop,
+                        poll_interval=options["poll_interval"],
+                        burst=options["burst"],
+                    )
+                ),
+                args=(worker_name,),
+            )
+            for worker_name in worker_names
+        ]
+        self.maintain()
+        last_maintenance = last_heartbeat = time.monotonic()
+        for thread in threads:
+            thread.start()
+        # Join with a timeout so the main thread keeps handling signals,
+        # refreshing the locks and maintaining the queue
+        try:
+            while any(thread.is_alive() for thread in threads):
+                for thread in threads:
+                    thread.join(timeout=0.5)
+                if (
+                    time.monotonic() - last_heartbeat
+                    >= settings.JOBS_HEARTBEAT_INTERVAL
+                ):
+                    queue.heartbeat(worker_names)
+                    last_heartbeat = time.monotonic()
+                if (
+                    time.monotonic() - last_maintenance
+                    >= settings.JOBS_MAINTENANCE_INTERVAL
+                ):
+                    self.maintain()
+                    last_maintenance = time.monotonic()
+        finally:
+            connection.close()
+
+        self.stdout.write(self.style.SUCCESS(f"Ran {sum(processed)} jobs"))
+
+    def maintain(self):
+        """
+        Requeues the jobs of the workers that died and deletes the old
+        finished jobs.
+        """
+        requeued = queue.requeue_stale()
+        if requeued:
+            self.stdout.write(f"Requeued {requeued} stale jobs")
+        pruned = queue.prune_finished()
+        if pruned:
+            self.stdout.write(f"Deleted {pruned} finished jobs")
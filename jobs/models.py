@@ -0,0 +1,54 @@
+from django.db import models
+from django.utils import timezone
+
+
+class Job(models.Model):
+    """
+    Represents a unit of work stored in the database and run after the request
+    by the run_jobs worker command.
+
+    Attributes:
+        task (CharField): Dotted path of the function decorated with jobs.queue.task.
+        kwargs (JSONField): Keyword arguments given to the task.
+        status (CharField): Pending, running, done or failed.
+        attempts (PositiveSmallIntegerField): Number of times the job was started.
+        max_attempts (PositiveSmallIntegerField): Number of attempts before the job fails.
+        run_after (DateTimeField): The job is not started before this time.
+        locked_by (CharField): Name of the worker running the job.
+        locked_at (DateTimeField): Time the job was claimed by its worker.
+        last_error (TextField): Traceback of the last failed attempt.
+        time_created (DateTimeField): Time the job was enqueued.
+        time_finished (DateTimeField): Time the job succeeded or failed for good.
+    """
+
+    PENDING = "pending"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    STATUS_CHOICES = [
+        (PENDING, "En attente"),
+        (RUNNING, "En cours"),
+        (DONE, "Terminé"),
+        (FAILED, "Échoué"),
+    ]
+
+    task = models.CharField(max_length=255)
+    kwargs = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=5)
+    run_after = models.DateTimeField(default=timezone.now)
+    locked_by = models.CharField(max_length=64, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    time_created = models.DateTimeField(auto_now_add=True)
+    time_finished = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        """
+        Metaclass used to index the jobs in the order workers claim them.
+        """
+
+        indexes = [
+            models.Index(fields=["status", "run_after", "id"], name="job_queue_idx"),
+        ]
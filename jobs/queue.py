@@ -0,0 +1,239 @@
+import random
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import F, Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Job
+
+# Number of pending jobs a worker picks its candidate from, so concurrent
+# workers do not all race for the oldest job
+CLAIM_WINDOW = 8
+
+
+def task(func):
+    """
+    Decorator marking a function as a job task. Only decorated functions can
+    be enqueued and run by the workers. Tasks receive the keyword arguments
+    given to enqueue, which must be JSON serializable.
+
+    Args:
+        func: A module level function.
+
+    Returns:
+        function: The same function.
+    """
+    func.is_job_task = True
+    func.task_path = f"{func.__module__}.{func.__qualname__}"
+    return func
+
+
+def enqueue(func, delay=None, max_attempts=None, **kwargs):
+    """
+    Stores a job to be run by a worker. When called inside a transaction,
+    the job is only visible to workers once the transaction is committed.
+
+    Args:
+        func: A function decorated with task.
+        delay: Optional timedelta before the job can start.
+        max_attempts: Number of attempts before the job fails, defaults to
+                      JOBS_MAX_ATTEMPTS.
+        **kwargs: The arguments of the task.
+
+    Returns:
+        Job: The created job.
+    """
+    if not getattr(func, "is_job_task", False):
+        raise ValueError(f"{func!r} is not decorated with jobs.queue.task")
+
+    return Job.objects.create(
+        task=func.task_path,
+        kwargs=kwargs,
+        max_attempts=max_attempts or settings.JOBS_MAX_ATTEMPTS,
+        run_after=timezone.now() + (delay or timedelta()),
+    )
+
+
+def claim(worker_name):
+    """
+    Marks the next due job as running for a worker. The status is changed with
+    a conditional UPDATE, so a job is never claimed by two workers.
+
+    Args:
+        worker_name: The name of the worker claiming the job.
+
+    Returns:
+        Job: The claimed job, or None if no job is due.
+    """
+    while True:
+        now = timezone.now()
+        candidates = list(
+            Job.objects.filter(status=Job.PENDING, run_after__lte=now)
+            .order_by("run_after", "id")
+            .values_list("id", flat=True)[:CLAIM_WINDOW]
+        )
+        if not candidates:
+            return None
+
+        random.shuffle(candidates)
+        for job_id in candidates:
+            claimed = Job.objects.filter(id=job_id, status=Job.PENDING).update(
+                status=Job.RUNNING,
+                locked_by=worker_name,
+                locked_at=now,
+                attempts=F("attempts") + 1,
+            )
+            if claimed:
+                return Job.objects.get(id=job_id)
+
+
+def run(job):
+    """
+    Runs a claimed job and records its outcome. A failed job is retried
+    with an exponential backoff until it reaches its maximum attempts.
+
+    Args:
+        job: A job returned by claim.
+
+    Returns:
+        bool: True if the task succeeded.
+    """
+    try:
+        func = import_string(job.task)
+        if not getattr(func, "is_job_task", False):
+            raise ValueError(f"{job.task} is not decorated with jobs.queue.task")
+        func(**job.kwargs)
+    except Exception:
+        _fail(job, traceback.format_exc())
+        return False
+
+    Job.objects.filter(id=job.id).update(
+        status=Job.DONE, time_finished=timezone.now(), last_error=""
+    )
+    return True
+
+
+def _fail(job, error):
+    """
+    Schedules the retry of a failed job, or marks it as failed for good.
+    """
+    now = timezone.now()
+    jobs = Job.objects.filter(id=job.id)
+    if job.attempts < job.max_attempts:
+        backoff = min(
+            settings.JOBS_RETRY_BACKOFF * 2 ** (job.attempts - 1),
+            settings.JOBS_MAX_BACKOFF,
+        )
+        jobs.update(
+            status=Job.PENDING,
+            run_after=now + timedelta(seconds=backoff),
+            locked_by="",
+            locked_at=None,
+            last_error=error,
+        )
+    else:
+        jobs.update(status=Job.FAILED, time_finished=now, last_error=error)
+
+
+def heartbeat(worker_names):
+    """
+    Refreshes the lock time of the jobs run by workers that are alive, so
+    that requeue_stale does not give back a job running for longer than
+    JOBS_STALE_AFTER seconds. Called every JOBS_HEARTBEAT_INTERVAL seconds
+    by run_jobs for its worker threads.
+
+    Args:
+        worker_names: The names of the workers.
+
+    Returns:
+        int: The number of running jobs refreshed.
+    """
+    return Job.objects.filter(status=Job.RUNNING, locked_by__in=worker_names).update(
+        locked_at=timezone.now()
+    )
+
+
+def requeue_stale():
+    """
+    Gives back the jobs left running by a worker that died, i.e. whose lock
+    was not refreshed by heartbeat for JOBS_STALE_AFTER seconds. The
+    interrupted run counts as an attempt. Called periodically by run_jobs.
+
+    Returns:
+        int: The number of jobs put back in the queue.
+    """
+    now = timezone.now()
+    stale = Job.objects.filter(
+        status=Job.RUNNING,
+        locked_at__lt=now - timedelta(seconds=settings.JOBS_STALE_AFTER),
+    )
+    stale.filter(attempts__gte=F("max_attempts")).update(
+        status=Job.FAILED, time_finished=now, last_error="Worker lost"
+    )
+    return stale.update(status=Job.PENDING, locked_by="", locked_at=None)
+
+
+def prune_finished(batch_size=1000):
+    """
+    Deletes the jobs done for longer than JOBS_KEEP_DONE seconds and those
+    failed for longer than JOBS_KEEP_FAILED seconds, by batches so that the
+    write lock is never held for long.
+
+    Args:
+        batch_size: The number of jobs deleted per query.
+
+    Returns:
+        int: The number of jobs deleted.
+    """
+    now = timezone.now()
+    finished = Job.objects.filter(
+        Q(
+            status=Job.DONE,
+            time_finished__lt=now - timedelta(seconds=settings.JOBS_KEEP_DONE),
+        )
+        | Q(
+            status=Job.FAILED,
+            time_finished__lt=now - timedelta(seconds=settings.JOBS_KEEP_FAILED),
+        )
+    )
+    deleted = 0
+    while True:
+        ids = list(finished.values_list("id", flat=True)[:batch_size])
+        if not ids:
+            return deleted
+        deleted += Job.objects.filter(id__in=ids).delete()[0]
+
+
+def work(worker_name, stop, poll_interval=1.0, burst=False):
+    """
+    Worker loop claiming and running jobs until stop is set. The job being
+    run is always finished before returning, for a graceful shutdown.
+
+    Args:
+        worker_name: The name of the worker.
+        stop: A threading.Event asking the worker to stop.
+        poll_interval: Seconds to wait when no job is due.
+        burst: Return as soon as no job is due instead of waiting.
+
+    Returns:
+        int: The number of jobs run.
+    """
+    processed = 0
+    try:
+        while not stop.is_set():
+            job = claim(worker_name)
+            if job is None:
+                if burst:
+                    break
+                stop.wait(poll_interval)
+                continue
+            run(job)
+            processed += 1
+    finally:
+        # Each worker thread has its own connection
+        connection.close()
+    return processed
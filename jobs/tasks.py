@@ -0,0 +1,8 @@
+from .queue import task
+
+
+@task
+def noop(**kwargs):
+    """
+    Does nothing. Used by bench_jobs to measure the overhead of the queue.
+    """
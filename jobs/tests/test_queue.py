@@ -0,0 +1,135 @@
+import io
+import time
+from datetime import timedelta
+from io import StringIO
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from PIL import Image
+
+from authentication.models import User
+from blog.images import render_photo, schedule_renditions
+from blog.models import Photo
+from jobs import queue
+from jobs.models import Job
+from jobs.tasks import noop
+
+
+def _jpeg():
+    """
+    Returns an uploaded JPEG photo.
+    """
+    buffer = io.BytesIO()
+    Image.new("RGB", (800, 600), "teal").save(buffer, "JPEG")
+    return SimpleUploadedFile("photo.jpg", buffer.getvalue(), "image/jpeg")
+
+
+@queue.task
+def long_job(seconds):
+    """
+    Stands for a job running for longer than JOBS_STALE_AFTER.
+    """
+    time.sleep(seconds)
+
+
+class QueueMaintenanceTests(TestCase):
+    def test_requeue_stale_gives_back_the_jobs_of_dead_workers(self):
+        long_ago = timezone.now() - timedelta(days=1)
+        stale = queue.enqueue(noop)
+        Job.objects.filter(id=stale.id).update(
+            status=Job.RUNNING, locked_by="dead", locked_at=long_ago, attempts=1
+        )
+        running = queue.enqueue(noop)
+        Job.objects.filter(id=running.id).update(
+            status=Job.RUNNING, locked_by="alive", locked_at=timezone.now()
+        )
+
+        self.assertEqual(queue.requeue_stale(), 1)
+        stale.refresh_from_db()
+        running.refresh_from_db()
+        self.assertEqual(stale.status, Job.PENDING)
+        self.assertEqual(running.status, Job.RUNNING)
+
+    def test_heartbeat_keeps_the_jobs_of_live_workers(self):
+        long_ago = timezone.now() - timedelta(days=1)
+        jobs = {}
+        for worker in ("alive", "dead"):
+            job = queue.enqueue(noop)
+            Job.objects.filter(id=job.id).update(
+                status=Job.RUNNING, locked_by=worker, locked_at=long_ago, attempts=1
+            )
+            jobs[worker] = job
+
+        self.assertEqual(queue.heartbeat(["alive"]), 1)
+        self.assertEqual(queue.requeue_stale(), 1)
+        self.assertEqual(
+            dict(Job.objects.values_list("locked_by", "status")),
+            {"alive": Job.RUNNING, "": Job.PENDING},
+        )
+
+    def test_prune_finished_deletes_old_jobs_only(self):
+        now = timezone.now()
+        ages = {
+            (Job.DONE, timedelta(days=2)): False,
+            (Job.DONE, timedelta(minutes=5)): True,
+            (Job.FAILED, timedelta(days=2)): True,
+            (Job.FAILED, timedelta(days=60)): False,
+        }
+        jobs = {}
+        for (status, age), kept in ages.items():
+            job = queue.enqueue(noop)
+            Job.objects.filter(id=job.id).update(status=status, time_finished=now - age)
+            jobs[job.id] = kept
+        pending = queue.enqueue(noop)
+
+        self.assertEqual(queue.prune_finished(batch_size=1), 2)
+        remaining = set(Job.objects.values_list("id", flat=True))
+        self.assertEqual(
+            remaining, {job_id for job_id, kept in jobs.items() if kept} | {pending.id}
+        )
+
+
+class RenditionJobTests(TestCase):
+    def test_renditions_are_generated_by_a_job(self):
+        user = User.objects.create_user("uploader", password="pw-12345xyz")
+        photo = Photo.objects.create(image=_jpeg(), uploader=user)
+        schedule_renditions(photo)
+
+        job = Job.objects.get()
+        self.assertEqual(job.task, render_photo.task_path)
+        self.assertEqual(job.kwargs, {"photo_id": photo.id})
+        photo.refresh_from_db()
+        self.assertFalse(photo.thumbnail)
+
+        self.assertTrue(queue.run(queue.claim("test")))
+        photo.refresh_from_db()
+        self.assertEqual((photo.width, photo.height), (800, 600))
+        self.assertTrue(photo.thumbnail.storage.exists(photo.thumbnail.name))
+
+    def test_identical_photo_reuses_the_renditions(self):
+        user = User.objects.create_user("uploader", password="pw-12345xyz")
+        first = Photo.objects.create(image=_jpeg(), uploader=user)
+        render_photo(first.id)
+        second = Photo.objects.create(image=_jpeg(), uploader=user)
+        schedule_renditions(second)
+
+        self.assertFalse(Job.objects.exists())
+        second.refresh_from_db()
+        first.refresh_from_db()
+        self.assertEqual(second.thumbnail, first.thumbnail)
+
+
+class LongJobTests(TransactionTestCase):
+    @override_settings(
+        JOBS_STALE_AFTER=1, JOBS_HEARTBEAT_INTERVAL=0.2, JOBS_MAINTENANCE_INTERVAL=0.2
+    )
+    def test_long_job_is_not_requeued_while_it_runs(self):
+        job = queue.enqueue(long_job, seconds=3)
+        output = StringIO()
+        call_command("run_jobs", "--burst", "--workers", "1", stdout=output)
+
+        self.assertNotIn("Requeued", output.getvalue())
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.DONE, 1))
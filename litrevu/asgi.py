@@ -0,0 +1,15 @@
+import os
+from django.conf import settings
+from django.core.asgi import get_asgi_application
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "litrevu.settings")
+# Each request runs its synchronous code in a new thread, see CONN_MAX_AGE
+os.environ.setdefault("LITREVU_CONN_MAX_AGE", "0")
+
+application = get_asgi_application()
+
+# Static files are served by runserver under WSGI, the ASGI server does it in development
+if settings.DEBUG:
+    from django.contrib.staticfiles.handlers import ASGIStaticFilesHandler
+
+    application = ASGIStaticFilesHandler(application)
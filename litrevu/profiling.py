@@ -0,0 +1,252 @@
+import cProfile
+import json
+import logging
+import random
+import threading
+import time
+import tracemalloc
+from contextvars import ContextVar
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.template.base import Template
+
+logger = logging.getLogger(__name__)
+
+# Timings of the request being served, None outside of a profiled request.
+# Context variables are copied into sync_to_async threads, so the queries
+# and templates of async views are counted too.
+_timings = ContextVar("profiling_timings", default=None)
+
+# Only one request is dumped at a time: tracemalloc traces the whole process
+_dump_lock = threading.Lock()
+
+# Template._render of Django, wrapped by _timed_render
+_original_render = Template._render
+
+
+def _timed_query(execute, sql, params, many, context):
+    """
+    Database execute wrapper adding the duration of each query to the
+    timings of the current request.
+    """
+    timings = _timings.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings["db"] += time.perf_counter() - started
+        timings["queries"] += 1
+
+
+def _timed_render(self, context):
+    """
+    Replacement of Template._render adding the rendering time of the
+    outermost template to the timings of the current request. Included and
+    extended templates are counted within their parent.
+    """
+    timings = _timings.get()
+    if timings is None:
+        return _original_render(self, context)
+    timings["depth"] += 1
+    started = time.perf_counter()
+    try:
+        return _original_render(self, context)
+    finally:
+        timings["depth"] -= 1
+        if not timings["depth"]:
+            timings["template"] += time.perf_counter() - started
+
+
+def _install_query_timer(sender, connection, **kwargs):
+    """
+    Adds the execute wrapper to a database connection, once.
+    """
+    if _timed_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_timed_query)
+
+
+def _rotate(directory, keep):
+    """
+    Deletes the oldest dumps of a directory beyond the newest `keep` ones.
+    """
+    dumps = sorted(directory.iterdir(), key=lambda path: path.stat().st_mtime)
+    for path in dumps[:-keep] if keep else dumps:
+        path.unlink(missing_ok=True)
+
+
+class ProfilingMiddleware:
+    """
+    Measures the SQL time and query count, the template rendering time and
+    the total time of each request. They are sent in a Server-Timing header,
+    displayed by the network panel of the browsers, and logged as JSON by
+    the "litrevu.profiling" logger. The times of a streamed response stop
+    when its headers are ready.
+
+    A share PROFILING_SAMPLE_RATE of the requests is also profiled with
+    cProfile or tracemalloc, depending on PROFILING_MODE, and the dump is
+    written to PROFILING_DIR, which keeps the PROFILING_MAX_DUMPS newest.
+    Open cProfile dumps with pstats or snakeviz, tracemalloc dumps with
+    tracemalloc.Snapshot.load. Under ASGI, cProfile only sees the code run
+    on the event loop thread.
+
+    When PROFILING_ENABLED is False the middleware removes itself from the
+    stack: it costs nothing.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        """
+        Instruments the database connections and the templates, unless
+        profiling is disabled.
+        """
+        if not settings.PROFILING_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+        global _original_render
+        if Template._render is not _timed_render:
+            _original_render = Template._render
+            Template._render = _timed_render
+        connection_created.connect(_install_query_timer)
+        for connection in connections.all(initialized_only=True):
+            _install_query_timer(None, connection)
+
+    def __call__(self, request):
+        """
+        Serves the request with its timings recorded.
+        """
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        timings, token, profiler = self.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            dump = self.stop_profiler(profiler)
+            _timings.reset(token)
+        return self.finish(request, response, timings, dump)
+
+    async def __acall__(self, request):
+        """
+        Async version of __call__.
+        """
+        timings, token, profiler = self.start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            dump = self.stop_profiler(profiler)
+            _timings.reset(token)
+        return self.finish(request, response, timings, dump)
+
+    def start(self):
+        """
+        Starts recording the timings of a request, and profiling it if it
+        is sampled.
+
+        Returns:
+            tuple: (timings, token, profiler) with the profiler started, or
+                   None if the request is not sampled.
+        """
+        timings = {
+            "db": 0.0,
+            "queries": 0,
+            "template": 0.0,
+            "depth": 0,
+            "started": time.perf_counter(),
+        }
+        token = _timings.set(timings)
+
+        profiler = None
+        if random.random() < settings.PROFILING_SAMPLE_RATE and _dump_lock.acquire(
+            blocking=False
+        ):
+            if settings.PROFILING_MODE == "tracemalloc":
+                tracemalloc.start()
+                profiler = "tracemalloc"
+            else:
+                profiler = cProfile.Profile()
+                profiler.enable()
+        return timings, token, profiler
+
+    def stop_profiler(self, profiler):
+        """
+        Stops the profiler of a sampled request.
+
+        Returns:
+            The cProfile profiler or the tracemalloc snapshot, None if the
+            request is not sampled.
+        """
+        if profiler is None:
+            return None
+        try:
+            if profiler == "tracemalloc":
+                snapshot = tracemalloc.take_snapshot()
+                tracemalloc.stop()
+                return snapshot
+            profiler.disable()
+            return profiler
+        finally:
+            _dump_lock.release()
+
+    def finish(self, request, response, timings, dump):
+        """
+        Adds the Server-Timing header, logs the timings and writes the dump
+        of a sampled request.
+        """
+        total = (time.perf_counter() - timings["started"]) * 1000
+        db = timings["db"] * 1000
+        template = timings["template"] * 1000
+        response["Server-Timing"] = (
+            f'db;dur={db:.1f};desc="{timings["queries"]} queries", '
+            f"tpl;dur={template:.1f}, total;dur={total:.1f}"
+        )
+
+        dump_path = self.write_dump(request, dump) if dump is not None else None
+        logger.info(
+            json.dumps(
+                {
+                    "method": request.method,
+                    "path": request.path,
+                    "view": getattr(request.resolver_match, "view_name", None),
+                    "status": response.status_code,
+                    "total_ms": round(total, 2),
+                    "db_ms": round(db, 2),
+                    "queries": timings["queries"],
+                    "template_ms": round(template, 2),
+                    "dump": dump_path and str(dump_path),
+                }
+            )
+        )
+        return response
+
+    def write_dump(self, request, dump):
+        """
+        Writes the profile of a sampled request and deletes the oldest dumps.
+
+        Returns:
+            Path: The file written.
+        """
+        directory = Path(settings.PROFILING_DIR)
+        directory.mkdir(parents=True, exist_ok=True)
+        view_name = getattr(request.resolver_match, "view_name", None) or "unknown"
+        is_snapshot = isinstance(dump, tracemalloc.Snapshot)
+        path = directory / (
+            f"{time.strftime('%Y%m%d-%H%M%S')}-{time.perf_counter_ns() % 10**9:09d}"
+            f"-{view_name.replace(':', '-')}.{'tracemalloc' if is_snapshot else 'prof'}"
+        )
+        if is_snapshot:
+            dump.dump(path)
+        else:
+            dump.dump_stats(path)
+        _rotate(directory, settings.PROFILING_MAX_DUMPS)
+        return path
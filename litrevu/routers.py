@@ -0,0 +1,44 @@
+from django.db import connections
+
+# Applications whose reads go to the read-only connection
+FEED_APPS = {"authentication", "blog"}
+
+READ_ONLY_ALIAS = "replica"
+
+
+class FeedReadRouter:
+    """
+    Sends the reads of the feed models (users, follows, tickets, reviews,
+    photos and timelines) to the read-only "replica" connection, and every
+    write to "default". Both connections open the same SQLite file, so a
+    committed write is visible to the next read.
+    """
+
+    def db_for_read(self, model, **hints):
+        """
+        Returns "replica" for the feed models, unless a transaction is open
+        on "default": its uncommitted writes are only visible there.
+        """
+        if model._meta.app_label not in FEED_APPS:
+            return None
+        if connections["default"].in_atomic_block:
+            return "default"
+        return READ_ONLY_ALIAS
+
+    def db_for_write(self, model, **hints):
+        """
+        Writes always go to "default", even for objects read from "replica".
+        """
+        return "default"
+
+    def allow_relation(self, obj1, obj2, **hints):
+        """
+        Objects read from either connection belong to the same database.
+        """
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        """
+        Only "default" is migrated, "replica" is the same file.
+        """
+        return db != READ_ONLY_ALIAS
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -39,9 +40,11 @@ INSTALLED_APPS = [
     "django.contrib.staticfiles",
     "authentication",
     "blog",
+    "jobs",
 ]
 
 MIDDLEWARE = [
+    "litrevu.profiling.ProfilingMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -59,7 +62,6 @@ TEMPLATES = [
         "DIRS": [
             BASE_DIR.joinpath("templates"),
         ],
-        "APP_DIRS": True,
         "OPTIONS": {
             "context_processors": [
                 "django.template.context_processors.debug",
@@ -67,23 +69,75 @@ TEMPLATES = [
                 "django.contrib.auth.context_processors.auth",
                 "django.contrib.messages.context_processors.messages",
             ],
+            # Templates are compiled once per process. The development
+            # server still reloads them when they change.
+            "loaders": [
+                (
+                    "django.template.loaders.cached.Loader",
+                    [
+                        "django.template.loaders.filesystem.Loader",
+                        "django.template.loaders.app_directories.Loader",
+                    ],
+                ),
+            ],
         },
     },
 ]
 
 WSGI_APPLICATION = "litrevu.wsgi.application"
+ASGI_APPLICATION = "litrevu.asgi.application"
 
 
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
+# Run on every new SQLite connection: busy_timeout makes writers wait for the
+# lock instead of failing with "database is locked". The WAL journal lets
+# readers work while a writer commits, and is safe with synchronous = NORMAL.
+# WAL is persistent: the first connection writes it in the database file. It
+# is enabled with LITREVU_SQLITE_WAL=1 in the environment of the deployment,
+# so that running the project does not modify the db.sqlite3 tracked by git.
+SQLITE_WAL_COMMAND = "PRAGMA journal_mode = WAL;PRAGMA synchronous = NORMAL;"
+SQLITE_INIT_COMMAND = (
+    (SQLITE_WAL_COMMAND if os.environ.get("LITREVU_SQLITE_WAL") == "1" else "")
+    + "PRAGMA busy_timeout = 5000;"
+    "PRAGMA cache_size = -20000;"
+    "PRAGMA mmap_size = 268435456;"
+)
+
+# Seconds a connection is kept between the requests of a WSGI worker thread.
+# The ASGI application runs the synchronous code of each request in a new
+# thread, where a kept connection would never be reused: litrevu.asgi sets
+# LITREVU_CONN_MAX_AGE=0 to close them at the end of each request.
+CONN_MAX_AGE = int(os.environ.get("LITREVU_CONN_MAX_AGE", 600))
+
 DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
         "NAME": BASE_DIR / "db.sqlite3",
-    }
+        "CONN_MAX_AGE": CONN_MAX_AGE,
+        "CONN_HEALTH_CHECKS": True,
+        "OPTIONS": {
+            "init_command": SQLITE_INIT_COMMAND,
+            # Transactions take the write lock when they start, so they wait
+            # for it with busy_timeout instead of failing when upgrading
+            "transaction_mode": "IMMEDIATE",
+        },
+    },
+    # Read-only connection to the same file, used for the feed reads
+    # (see litrevu.routers)
+    "replica": {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": BASE_DIR / "db.sqlite3",
+        "CONN_MAX_AGE": CONN_MAX_AGE,
+        "CONN_HEALTH_CHECKS": True,
+        "OPTIONS": {"init_command": SQLITE_INIT_COMMAND + "PRAGMA query_only = ON;"},
+        "TEST": {"MIRROR": "default"},
+    },
 }
 
+DATABASE_ROUTERS = ["litrevu.routers.FeedReadRouter"]
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -135,3 +189,188 @@ LOGOUT_REDIRECT_URL = LOGIN_URL
 
 MEDIA_URL = "media/"
 MEDIA_ROOT = BASE_DIR.joinpath("media/")
+
+# Uploads
+# blog.uploads.BoundedUploadHandler writes uploaded files to a temporary file
+# as they arrive, dropping the data past UPLOAD_MAX_SIZE bytes. Photos whose
+# header declares more than PHOTO_MAX_PIXELS pixels are rejected before
+# Pillow decodes them.
+
+FILE_UPLOAD_HANDLERS = ["blog.uploads.BoundedUploadHandler"]
+UPLOAD_MAX_SIZE = 20 * 1024 * 1024
+PHOTO_MAX_PIXELS = 40_000_000
+
+# Media delivery
+# Uploaded files are served to logged in users by blog.media.serve_media.
+# With MEDIA_ACCEL "x-accel-redirect" (nginx) or "x-sendfile" (Apache with
+# mod_xsendfile, lighttpd) the front server sends the files, nginx from the
+# internal location MEDIA_ACCEL_PREFIX pointing to MEDIA_ROOT. With None they
+# are streamed by the application server. Files named after a hash of their
+# content are cached by browsers for MEDIA_IMMUTABLE_MAX_AGE seconds.
+
+MEDIA_ACCEL = None
+MEDIA_ACCEL_PREFIX = "/protected-media/"
+MEDIA_IMMUTABLE_MAX_AGE = 60 * 60 * 24 * 365
+
+# Feed pagination
+# Number of posts displayed per page on the feed and posts pages
+
+FEED_PAGE_SIZE = 20
+
+# Seconds between two checks for new posts on the home page
+
+FEED_POLL_INTERVAL = 30
+
+# Top rated tickets
+# Number of reviews a ticket needs to appear on the top rated page
+
+TOP_RATED_MIN_REVIEWS = 2
+
+# Follow suggestions
+# The subscriptions page suggests SUGGESTIONS_COUNT users followed by the
+# users one follows. To bound the cost of the computation, only the follows
+# of the SUGGESTIONS_MAX_SOURCES most recently followed users are read, at
+# most SUGGESTIONS_MAX_FANOUT each. Suggestions are cached for
+# SUGGESTIONS_CACHE_TIMEOUT seconds.
+
+SUGGESTIONS_COUNT = 5
+SUGGESTIONS_MAX_SOURCES = 200
+SUGGESTIONS_MAX_FANOUT = 100
+SUGGESTIONS_CACHE_TIMEOUT = 60 * 10
+
+# Bulk follow
+# Maximum number of usernames followed at once from a list or a CSV file
+
+BULK_FOLLOW_MAX_USERNAMES = 5000
+
+# Async views
+# Serve the home, posts and subscriptions pages with the async views of
+# blog.async_views. Only worth it under the ASGI application.
+
+ASYNC_VIEWS = False
+
+# Live feed
+# Server-sent events announcing new posts, served by the ASGI application.
+# Events queued for a connection that does not read them are dropped past
+# LIVE_QUEUE_SIZE. Intervals are in seconds.
+
+LIVE_QUEUE_SIZE = 100
+LIVE_HEARTBEAT_INTERVAL = 15
+LIVE_RETRY_DELAY = 5
+
+# JSON API
+# Maximum number of posts a client can request per page with "limit"
+
+API_MAX_PAGE_SIZE = 500
+
+# Feed mode
+# "pull" builds the home feed from tickets and reviews on every request,
+# "push" reads it from timelines materialized when posts are published.
+# Run "python manage.py rebuild_timelines" after switching to "push".
+# New posts are pushed to the timelines by a background job (see
+# "Background jobs"). True pushes them during the request publishing the
+# post instead, without a worker.
+
+FEED_MODE = "pull"
+TIMELINE_FAN_OUT_INLINE = False
+
+# Photo renditions
+# Thumbnails and WebP versions of uploaded photos are generated by a
+# background job (see "Background jobs"). True generates them during the
+# upload request instead, without a worker.
+
+PHOTO_RENDITIONS_INLINE = False
+
+# Background jobs
+# Jobs are stored in the database and run by "python manage.py run_jobs".
+# Failed jobs are retried after JOBS_RETRY_BACKOFF seconds, doubled at each
+# attempt up to JOBS_MAX_BACKOFF. Workers refresh the lock of their running
+# jobs every JOBS_HEARTBEAT_INTERVAL seconds. Every JOBS_MAINTENANCE_INTERVAL
+# seconds, they put back in the queue the jobs whose lock was not refreshed
+# for JOBS_STALE_AFTER seconds, their worker having died, and delete the
+# jobs done for more than JOBS_KEEP_DONE seconds and those failed for more
+# than JOBS_KEEP_FAILED.
+
+JOBS_MAX_ATTEMPTS = 5
+JOBS_RETRY_BACKOFF = 10
+JOBS_MAX_BACKOFF = 3600
+JOBS_STALE_AFTER = 600
+JOBS_HEARTBEAT_INTERVAL = 30
+JOBS_MAINTENANCE_INTERVAL = 60
+JOBS_KEEP_DONE = 60 * 60 * 24
+JOBS_KEEP_FAILED = 60 * 60 * 24 * 30
+
+# Request profiling
+# litrevu.profiling.ProfilingMiddleware adds a Server-Timing header with the
+# SQL, template and total times of each request and logs them. A share
+# PROFILING_SAMPLE_RATE of the requests is also profiled with PROFILING_MODE,
+# "cprofile" or "tracemalloc", keeping the PROFILING_MAX_DUMPS newest dumps
+# in PROFILING_DIR. Disabled, the middleware is left out of the stack.
+
+PROFILING_ENABLED = False
+PROFILING_SAMPLE_RATE = 0.01
+PROFILING_MODE = "cprofile"
+PROFILING_DIR = BASE_DIR / "profiles"
+PROFILING_MAX_DUMPS = 50
+
+# Tests
+# "python manage.py test" runs with litrevu.test_runner.TestRunner, which
+# creates the tables of the applications without generated migrations from
+# their models, with the caches in memory and a temporary MEDIA_ROOT.
+
+TEST_RUNNER = "litrevu.test_runner.TestRunner"
+
+# Logging
+# https://docs.djangoproject.com/en/5.1/topics/logging/
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {
+        "console": {"class": "logging.StreamHandler"},
+    },
+    "loggers": {
+        "litrevu.profiling": {
+            "handlers": ["console"],
+            "level": "INFO",
+            "propagate": False,
+        },
+    },
+}
+
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    "sessions": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": BASE_DIR / "cache" / "sessions",
+        "OPTIONS": {"MAX_ENTRIES": 10000},
+    },
+}
+
+# Sessions and authentication
+# Sessions are read from the "sessions" cache and written through to the
+# database, which still has them when they are culled from the cache.
+# authentication.backends.CachedModelBackend keeps the users of the sessions
+# in the same cache for AUTH_USER_CACHE_TIMEOUT seconds. The file cache is
+# shared by the processes of the host, point its LOCATION to a tmpfs such as
+# /dev/shm to keep it in shared memory.
+
+SESSION_ENGINE = "django.contrib.sessions.backends.cached_db"
+SESSION_CACHE_ALIAS = "sessions"
+AUTH_USER_CACHE_TIMEOUT = 60 * 5
+AUTHENTICATION_BACKENDS = [
+    "authentication.backends.CachedModelBackend",
+    # Authenticates the sessions opened before the cached backend
+    "django.contrib.auth.backends.ModelBackend",
+]
+
+# Rendered posts are cached in FRAGMENT_CACHE_ALIAS for FRAGMENT_CACHE_TIMEOUT
+# seconds, see blog.fragments
+
+FRAGMENT_CACHE_ALIAS = "default"
+FRAGMENT_CACHE_TIMEOUT = 60 * 60 * 24
@@ -0,0 +1,42 @@
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.test import override_settings
+from django.test.runner import DiscoverRunner
+
+
+class TestRunner(DiscoverRunner):
+    """
+    Test runner creating the test database without the migrations that were
+    not generated yet (see blog.seeding.migration_modules). The caches are
+    kept in memory and the uploaded files in a temporary MEDIA_ROOT, so the
+    tests leave nothing behind in the project directory.
+    """
+
+    def setup_test_environment(self, **kwargs):
+        """
+        Overrides the settings for the whole test run.
+        """
+        super().setup_test_environment(**kwargs)
+        from blog.seeding import migration_modules
+
+        self.media_root = tempfile.mkdtemp(prefix="litrevu-tests-")
+        self.overridden = override_settings(
+            MIGRATION_MODULES=migration_modules(),
+            CACHES={
+                alias: {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}
+                for alias in settings.CACHES
+            },
+            MEDIA_ROOT=self.media_root,
+            FILE_UPLOAD_TEMP_DIR=self.media_root,
+        )
+        self.overridden.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        """
+        Restores the settings and removes the uploaded files.
+        """
+        self.overridden.disable()
+        shutil.rmtree(self.media_root, ignore_errors=True)
+        super().teardown_test_environment(**kwargs)
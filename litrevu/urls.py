@@ -23,6 +23,9 @@ from authentication.views import CustomLoginView, SignupPageView
 from django.contrib.auth.views import LogoutView
 from blog.views import (
     home,
+    home_posts,
+    home_new_count,
+    feed_stream,
     ticket_upload,
     edit_ticket,
     delete_ticket,
@@ -32,11 +35,25 @@ from blog.views import (
     create_ticket_review,
     subscriptions,
     follow_user,
+    bulk_follow,
     unfollow_user,
     user_posts,
+    fragment_cache_stats,
+    search_posts,
+    top_rated,
 )
+from blog.api import (
+    api_feed,
+    api_posts,
+    api_ticket,
+    api_create_ticket,
+    api_create_review,
+)
+from blog.media import serve_media
 from django.conf import settings
-from django.conf.urls.static import static
+
+if settings.ASYNC_VIEWS:
+    from blog.async_views import home, user_posts, subscriptions  # noqa: F811
 
 urlpatterns = [
     path("admin/", admin.site.urls),
@@ -48,6 +65,9 @@ urlpatterns = [
         name="signup",
     ),
     path("home/", home, name="home"),
+    path("home/posts/", home_posts, name="home_posts"),
+    path("home/new/", home_new_count, name="home_new_count"),
+    path("home/stream/", feed_stream, name="feed_stream"),
     path("create_ticket/", ticket_upload, name="create_ticket"),
     path("ticket/<int:ticket_id>/edit/", edit_ticket, name="edit_ticket"),
     path("ticket/<int:ticket_id>/delete/", delete_ticket, name="delete_ticket"),
@@ -57,9 +77,20 @@ urlpatterns = [
     path("ticket-review/create", create_ticket_review, name="create_ticket_review"),
     path("subscriptions/", subscriptions, name="subscriptions"),
     path("follow/", follow_user, name="follow_user"),
+    path("follow/bulk/", bulk_follow, name="bulk_follow"),
     path("unfollow/<int:user_id>/", unfollow_user, name="unfollow_user"),
     path("posts", user_posts, name="user_posts"),
+    path("search/", search_posts, name="search"),
+    path("top/", top_rated, name="top_rated"),
+    path("stats/fragment-cache/", fragment_cache_stats, name="fragment_cache_stats"),
+    path("api/feed/", api_feed, name="api_feed"),
+    path("api/posts/", api_posts, name="api_posts"),
+    path("api/tickets/", api_create_ticket, name="api_create_ticket"),
+    path("api/tickets/<int:ticket_id>/", api_ticket, name="api_ticket"),
+    path(
+        "api/tickets/<int:ticket_id>/reviews/",
+        api_create_review,
+        name="api_create_review",
+    ),
+    path(f"{settings.MEDIA_URL.strip('/')}/<path:path>", serve_media, name="media"),
 ]
-
-if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
@@ -0,0 +1,123 @@
+// Infinite scroll and new posts banner of the home feed.
+// Posts are fetched as rendered HTML from the home_posts view. New posts
+// are announced by the feed_stream events, or polled from home_new_count.
+document.addEventListener("DOMContentLoaded", () => {
+    const feed = document.getElementById("feed");
+    if (!feed) {
+        return;
+    }
+    const posts = document.getElementById("feed-posts");
+    const banner = document.getElementById("new-posts");
+    const nextPage = document.getElementById("next-page");
+    const firstPost = posts.querySelector(".feed-post");
+
+    let nextCursor = feed.dataset.nextCursor;
+    let topCursor = firstPost ? firstPost.dataset.cursor : "";
+    let loading = false;
+
+    async function fetchPosts(params) {
+        const response = await fetch(
+            `${feed.dataset.postsUrl}?${new URLSearchParams(params)}`,
+            { headers: { Accept: "application/json" } }
+        );
+        if (!response.ok) {
+            throw new Error(`HTTP ${response.status}`);
+        }
+        return response.json();
+    }
+
+    // Infinite scroll: the next page is appended when the link comes into view
+    if (nextPage && "IntersectionObserver" in window) {
+        nextPage.hidden = true;
+        const sentinel = document.createElement("div");
+        feed.appendChild(sentinel);
+
+        const observer = new IntersectionObserver(async (entries) => {
+            if (!entries[0].isIntersecting || loading || !nextCursor) {
+                return;
+            }
+            loading = true;
+            try {
+                const page = await fetchPosts({ before: nextCursor });
+                posts.insertAdjacentHTML("beforeend", page.html);
+                nextCursor = page.has_more ? page.cursor : "";
+                if (!nextCursor) {
+                    observer.disconnect();
+                }
+            } catch (error) {
+                // Falls back to the link to the next page
+                observer.disconnect();
+                nextPage.href = `?cursor=${encodeURIComponent(nextCursor)}`;
+                nextPage.hidden = false;
+            } finally {
+                loading = false;
+            }
+        });
+        observer.observe(sentinel);
+    }
+
+    // New posts banner: counts the posts announced by the live stream, or
+    // polls the count when the stream is not available, shows them on click
+    if (!topCursor) {
+        return;
+    }
+    const interval = Number(feed.dataset.pollInterval) * 1000;
+    let streaming = false;
+    let announced = 0;
+
+    function showBanner(count, hasMore) {
+        if (!count) {
+            return;
+        }
+        const label = hasMore ? `${count}+` : count;
+        banner.textContent = count > 1 ? `${label} nouveaux posts` : "1 nouveau post";
+        banner.hidden = false;
+    }
+
+    async function poll() {
+        if (streaming || document.hidden || loading) {
+            return;
+        }
+        const params = new URLSearchParams({ after: topCursor });
+        const response = await fetch(`${feed.dataset.newUrl}?${params}`);
+        if (!response.ok) {
+            return;
+        }
+        const news = await response.json();
+        showBanner(news.count, news.has_more);
+    }
+
+    if ("EventSource" in window) {
+        const stream = new EventSource(feed.dataset.streamUrl);
+        stream.addEventListener("open", () => {
+            streaming = true;
+        });
+        stream.addEventListener("post", () => {
+            announced += 1;
+            showBanner(announced, false);
+        });
+        // A closed stream (refused under WSGI) falls back to polling
+        stream.addEventListener("error", () => {
+            streaming = stream.readyState === EventSource.OPEN;
+        });
+    }
+
+    banner.addEventListener("click", async () => {
+        banner.hidden = true;
+        announced = 0;
+        loading = true;
+        try {
+            let page;
+            do {
+                page = await fetchPosts({ after: topCursor });
+                posts.insertAdjacentHTML("afterbegin", page.html);
+                topCursor = page.cursor;
+            } while (page.has_more);
+        } finally {
+            loading = false;
+        }
+        window.scrollTo({ top: feed.offsetTop, behavior: "smooth" });
+    });
+
+    setInterval(() => poll().catch(() => {}), interval);
+});